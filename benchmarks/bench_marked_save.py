@@ -0,0 +1,153 @@
+"""
+_marked.pdf 保存（write_all_status_to_pdf の PDF 部分）のベンチマーク。
+合成した号車別明細表（既定 100 ページ）で、1行だけステータスを変えたときの保存を比べる。
+
+  全体保存（旧実装）: 全対象ページの NS/CXL 行を描き直し、.tmp へ全体を書いて os.replace
+                      （旧実装にあった固定の time.sleep(0.3) は含めない）
+  1行保存（現行）   : 元PDFのページ内容ハッシュ（base_page_hashes）で変更ページを確認し、
+                      変わった行のページ＋合計人数の最終ページだけ元PDFから作り直して増分保存
+
+base_page_hashes は保存のたびに元PDFの全ページのコンテンツストリームを読むので、その時間も別に出す。
+
+    python benchmarks/bench_marked_save.py [--pages 100] [--rows 40] [--repeat 5]
+"""
+import os
+import sys
+import time
+import random
+import shutil
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fitz
+
+from pdf_list_find_write import (
+    PDFPassengerSearchApp, PageWords, base_page_hashes, read_base_page_hashes, write_base_page_hashes,
+)
+
+NAMES = ["ﾔﾏﾀﾞﾀﾛｳ", "ｽｽﾞｷﾊﾅｺ", "ｻﾄｳ", "ﾀﾅｶｲﾁﾛｳ"]
+PLACES = ["ｼﾝｼﾞｭｸ", "ｵｵｻｶ", "ｷｮｳﾄ", "ﾄｳｷｮｳ"]
+
+
+def make_manifest(path, pages, rows, seed=0):
+    """1ページ rows 行の号車別明細表（最終ページに合計人数行）を作り、ステータス付きにする予約番号を返す"""
+    rnd = random.Random(seed)
+    font = fitz.Font("cjk")
+    doc = fitz.open()
+    stamped = []
+    for p in range(pages):
+        lines = ["バス号車別明細表 262便"]
+        for r in range(rows):
+            resv = f"9J-{p * rows + r + 100000}"
+            lines.append(f"{r + 1} {resv} {rnd.choice(NAMES)} 1001 090-1234-5678 "
+                         f"{rnd.choice(PLACES)}→{rnd.choice(PLACES)} 262便")
+            if rnd.random() < 0.1:
+                stamped.append((p, resv))
+        if p == pages - 1:
+            lines.append("合計人数 40 20 0 60")
+        page = doc.new_page()
+        page.insert_font(fontname="F0", fontbuffer=font.buffer)
+        page.insert_text((30, 30), "\n".join(lines), fontname="F0", fontsize=7, lineheight=1.6)
+    doc.subset_fonts()
+    doc.save(path, garbage=3, deflate=True)
+    doc.close()
+    return stamped
+
+
+def stamp(page, page_words, resvs):
+    """予約番号の左へステータスを書く（印字位置の計算と描画の手間を再現する）"""
+    for resv in resvs:
+        for w in page_words.find_resv(resv):
+            page.insert_text((w[0] - 20, w[3]), "NS", fontsize=8, color=(1, 0, 0), fontname="helv")
+
+
+def full_save(base_pdf, marked_pdf, stamped):
+    """旧実装: 対象ページの単語を全部取り、全行を描き直して全体保存"""
+    doc = fitz.open(marked_pdf)
+    by_page = {}
+    for p, resv in stamped:
+        by_page.setdefault(p, []).append(resv)
+    for p in range(len(doc)):
+        page = doc[p]
+        stamp(page, PageWords(page), by_page.get(p, []))
+    temp_path = marked_pdf + ".tmp"
+    doc.save(temp_path)
+    doc.close()
+    os.replace(temp_path, marked_pdf)
+
+
+def one_row_save(app, base_pdf, marked_pdf, changed):
+    """現行: ハッシュで元PDFの変更を確認し、変わった行のページと最終ページだけ作り直して増分保存"""
+    doc_marked = fitz.open(marked_pdf)
+    doc_base = fitz.open(base_pdf)
+    base_hashes = base_page_hashes(doc_base)
+    stored = read_base_page_hashes(doc_marked)
+    changed_pages = [p for p, h in enumerate(base_hashes) if stored is None or stored[p] != h]
+    assert not changed_pages
+    page_index, resv = changed
+    for pno in sorted({page_index, len(doc_base) - 1}):
+        doc_marked.delete_page(pno)
+        doc_marked.insert_pdf(doc_base, from_page=pno, to_page=pno, start_at=pno)
+        page = doc_marked[pno]
+        stamp(page, PageWords(page), [resv] if pno == page_index else [])
+    doc_base.close()
+    write_base_page_hashes(doc_marked, base_hashes)
+    return app._save_marked_pdf(doc_marked, marked_pdf, base_pdf)
+
+
+def best_ms(func, setup, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        setup()
+        t0 = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="_marked.pdf 保存のベンチマーク")
+    parser.add_argument("--pages", type=int, default=100)
+    parser.add_argument("--rows", type=int, default=40)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        base_pdf = os.path.join(tmp, "manifest_保管用.pdf")
+        marked_pdf = base_pdf.replace(".pdf", "_marked.pdf")
+        template = os.path.join(tmp, "template_marked.pdf")
+        stamped = make_manifest(base_pdf, args.pages, args.rows)
+
+        # 前回保存済みの _marked.pdf（全行印字済み・元PDFのハッシュ記録あり）
+        shutil.copyfile(base_pdf, template)
+        full_save(base_pdf, template, stamped)
+        with fitz.open(template) as doc:
+            with fitz.open(base_pdf) as doc_base:
+                write_base_page_hashes(doc, base_page_hashes(doc_base))
+            doc.saveIncr()
+
+        def reset():
+            shutil.copyfile(template, marked_pdf)
+
+        app = PDFPassengerSearchApp.__new__(PDFPassengerSearchApp)
+        changed = stamped[len(stamped) // 2]
+        reset()
+        assert one_row_save(app, base_pdf, marked_pdf, changed) == "増分保存"
+        grown = os.path.getsize(marked_pdf) - os.path.getsize(template)
+
+        old_ms = best_ms(lambda: full_save(base_pdf, marked_pdf, stamped), reset, args.repeat)
+        new_ms = best_ms(lambda: one_row_save(app, base_pdf, marked_pdf, changed), reset, args.repeat)
+        with fitz.open(base_pdf) as doc_base:
+            hash_ms = best_ms(lambda: base_page_hashes(doc_base), lambda: None, args.repeat)
+
+        print(f"pages={args.pages} rows/page={args.rows} stamped rows={len(stamped)} "
+              f"base={os.path.getsize(base_pdf) // 1024} KB")
+        print(f"full save (legacy)        : {old_ms:8.1f} ms")
+        print(f"one-row save (incremental): {new_ms:8.1f} ms  (x{old_ms / new_ms:.1f}, +{grown // 1024} KB appended)")
+        print(f"  of which base_page_hashes: {hash_ms:7.1f} ms  (reads all {args.pages} content streams)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+出力PDFのページ順組み立て（build_output_refs）のマイクロベンチマーク。
+5,000件の合成ページ参照で、旧来の「便 × 種別 × 全件走査」と比較し、順序が一致することも確認する。
+
+    python benchmarks/bench_output_assembly.py [--entries 5000] [--buses 18] [--repeat 20]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pdf_page_collector import build_output_refs
+
+
+def make_entries(n, ben_list, seed=0):
+    """抽出順の (出力種別, 便名, 書類種別, (ファイル, ページ番号)) を n 件作る"""
+    rnd = random.Random(seed)
+    kinds = [("乗務員用", "座席表"), ("乗務員用", "バス号車別明細表"), ("保管用", "バス号車別明細表")]
+    entries = []
+    for i in range(n):
+        mode, typ = rnd.choice(kinds)
+        entries.append((mode, rnd.choice(ben_list), typ, (f"file{i // 200}.pdf", i % 200)))
+    return entries
+
+
+def nested_scan(entries, ben_list):
+    """旧実装: 便 × 種別ごとに中間リスト全体を走査"""
+    result = {}
+    for mode in ["乗務員用", "保管用"]:
+        refs = []
+        if mode == "乗務員用":
+            for ben in ben_list:
+                for typ in ["座席表", "バス号車別明細表"]:
+                    for entry in entries:
+                        if entry[0] == mode and entry[1] == ben and entry[2] == typ:
+                            refs.append(entry[3])
+        else:
+            for ben in reversed(ben_list):
+                for entry in entries:
+                    if entry[0] == mode and entry[1] == ben and entry[2] == "バス号車別明細表":
+                        refs.append(entry[3])
+        result[mode] = refs
+    return result
+
+
+def grouped(entries, ben_list):
+    """現行: (出力種別, 便名, 書類種別) ごとにまとめてから組み立て（グループ化の時間も含む）"""
+    intermediate_files = defaultdict(list)
+    for mode, ben, typ, page in entries:
+        intermediate_files[(mode, ben, typ)].append(page)
+    return build_output_refs(intermediate_files, ben_list)
+
+
+def best_ms(func, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="出力ページ順組み立てのベンチマーク")
+    parser.add_argument("--entries", type=int, default=5000)
+    parser.add_argument("--buses", type=int, default=18)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    ben_list = [f"{241 + i}号車" for i in range(args.buses)]
+    entries = make_entries(args.entries, ben_list)
+
+    old = nested_scan(entries, ben_list)
+    new = grouped(entries, ben_list)
+    assert old == new, "ページ順が旧実装と一致しません"
+
+    old_ms = best_ms(lambda: nested_scan(entries, ben_list), args.repeat)
+    new_ms = best_ms(lambda: grouped(entries, ben_list), args.repeat)
+    print(f"entries={args.entries} buses={args.buses} pages: 乗務員用={len(new['乗務員用'])} 保管用={len(new['保管用'])}")
+    print(f"nested scan : {old_ms:8.2f} ms")
+    print(f"grouped     : {new_ms:8.2f} ms  (x{old_ms / new_ms:.1f})")
+
+
+if __name__ == "__main__":
+    main()
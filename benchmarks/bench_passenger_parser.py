@@ -0,0 +1,168 @@
+"""
+号車別明細表の行解析（PassengerLineParser）のベンチマーク。
+合成した明細行で、旧来の parse_passenger_line（呼び出しごとに正規表現を組み立てる版）と
+全項目が一致することを確認し、1秒あたりの解析行数を比較する。
+
+    python benchmarks/bench_passenger_parser.py [--lines 50000] [--repeat 3]
+"""
+import os
+import re
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pdf_list_find_write import PASSENGER_LINE_PARSER
+
+NAMES = ["ﾔﾏﾀﾞﾀﾛｳ", "ｽｽﾞｷﾊﾅｺ", "ｻﾄｳ", "ﾀﾅｶｲﾁﾛｳ", "ヤマモト", "WANG"]
+PLACES = ["ｼﾝｼﾞｭｸ", "ｵｵｻｶ", "ｷｮｳﾄ", "ﾄｳｷｮｳ", "ｺｳﾍﾞ", "名古屋"]
+PHONES = ["090-1234-5678", "03-1234-5678", "336-5266-7188", "09012345678", "15089178424", "0312345678", ""]
+SITES = ["ｼﾞｬﾑｼﾞｬﾑﾋｶｸ", "ｼﾞｬﾑｼﾞｬﾑﾗｲﾅｰ", "ジャムジャムヒカク", "WILLER", "ﾗｸﾃﾝ", "ラクテン", ""]
+ARROWS = ["→", "⇒"]
+DASHES = ["-", "―", "ー", "−"]
+
+
+def legacy_parse_passenger_line(line_text):
+    """PassengerLineParser 導入前の PDFPassengerSearchApp.parse_passenger_line（比較用の写し）"""
+    def normalize_phone(raw):
+        d = re.sub(r'\D', '', raw)
+        if len(d) == 11:
+            return f"{d[:3]}-{d[3:7]}-{d[7:]}"
+        elif len(d) == 10:
+            return f"{d[:2]}-{d[2:6]}-{d[6:]}"
+        else:
+            return raw
+
+    s = re.sub(r"\s+", "", line_text)
+    s = s.replace("⇒", "→").replace("―", "-").replace("ー", "-").replace("−", "-")
+
+    m_head = re.match(r'^(?:(?P<no>\d{1,2}))?(?P<resv>\d[A-Z]{1,2}-\d{4,})', s)
+    if not m_head:
+        return []
+    no = m_head.group("no") or ""
+    resv = m_head.group("resv")
+    idx = m_head.end()
+
+    m_cnt = re.search(r'(\d)(\d)(\d)(\d)', s[idx:])
+    if not m_cnt:
+        return []
+    name = s[idx: idx + m_cnt.start()]
+    male, female, child, total = m_cnt.groups()
+    idx += m_cnt.end()
+
+    tel = ""
+    phone_patterns = [
+        r'(?:0\d{1,4}|[1-9]\d{1,3})-\d{2,4}-\d{3,4}',
+        r'(?:0\d{9,10}|[1-9]\d{8,10})'
+    ]
+    phone_match = None
+    for p in phone_patterns:
+        m = re.search(p, s[idx:])
+        if m:
+            phone_match = m
+            break
+
+    if phone_match:
+        tel = normalize_phone(phone_match.group())
+        start, end = idx + phone_match.start(), idx + phone_match.end()
+        s = s[:start] + s[end:]
+
+    pickup, dropoff, flight = "", "", ""
+    m_route = re.search(r'([^→]+)→([^→]+?)(\d{1,3}便)', s[idx:])
+    if m_route:
+        pickup, dropoff, flight = m_route.group(1), m_route.group(2), m_route.group(3)
+        idx = idx + m_route.end()
+    else:
+        m_flight = re.search(r'(\d{1,3}便)', s[idx:])
+        if m_flight:
+            flight = m_flight.group(1)
+            before = s[idx: idx + m_flight.start()]
+            m_route2 = re.search(r'([^→]+)→([^→]+)', before)
+            if m_route2:
+                pickup, dropoff = m_route2.group(1), m_route2.group(2)
+            idx = idx + m_flight.end()
+
+    period = ""
+    m_period = re.search(r'\d{2}/\d{2}/\d{2}-\d{2}/\d{2}', s[idx:])
+    if m_period:
+        period = m_period.group(0)
+        idx += m_period.end()
+
+    site, bus_class = "", ""
+    rest = s[idx:]
+    known_sites = [
+        "ｼﾞｬﾑｼﾞｬﾑﾋｶｸ", "ｼﾞｬﾑｼﾞｬﾑﾗｲﾅｰ",
+        "ジャムジャムヒカク", "ジャムジャムライナー",
+        "WILLER", "ﾗｸﾃﾝ", "ラクテン"
+    ]
+    for st in known_sites:
+        if st in rest:
+            site = st
+            after = rest.split(st, 1)[1]
+            m_cls = re.search(r'([0-9I][0-9])$', after)
+            if m_cls:
+                bus_class = m_cls.group(1)
+            break
+    if not site:
+        m_cls = re.search(r'([0-9I][0-9])$', rest)
+        bus_class = m_cls.group(1) if m_cls else ""
+
+    return [
+        no, resv, name, male, female, child, total, tel,
+        pickup, dropoff, flight, period, site, bus_class
+    ]
+
+
+def make_lines(n, seed=0):
+    """電話番号・経路・サイト・欠けた行・空白の揺れを混ぜた明細行を n 件作る"""
+    rnd = random.Random(seed)
+    lines = []
+    for i in range(n):
+        no = rnd.choice(["", str(rnd.randint(1, 60))])
+        resv = f"{rnd.randint(1, 9)}{rnd.choice(['J', 'JA', 'W'])}-{rnd.randint(1000, 9999999)}"
+        counts = "".join(str(rnd.randint(0, 3)) for _ in range(3))
+        counts += str(sum(int(c) for c in counts) % 10)
+        route = f"{rnd.choice(PLACES)}{rnd.choice(ARROWS)}{rnd.choice(PLACES)}" if rnd.random() < 0.85 else ""
+        flight = f"{rnd.randint(1, 999)}便" if rnd.random() < 0.9 else ""
+        period = f"26/{rnd.randint(1, 12):02d}/{rnd.randint(1, 28):02d}-{rnd.randint(1, 12):02d}/{rnd.randint(1, 28):02d}"
+        site = rnd.choice(SITES)
+        cls = rnd.choice(["11", "I2", "9", ""])
+        phone = rnd.choice(PHONES).replace("-", rnd.choice(DASHES))
+        parts = [no, resv, rnd.choice(NAMES), counts, phone, route, flight, period, site, cls]
+        cut = len(parts) if rnd.random() < 0.8 else rnd.randint(1, len(parts))
+        sep = rnd.choice(["", " ", "  ", "　"])
+        lines.append(sep.join(parts[:cut]))
+    return lines
+
+
+def best_rate(func, lines, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for line in lines:
+            func(line)
+        best = min(best, time.perf_counter() - t0)
+    return len(lines) / best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="明細行解析のベンチマーク")
+    parser.add_argument("--lines", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    lines = make_lines(args.lines)
+    for line in lines:
+        assert list(PASSENGER_LINE_PARSER.parse(line) or []) == legacy_parse_passenger_line(line), line
+
+    old_rate = best_rate(legacy_parse_passenger_line, lines, args.repeat)
+    new_rate = best_rate(PASSENGER_LINE_PARSER.parse, lines, args.repeat)
+    print(f"lines={args.lines} (all fields match the legacy parser)")
+    print(f"legacy parse_passenger_line : {old_rate / 1000:8.1f}k lines/s")
+    print(f"PassengerLineParser.parse   : {new_rate / 1000:8.1f}k lines/s  (x{new_rate / old_rate:.2f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+常駐アプリ（pdf_page_collector_gui_full_2.9.py）の起動経路の計測。
+実際の起動と同じく、GUIモジュールの読み込み → 二重起動チェック（ポート確保）までを新しいプロセスで行い、
+・経過時間（中央値）
+・-X importtime の合計と重いモジュール上位
+・起動時点で読み込まれていないはずの重いモジュール（watchdog / fitz / PyPDF2 / cryptography / pystray / PIL）
+を表示する。
+
+    python benchmarks/bench_startup.py [--runs 10] [--top 15]
+"""
+import os
+import re
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+GUI_FILE = os.path.join(ROOT, "pdf_page_collector_gui_full_2.9.py")
+HEAVY_MODULES = ("watchdog", "fitz", "pymupdf", "PyPDF2", "cryptography", "pystray", "PIL", "win10toast")
+
+# 起動時の処理（if __name__ == "__main__" の run_gui() 直前まで）を別プロセスで再現
+STARTUP_CODE = f"""
+import sys, time, json, importlib.util
+t0 = time.perf_counter()
+sys.path.insert(0, {ROOT!r})
+spec = importlib.util.spec_from_file_location("collector_gui", {GUI_FILE!r})
+gui = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(gui)
+locked = gui.acquire_single_instance_lock(port=0)
+elapsed = time.perf_counter() - t0
+loaded = sorted({{m.split(".")[0] for m in sys.modules}} & set({list(HEAVY_MODULES)!r}))
+print(json.dumps({{"elapsed_ms": elapsed * 1000, "locked": locked, "heavy": loaded}}))
+"""
+
+
+def run_once(importtime=False):
+    cmd = [sys.executable]
+    if importtime:
+        cmd += ["-X", "importtime"]
+    cmd += ["-c", STARTUP_CODE]
+    proc = subprocess.run(cmd, capture_output=True, text=True, cwd=ROOT, check=True)
+    return json.loads(proc.stdout.strip().splitlines()[-1]), proc.stderr
+
+
+def parse_importtime(stderr):
+    """-X importtime の出力 → [(累積μs, モジュール名)]（トップレベルのみ）"""
+    rows = []
+    for line in stderr.splitlines():
+        m = re.match(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)", line)
+        if m and len(m.group(3)) == 1:
+            rows.append((int(m.group(2)), m.group(4)))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="常駐アプリ起動経路の計測")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args(argv)
+
+    run_once()  # ウォームアップ（.pyc 生成）
+    results = [run_once()[0] for _ in range(args.runs)]
+    info, stderr = run_once(importtime=True)
+    rows = parse_importtime(stderr)
+
+    print(f"startup (import GUI module + instance lock): median {statistics.median(r['elapsed_ms'] for r in results):.1f} ms "
+          f"/ min {min(r['elapsed_ms'] for r in results):.1f} ms over {args.runs} runs")
+    print(f"-X importtime total (top-level cumulative): {sum(us for us, _ in rows) / 1000:.1f} ms")
+    print(f"heavy modules loaded at startup: {info['heavy'] or 'none'}")
+    print(f"top {args.top} imports:")
+    for us, name in sorted(rows, reverse=True)[:args.top]:
+        print(f"  {us / 1000:8.2f} ms  {name}")
+    return 1 if info["heavy"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,176 @@
+"""
+保存済みステータスの復元（PDFPassengerSearchApp._restore_status_records）のベンチマーク。
+画面なしで測れるよう、呼び出し回数を数える Treeview の代わり（CountingTree）に数百行を入れ、
+旧実装（レコードごとに全行を tree.item で氏名照合）と現行（行モデルを予約番号で引き、最後に1行1回だけ反映）の
+Treeview 呼び出し回数と Python 側の所要時間を比べる。最終的な値・タグが一致することも確認する。
+
+    python benchmarks/bench_status_restore.py [--rows 400] [--repeat 20]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pdf_list_find_write import PDFPassengerSearchApp
+
+
+class CountingTree:
+    """ttk.Treeview の insert / get_children / item / delete だけを持ち、呼び出し回数を数える"""
+
+    def __init__(self):
+        self.calls = 0
+        self.rows = {}      # iid → {"values": tuple, "tags": tuple}
+        self.order = []
+
+    def insert(self, parent, index, values=()):
+        self.calls += 1
+        iid = f"I{len(self.order) + 1:03X}"
+        self.rows[iid] = {"values": tuple(values), "tags": ()}
+        self.order.append(iid)
+        return iid
+
+    def get_children(self, item=""):
+        self.calls += 1
+        return tuple(self.order)
+
+    def item(self, iid, option=None, **kw):
+        self.calls += 1
+        row = self.rows[iid]
+        if option is not None:
+            return row[option]
+        for key, value in kw.items():
+            row[key] = tuple(value)
+        return None if kw else dict(row)
+
+    def delete(self, *iids):
+        self.calls += 1
+        for iid in iids:
+            del self.rows[iid]
+            self.order.remove(iid)
+
+
+def legacy_restore_status_records(app, data):
+    """行モデル導入前の _restore_status_records（比較用の写し）"""
+    restored_count = 0
+    for record in data.get("records", []):
+        name = record.get("name", "")
+        status = record.get("status", "")
+        cxl_deduction = record.get("cxl_deduction", {})
+
+        for item_id in app.tree.get_children():
+            values = list(app.tree.item(item_id, "values"))
+            if len(values) > 3 and values[3] == name:
+                values[0] = status
+
+                if status in ("CXL", "CXL-CS") and isinstance(cxl_deduction, dict):
+                    orig = cxl_deduction.get("orig", {})
+                    after = cxl_deduction.get("after", {})
+
+                    def fmt_each(before, after):
+                        try:
+                            b = int(before)
+                            a = int(after)
+                            if b != a:
+                                return f"{b}→{a}"
+                            else:
+                                return str(a)
+                        except Exception:
+                            if before != after:
+                                return f"{before}→{after}"
+                            else:
+                                return str(after)
+
+                    values[4] = fmt_each(orig.get("男", ""), after.get("男", ""))
+                    values[5] = fmt_each(orig.get("女", ""), after.get("女", ""))
+                    values[6] = fmt_each(orig.get("子供", ""), after.get("子供", ""))
+                    values[7] = fmt_each(orig.get("合計", ""), after.get("合計", ""))
+
+                    if status == "CXL-CS":
+                        app.tree.item(item_id, values=values, tags=('status_cxl_cs',))
+                    else:
+                        app.tree.item(item_id, values=values, tags=('status_red',))
+
+                    app.cxl_deduction_map[item_id] = cxl_deduction
+
+                elif status == "NS":
+                    def aft(x): return app.safe_int(x)
+                    om, of_, ok = aft(values[4]), aft(values[5]), aft(values[6])
+                    ot = aft(values[7]) if str(values[7]).strip() else (om + of_ + ok)
+                    values[4] = f"{om}→0" if om > 0 else "0"
+                    values[5] = f"{of_}→0" if of_ > 0 else "0"
+                    values[6] = f"{ok}→0" if ok > 0 else "0"
+                    values[7] = f"{ot}→0" if ot > 0 else "0"
+                    app.tree.item(item_id, tags=('status_blue',))
+                else:
+                    app.tree.item(item_id, tags=())
+
+                app.tree.item(item_id, values=values)
+                restored_count += 1
+                break
+    return restored_count
+
+
+def make_flight(n, seed=0):
+    """n 行の Treeview 表示値と、全行分の保存済みレコード（＋合計人数）を作る"""
+    rnd = random.Random(seed)
+    rows, records = [], []
+    for i in range(n):
+        m, f, k = rnd.randint(0, 2), rnd.randint(0, 2), rnd.randint(0, 1)
+        resv, name = f"9J-{100000 + i}", f"ﾔﾏﾀﾞ{i:04d}"
+        rows.append(["", str(i % 40 + 1), resv, name, str(m), str(f), str(k), str(m + f + k),
+                     "090-1234-5678", "ｼﾝｼﾞｭｸ", "ｵｵｻｶ", "262便", "", "", "", i // 40])
+        status = rnd.choice(["", "", "NS", "CXL", "CXL-CS"])
+        record = {"resv": resv, "name": name, "status": status}
+        if status.startswith("CXL"):
+            record["cxl_deduction"] = {"orig": {"男": m, "女": f, "子供": k, "合計": m + f + k},
+                                       "after": {"男": max(m - 1, 0), "女": f, "子供": k,
+                                                 "合計": max(m - 1, 0) + f + k}}
+        records.append(record)
+    records.append({"resv": "合計人数", "name": "", "status": "合計"})
+    return rows, {"records": records}
+
+
+def make_app(rows):
+    app = PDFPassengerSearchApp.__new__(PDFPassengerSearchApp)
+    app.tree = CountingTree()
+    app.cxl_deduction_map = {}
+    app._rows_clear()
+    for values in rows:
+        app._rows_insert(values)
+    app.tree.calls = 0
+    return app
+
+
+def run(restore, rows, data, repeat):
+    """(Treeview 呼び出し回数, 最良の所要時間 ms, 最終状態)"""
+    best = float("inf")
+    for _ in range(repeat):
+        app = make_app(rows)
+        t0 = time.perf_counter()
+        restore(app, data)
+        best = min(best, time.perf_counter() - t0)
+    state = [(list(app.tree.rows[iid]["values"]), app.tree.rows[iid]["tags"]) for iid in app.tree.order]
+    return app.tree.calls, best * 1000, state
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ステータス復元のベンチマーク")
+    parser.add_argument("--rows", type=int, default=400)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    rows, data = make_flight(args.rows)
+    old_calls, old_ms, old_state = run(legacy_restore_status_records, rows, data, args.repeat)
+    new_calls, new_ms, new_state = run(PDFPassengerSearchApp._restore_status_records, rows, data, args.repeat)
+    assert old_state == new_state, "復元後の値・タグが旧実装と一致しません"
+
+    print(f"rows={args.rows} records={len(data['records'])} (final values and tags match)")
+    print(f"legacy (scan tree per record) : {old_calls:7d} tree calls  {old_ms:7.2f} ms")
+    print(f"row model (lookup by resv)    : {new_calls:7d} tree calls  {new_ms:7.2f} ms  (x{old_ms / new_ms:.1f})")
+
+
+if __name__ == "__main__":
+    main()
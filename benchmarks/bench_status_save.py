@@ -0,0 +1,104 @@
+"""
+ステータス文書（<便名>_status.json）保存のベンチマーク。
+300人の便で、旧来の保存（既存文書を復号して合計人数だけ差し替えて暗号化・上書き、
+その後に乗客レコードを再度暗号化して上書き）と、save_status_document（1回だけ暗号化し、
+.tmp へ書いて fsync してから os.replace）を比べる。
+
+    python benchmarks/bench_status_save.py [--passengers 300] [--repeat 200]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from status_store import StatusCipher, build_status_document, save_status_document, load_status_document
+
+NAMES = ["ﾔﾏﾀﾞﾀﾛｳ", "ｽｽﾞｷﾊﾅｺ", "ｻﾄｳ", "ﾀﾅｶｲﾁﾛｳ"]
+
+
+def make_records(n, seed=0):
+    """write_all_status_to_pdf が作るのと同じ形の乗客レコードを n 件と合計人数レコードを作る"""
+    rnd = random.Random(seed)
+    records = []
+    sums = [0, 0, 0]
+    for i in range(n):
+        m, f, k = rnd.randint(0, 2), rnd.randint(0, 2), rnd.randint(0, 1)
+        status = rnd.choice(["", "", "", "", "NS", "CXL"])
+        record = {"resv": f"9J-{100000 + i}", "name": rnd.choice(NAMES), "status": status,
+                  "male": m, "female": f, "child": k, "total": m + f + k}
+        if status:
+            record["cxl_deduction"] = {"orig": {"男": m, "女": f, "子供": k, "合計": m + f + k},
+                                       "after": {"男": 0, "女": 0, "子供": 0, "合計": 0}}
+        else:
+            sums = [sums[0] + m, sums[1] + f, sums[2] + k]
+        records.append(record)
+    total = {"resv": "合計人数", "name": "", "status": "合計",
+             "after": {"男": sums[0], "女": sums[1], "子供": sums[2], "合計": sum(sums)}}
+    return records, total
+
+
+def legacy_save(json_path, flight_name, pdf_path, records, total_record, cipher):
+    """旧実装: ページループ内で合計人数だけ差し替えて保存し、最後に乗客レコードで上書き"""
+    if os.path.exists(json_path):
+        with open(json_path, "rb") as f:
+            data = cipher.decrypt_json(f.read())
+    else:
+        data = {"records": []}
+    data["records"] = [r for r in data.get("records", []) if r.get("resv") != "合計人数"]
+    data["records"].append(total_record)
+    with open(json_path, "wb") as f:
+        f.write(cipher.encrypt_json(data))
+
+    data = {"便名": flight_name, "pdf_path": pdf_path, "timestamp": datetime.now().isoformat(),
+            "records": list(records)}
+    with open(json_path, "wb") as f:
+        f.write(cipher.encrypt_json(data))
+
+
+def current_save(json_path, flight_name, pdf_path, records, total_record, cipher):
+    """現行: 合計人数を同梱した文書を1回だけ暗号化して置き換え保存"""
+    save_status_document(json_path, build_status_document(flight_name, pdf_path, records, total_record), cipher)
+
+
+def mean_ms(func, repeat):
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - t0) / repeat * 1000
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ステータス文書保存のベンチマーク")
+    parser.add_argument("--passengers", type=int, default=300)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args(argv)
+
+    records, total = make_records(args.passengers)
+    with tempfile.TemporaryDirectory() as tmp:
+        cipher = StatusCipher(os.path.join(tmp, "status_key.key"))
+        old_path = os.path.join(tmp, "262便_status_legacy.json")
+        new_path = os.path.join(tmp, "262便_status.json")
+        doc_args = ("262便", "10.17_保管用.pdf", records, total, cipher)
+
+        legacy_save(old_path, *doc_args)
+        current_save(new_path, *doc_args)
+        # 旧実装は合計人数を最後の上書きで失い、現行は乗客レコードの後ろに1件だけ持つ
+        assert load_status_document(old_path, cipher)["records"] == records
+        assert load_status_document(new_path, cipher)["records"] == records + [total]
+
+        old_ms = mean_ms(lambda: legacy_save(old_path, *doc_args), args.repeat)
+        new_ms = mean_ms(lambda: current_save(new_path, *doc_args), args.repeat)
+        size_kb = os.path.getsize(new_path) / 1024
+
+    print(f"passengers={args.passengers} runs={args.repeat} document={size_kb:.0f} KB (Fernet)")
+    print(f"legacy decrypt + encrypt x2 + two writes : {old_ms:7.2f} ms/save")
+    print(f"save_status_document (atomic, fsync)     : {new_ms:7.2f} ms/save  (x{old_ms / new_ms:.1f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,26 +3,383 @@ import tkinter as tk
 from tkinter import filedialog, ttk, messagebox
 import tkinter.font as tkfont
 import re, os, json
-from datetime import datetime
-from cryptography.fernet import Fernet
+import bisect
+import hashlib
+import queue
+import threading
+from status_store import get_encryption_key, get_status_cipher  # get_encryption_key は従来どおりここからも import 可
+from status_store import build_status_document, export_status_json
+from status_store import get_status_db, import_status_file, status_date_for_pdf
 
 CONFIG_PATH = "config.json"
 FLIGHT_LIST_PATH = "出力便名リスト.txt"
 MAX_PASSENGER_COUNT = 20
 
-def get_encryption_key(key_path="status_key.key"):
+# 保管用PDFの行索引で使う便名（PassengerLineParser の便名欄と同じ形、例: 262便）と予約番号
+FLIGHT_NAME_RE = re.compile(r"\d{1,3}便")
+RESV_IN_LINE_RE = re.compile(r"[A-Z0-9]{1,5}-[0-9]{3,}")
+
+def group_words_into_lines(words, tol=1.5):
+    """
+    page.get_text("words") の単語を y 座標で行にまとめる。
+    各単語は y0（小数1桁に丸め）から ±tol 以内の既存行のうち、先に作られた行に入る。
+    行の y を昇順リストで持ち二分探索するので、行数が多いページでも線形に近い。
+    戻り値: [(y, [word, ...]), ...]（y 昇順、行内は x0 昇順）
+    """
+    keys = []      # 行の y（昇順）
+    lines = {}     # y → 単語リスト
+    created = {}   # y → 作成順
+    for w in words:
+        y = round(w[1], 1)
+        lo = bisect.bisect_left(keys, y - tol - 1e-6)
+        hi = bisect.bisect_right(keys, y + tol + 1e-6)
+        found_y = None
+        for yy in keys[lo:hi]:
+            if abs(yy - y) <= tol and (found_y is None or created[yy] < created[found_y]):
+                found_y = yy
+        if found_y is not None:
+            lines[found_y].append(w)
+        else:
+            bisect.insort(keys, y)
+            created[y] = len(created)
+            lines[y] = [w]
+    return [(y, sorted(lines[y], key=lambda w: w[0])) for y in keys]
+
+
+class PageWords:
+    """
+    書き込み対象ページの単語を1回だけ抽出し、
+    予約番号 → 単語、行の人数欄（数値トークン）、「合計人数」行を引けるようにする。
+    """
+
+    RESV_RE = re.compile(r"\d[A-Z]{1,2}-\d{4,}")
+
+    def __init__(self, page):
+        self.words = page.get_text("words") or []
+
+        # 予約番号 → その予約番号を含む単語（出現順）
+        self.resv_words = {}
+        for w in self.words:
+            for resv in dict.fromkeys(self.RESV_RE.findall(w[4])):
+                self.resv_words.setdefault(resv, []).append(w)
+
+        # 数値トークン（行の中心yで昇順）
+        self.num_words = sorted(
+            (((w[1] + w[3]) / 2, i, w) for i, w in enumerate(self.words) if w[4].strip().isdigit()),
+            key=lambda t: t[0]
+        )
+        self.num_ys = [y for y, _, _ in self.num_words]
+        self._lines = None
+
+    def find_resv(self, resv):
+        """予約番号を含む単語のリスト（見つからなければ空）"""
+        hits = self.resv_words.get(resv)
+        if hits is None:
+            hits = [w for w in self.words if resv in w[4]]
+        return hits
+
+    def row_numbers(self, resv_word):
+        """予約番号の右側・同じ行（中心yの差 6pt 未満）にある数値トークンを x 順で返す"""
+        resv_end_x = resv_word[2]
+        line_y = (resv_word[1] + resv_word[3]) / 2
+        lo = bisect.bisect_right(self.num_ys, line_y - 6)
+        hi = bisect.bisect_left(self.num_ys, line_y + 6)
+        nums = [
+            (w[0], i, w) for y, i, w in self.num_words[lo:hi]
+            if w[0] > resv_end_x + 2 and abs(y - line_y) < 6
+        ]
+        nums.sort(key=lambda t: (t[0], t[1]))
+        return [w for _, _, w in nums]
+
+    def lines(self):
+        """group_words_into_lines の結果（初回のみ計算）"""
+        if self._lines is None:
+            self._lines = group_words_into_lines(self.words)
+        return self._lines
+
+    def bottom_of(self, resvs):
+        """予約番号のうち、ページ上でいちばん下にある単語の中心y（どれも見つからなければ None）"""
+        ys = [(w[1] + w[3]) / 2 for resv in resvs for w in self.find_resv(resv)]
+        return max(ys) if ys else None
+
+    def total_line(self, below_y=None):
+        """
+        「合計人数」を含む行の単語（x 昇順）。なければ None。
+        below_y を渡すと、その y より下にある最初の「合計人数」行（1ページに複数便の合計がある場合）。
+        """
+        for y, line_words in self.lines():
+            if below_y is not None and y <= below_y:
+                continue
+            if "合計人数" in "".join(w[4] for w in line_words).replace(" ", ""):
+                return line_words
+        return None
+
+
+class PassengerLineParser:
+    """
+    号車別明細表の1行を
+    (No, 予約番号, 氏名, 男, 女, 子供, 合計, 電話番号, 乗車地, 下車地, 便名, 旅行期間, 予約サイト, クラス)
+    のタプルに分解する。正規表現はすべて生成時に1回だけコンパイルする。
+    """
+
+    KNOWN_SITES = (
+        "ｼﾞｬﾑｼﾞｬﾑﾋｶｸ", "ｼﾞｬﾑｼﾞｬﾑﾗｲﾅｰ",
+        "ジャムジャムヒカク", "ジャムジャムライナー",
+        "WILLER", "ﾗｸﾃﾝ", "ラクテン"
+    )
+
+    def __init__(self):
+        self.ws_re = re.compile(r"\s+")
+        # 矢印・ダッシュの表記ゆれ（非ASCIIの str.translate は遅いので replace を連ねる）
+        self.dash_pairs = (("⇒", "→"), ("―", "-"), ("ー", "-"), ("−", "-"))
+        # 1️⃣ No(1〜2桁 任意) + 予約番号（数字1 + 英字1〜2 + '-' + 数字4+）
+        self.head_re = re.compile(r'^(?:(?P<no>\d{1,2}))?(?P<resv>\d[A-Z]{1,2}-\d{4,})')
+        # 2️⃣ 人数4桁（男女子計）
+        self.count_re = re.compile(r'(\d)(\d)(\d)(\d)')
+        # 3️⃣ 電話番号（先に一致したパターンを採用）
+        self.phone_res = (
+            re.compile(r'(?:0\d{1,4}|[1-9]\d{1,3})-\d{2,4}-\d{3,4}'),  # ハイフン付き (例: 336-5266-7188, 03-1234-5678)
+            re.compile(r'(?:0\d{9,10}|[1-9]\d{8,10})'),                # ハイフンなし (例: 15089178424)
+        )
+        self.non_digit_re = re.compile(r'\D')
+        # 4️⃣ 乗車地 → 下車地 + 便名
+        self.route_flight_re = re.compile(r'([^→]+)→([^→]+?)(\d{1,3}便)')
+        self.flight_re = re.compile(r'(\d{1,3}便)')
+        self.route_re = re.compile(r'([^→]+)→([^→]+)')
+        # 5️⃣ 旅行期間 / 6️⃣ クラス
+        self.period_re = re.compile(r'\d{2}/\d{2}/\d{2}-\d{2}/\d{2}')
+        self.class_re = re.compile(r'([0-9I][0-9])$')
+
+    def normalize_phone(self, raw: str) -> str:
+        """電話番号を統一フォーマットに整形"""
+        d = self.non_digit_re.sub('', raw)
+        if len(d) == 11:
+            return f"{d[:3]}-{d[3:7]}-{d[7:]}"
+        elif len(d) == 10:
+            return f"{d[:2]}-{d[2:6]}-{d[6:]}"
+        else:
+            return raw
+
+    def parse(self, line_text: str):
+        """1行を解析。予約番号・人数が読めない行は None"""
+        s = self.ws_re.sub("", line_text)
+        for old, new in self.dash_pairs:
+            s = s.replace(old, new)
+
+        m_head = self.head_re.match(s)
+        if not m_head:
+            return None
+        no = m_head.group("no") or ""
+        resv = m_head.group("resv")
+        idx = m_head.end()
+
+        m_cnt = self.count_re.search(s, idx)
+        if not m_cnt:
+            return None
+        name = s[idx: m_cnt.start()]
+        male, female, child, total = m_cnt.groups()
+        idx = m_cnt.end()
+
+        tel = ""
+        for pat in self.phone_res:
+            m = pat.search(s, idx)
+            if m:
+                tel = self.normalize_phone(m.group())
+                # 検出した電話部分を削除
+                s = s[:m.start()] + s[m.end():]
+                break
+
+        pickup, dropoff, flight = "", "", ""
+        m_route = self.route_flight_re.search(s, idx)
+        if m_route:
+            pickup, dropoff, flight = m_route.group(1), m_route.group(2), m_route.group(3)
+            idx = m_route.end()
+        else:
+            # 便名だけある場合
+            m_flight = self.flight_re.search(s, idx)
+            if m_flight:
+                flight = m_flight.group(1)
+                m_route2 = self.route_re.search(s[idx: m_flight.start()])
+                if m_route2:
+                    pickup, dropoff = m_route2.group(1), m_route2.group(2)
+                idx = m_flight.end()
+
+        period = ""
+        m_period = self.period_re.search(s, idx)
+        if m_period:
+            period = m_period.group(0)
+            idx = m_period.end()
+
+        site, bus_class = "", ""
+        rest = s[idx:]
+        for st in self.KNOWN_SITES:
+            if st in rest:
+                site = st
+                m_cls = self.class_re.search(rest.split(st, 1)[1])
+                if m_cls:
+                    bus_class = m_cls.group(1)
+                break
+        if not site:
+            m_cls = self.class_re.search(rest)
+            bus_class = m_cls.group(1) if m_cls else ""
+
+        return (
+            no, resv, name, male, female, child, total, tel,
+            pickup, dropoff, flight, period, site, bus_class
+        )
+
+    def parse_many(self, lines):
+        """複数行をまとめて解析。入力と同じ順で、解析できない行は None"""
+        parse = self.parse
+        return [parse(line) for line in lines]
+
+
+PASSENGER_LINE_PARSER = PassengerLineParser()
+
+
+def index_rows_by_flight(rows):
+    """
+    行 (page_index, 正規化行, ステータス, 解析タプル) を解析済みの便名欄（解析タプル[10]）で索引化。
+    便名を読めなかった行は "" に入れる。
+    """
+    by_flight = {}
+    for row in rows:
+        by_flight.setdefault(row[3][10], []).append(row)
+    return by_flight
+
+
+def rows_for_flight(index, normalized_flight):
+    """
+    便名で行を絞り込む（結果は PDF 上の順）。
+    「262便」のような便名は便名欄の辞書引き（便名欄が空の行だけ従来どおり部分一致）、
+    それ以外の表記は全行を部分一致で探す。
+    """
+    if not FLIGHT_NAME_RE.fullmatch(normalized_flight):
+        return [r for r in index["rows"] if normalized_flight in r[1]]
+
+    by_flight = index["by_flight"]
+    if not any(normalized_flight in r[1] for r in by_flight.get("", ())):
+        return by_flight.get(normalized_flight, [])
+    return [
+        r for r in index["rows"]
+        if r[3][10] == normalized_flight or (not r[3][10] and normalized_flight in r[1])
+    ]
+
+
+# _marked.pdf のカタログに記録する「元PDFの各ページ内容ハッシュ」のキー
+BASE_PAGE_HASHES_KEY = "PassengerStatusBaseHashes"
+
+
+def page_content_hash(page):
+    """
+    ページの描画内容（コンテンツストリーム）と用紙サイズのハッシュ（16桁）。
+    元PDFが同じページ数のまま作り直されたことを、ページ単位で見つけるのに使う。
+    """
+    h = hashlib.sha256(page.read_contents())
+    h.update(repr(tuple(page.rect)).encode("ascii"))
+    return h.hexdigest()[:16]
+
+
+def base_page_hashes(doc):
+    """
+    元PDFの全ページの page_content_hash。
+    保存のたびに全ページのコンテンツストリームを読む（100ページで約12 ms、benchmarks/bench_marked_save.py）。
+    """
+    return [page_content_hash(page) for page in doc]
+
+
+def read_base_page_hashes(doc):
+    """_marked.pdf に記録した元ページのハッシュ。記録がない（旧版で作った）場合は None"""
+    kind, value = doc.xref_get_key(doc.pdf_catalog(), BASE_PAGE_HASHES_KEY)
+    if kind != "string":
+        return None
+    try:
+        hashes = json.loads(value)
+    except ValueError:
+        return None
+    return hashes if isinstance(hashes, list) else None
+
+
+def write_base_page_hashes(doc, hashes):
+    """元ページのハッシュを _marked.pdf のカタログへ記録（増分保存でも残る）"""
+    doc.xref_set_key(doc.pdf_catalog(), BASE_PAGE_HASHES_KEY, fitz.get_pdf_str(json.dumps(hashes)))
+
+
+def format_count_change(before, after):
+    """変化がある場合のみ before→after、同じ値なら after のみ"""
+    try:
+        b = int(before)
+        a = int(after)
+        if b != a:
+            return f"{b}→{a}"
+        else:
+            return str(a)
+    except Exception:
+        if before != after:
+            return f"{before}→{after}"
+        else:
+            return str(after)
+
+
+def stored_status_row(record):
     """
-    暗号化キーを取得。存在しなければ一度だけ生成して保存。
-    すでに存在する場合は再利用。
+    status.db のレコード → 印字用の (status, vals, cxl_deduction)。
+    vals は検索でステータスを復元したときの Treeview の行と同じ形（CXL の人数欄は「元→後」）。
     """
-    if os.path.exists(key_path):
-        with open(key_path, "rb") as f:
-            key = f.read()
+    status = record.get("status", "")
+    ded = record.get("cxl_deduction") if status in ("CXL", "CXL-CS") else None
+    if isinstance(ded, dict):
+        orig, after = ded.get("orig", {}), ded.get("after", {})
+        counts = [format_count_change(orig.get(k, ""), after.get(k, "")) for k in ("男", "女", "子供", "合計")]
     else:
-        key = Fernet.generate_key()
-        with open(key_path, "wb") as f:
-            f.write(key)
-    return key
+        ded = {}
+        counts = [str(record.get(k, 0)) for k in ("male", "female", "child", "total")]
+    return status, [status, "", record.get("resv", ""), record.get("name", "")] + counts, ded
+
+
+def plan_restamp(index, flight_records, pages):
+    """
+    元PDFから作り直したページ（pages）に載っている便の保存済みステータスを、ページごとの印字内容にまとめる。
+    index: 保管用PDFの行索引（rows / by_flight）、flight_records: {便名: status.db のレコード}
+    戻り値: {page_index: [(便名, rows, cxl_map, totals, last_resvs), ...]}
+      rows は _stamp_status_rows と同じ (予約番号, status, 予約番号, 氏名, vals)。
+      totals（男, 女, 子供, 合計）は便の最終ページにだけ付き、それ以外は None。
+      last_resvs は最終ページにあるその便の予約番号（合計人数行を便ごとに選ぶのに使う）。
+    """
+    pages = set(pages)
+    plan = {}
+    for flight, records in flight_records.items():
+        page_by_resv = {}
+        for row in index["by_flight"].get(flight, ()):
+            page_by_resv.setdefault(row[3][1], row[0])
+        if not page_by_resv:
+            continue
+        last_page = max(page_by_resv.values())
+
+        by_page, cxl_map, totals = {}, {}, None
+        for record in records:
+            resv = record.get("resv", "")
+            if resv == "合計人数":
+                after = record.get("after") or {}
+                totals = tuple(int(after.get(k, 0) or 0) for k in ("男", "女", "子供", "合計"))
+                continue
+            page_index = page_by_resv.get(resv)
+            if page_index not in pages or record.get("status") not in ("NS", "CXL", "CXL-CS"):
+                continue
+            status, vals, ded = stored_status_row(record)
+            by_page.setdefault(page_index, []).append((resv, status, resv, record.get("name", ""), vals))
+            if ded:
+                cxl_map[resv] = ded
+        if totals is not None and last_page in pages:
+            by_page.setdefault(last_page, [])
+
+        last_resvs = [resv for resv, p in page_by_resv.items() if p == last_page]
+        for page_index, rows in by_page.items():
+            is_last = page_index == last_page
+            plan.setdefault(page_index, []).append(
+                (flight, rows, cxl_map, totals if is_last else None, last_resvs if is_last else [])
+            )
+    return plan
 
 
 class PDFPassengerSearchApp:
@@ -30,6 +387,13 @@ class PDFPassengerSearchApp:
     LINE_MARGIN = 1.5
     TV_COL_MIN, TV_COL_MAX, TV_COL_PAD = 60, 180, 18
 
+    # 便名検索の結果反映（root.after の間隔 ms / 1回に Treeview へ入れる行数）
+    SEARCH_POLL_MS = 30
+    SEARCH_BATCH_ROWS = 50
+
+    # _marked.pdf が元PDFのこの倍数より大きくなったら、増分保存をやめて全体を書き直す
+    MARKED_PDF_MAX_GROWTH = 3.0
+
     # 🔧 ステータス描画位置オフセット設定（単位: pt）
     STATUS_OFFSET_X = 170   # ← 予約番号の左側にずらす距離（マイナスで左、プラスで右）
     STATUS_OFFSET_Y = 15    # ↑ 縦方向の調整（マイナスで上、プラスで下）
@@ -74,6 +438,14 @@ class PDFPassengerSearchApp:
         #tk.Button(toolbar, text="検索", command=self.search_by_flight_name).grid(row=0, column=2, padx=6)
         tk.Button(toolbar, text="送信（PDFに書き込み）", command=self.write_all_status_to_pdf).grid(row=0, column=3, padx=6)
 
+        # ▼ 検索中インジケーター（検索中だけ表示）
+        self.search_progress = ttk.Progressbar(toolbar, mode="determinate", length=140)
+        self.search_progress.grid(row=0, column=4, padx=(12, 4))
+        self.search_progress_label = tk.Label(toolbar, text="")
+        self.search_progress_label.grid(row=0, column=5, sticky="w")
+        self.search_progress.grid_remove()
+        self.search_progress_label.grid_remove()
+
         # ---------------- Treeview ----------------
         columns = (
             "Status", "№", "予約番号", "氏名", "男", "女", "子供", "合計",
@@ -92,72 +464,24 @@ class PDFPassengerSearchApp:
         self.footer_canvas = tk.Canvas(root, height=24, bg="#f4f4f4", highlightthickness=0)
         self.footer_canvas.grid(row=2, column=0, sticky="ew", padx=6, pady=(0, 4))
 
-        # 描画テキストIDを保持
+        # 描画アイテムID（背景・ラベル・各列の合計）。一度だけ作り、以後は位置と文字だけ更新
         self.footer_texts = {}
+        self.footer_sums = [0, 0, 0, 0]   # 男, 女, 子供, 合計（行モデルから差分更新）
+        self.row_counts = {}              # iid → (男, 女, 子供, 合計)
+        self._footer_layout = None        # 直近の列幅（変わっていなければ移動しない）
+        self._footer_pending = False
+        self._create_footer_items()
 
         # __init__ の末尾あたりに追加
         self.baseline_snapshot = {}   # 検索直後 or 保存直後の基準
+        self.dirty_resvs = set()      # 基準から変わっている予約番号（変更ジャーナル）
         self.unsaved_changes = False
 
 
-        def update_footer_position():
-            """Treeview列幅を取得してフッターにラベルを再描画"""
-            self.footer_canvas.delete("all")
-
-            # Treeviewの列幅を取得
-            cols = self.tree["columns"]
-            x_offset = 0
-            col_positions = []
-            for col in cols:
-                w = self.tree.column(col, "width")
-                col_positions.append((col, x_offset, w))
-                x_offset += w
-
-            # 背景塗り（視覚的なバー）
-            self.footer_canvas.create_rectangle(0, 0, x_offset, 24, fill="#f4f4f4", outline="#cccccc")
-
-            # 「合計人数」ラベル（男列の左隣に配置）
-            male_col_x = next((pos for (c, pos, _) in col_positions if c == "男"), 0)
-            self.footer_canvas.create_text(
-                male_col_x - 60, 12, text="合計人数", anchor="w", font=("Arial", 10, "bold")
-            )
-
-            # 値取得
-            total_m = total_f = total_k = total_sum = 0
-            for iid in self.tree.get_children(""):
-                vals = self.tree.item(iid, "values")
-                if len(vals) < 8:
-                    continue
-                def safe_int(v):
-                    if isinstance(v, str) and "→" in v:
-                        try:
-                            return int(v.split("→")[-1])
-                        except:
-                            return 0
-                    return int(v) if str(v).isdigit() else 0
-                total_m += safe_int(vals[4])
-                total_f += safe_int(vals[5])
-                total_k += safe_int(vals[6])
-                total_sum += safe_int(vals[7])
-
-            # 各列の中央に数値を配置
-            for col, x, w in col_positions:
-                cx = x + w / 2
-                if col == "男":
-                    self.footer_canvas.create_text(cx, 12, text=str(total_m), font=("Arial", 10, "bold"))
-                elif col == "女":
-                    self.footer_canvas.create_text(cx, 12, text=str(total_f), font=("Arial", 10, "bold"))
-                elif col == "子供":
-                    self.footer_canvas.create_text(cx, 12, text=str(total_k), font=("Arial", 10, "bold"))
-                elif col == "合計":
-                    self.footer_canvas.create_text(cx, 12, text=str(total_sum), font=("Arial", 10, "bold"), fill="#000000")
-
-        # 再描画イベント（列幅変更・ウィンドウサイズ変更時）
-        self.tree.bind("<Configure>", lambda e: update_footer_position())
-        root.bind("<Configure>", lambda e: update_footer_position())
-
-        # 手動更新用にメソッドとして登録
-        self.update_footer_totals = update_footer_position
+        # 再描画イベント（列幅変更・ウィンドウサイズ変更時）。連続発火は after_idle で1回にまとめる
+        self.tree.bind("<Configure>", lambda e: self.update_footer_totals())
+        root.bind("<Configure>", lambda e: self.update_footer_totals())
+        self.tree.bind("<B1-Motion>", lambda e: self.update_footer_totals(), add="+")  # 列幅ドラッグ中
         # ▲▲▲ 追加ここまで ▲▲▲
 
         # コンテキストメニュー（右クリック）
@@ -175,6 +499,25 @@ class PDFPassengerSearchApp:
         self.cxl_deduction_map = {}
         self.current_pdf_path = None
 
+        # 行モデル：iid → 表示値、予約番号 → iid（Treeview への問い合わせを減らす）
+        self.row_values = {}
+        self.iid_by_resv = {}
+
+        # 列幅自動調整：文字列 → 幅(px) キャッシュ、行ごとの幅、未計測の行、適用済みの列幅
+        self._measure_font_name = None
+        self._text_px_cache = {}
+        self._row_px = {}
+        self._autosize_dirty = set()
+        self._col_widths = {}
+
+        # 保管用PDFの行索引 {pdf_path: ((size, mtime_ns), {"rows": [...], "by_flight": {...}})}
+        self._page_text_index = {}
+
+        # 便名検索（ワーカースレッド）の世代番号・状態
+        self._search_gen = 0
+        self._search_running = False
+        self._search_hits = 0
+
         self.log_text.insert(tk.END, f"[設定] PDFフォルダ: {self.pdf_folder}\n")
 
 
@@ -191,8 +534,10 @@ class PDFPassengerSearchApp:
             return
 
         # 未書き込みフラグが立っているか？（is_dirty は既存実装を使用）
-        self._update_dirty_flag()  # ← 先に最新の差分を再計算
-        if self.unsaved_changes:
+        # 検索途中は表示が揃っていないので比較しない（途中の検索は取り消される）
+        if not self._search_running:
+            self._update_dirty_flag()  # ← 先に最新の差分を再計算
+        if self.unsaved_changes and not self._search_running:
             ans = messagebox.askyesno(
                 "確認",
                 f"変更内容がまだ書き込まれていません。\n\n"
@@ -228,38 +573,98 @@ class PDFPassengerSearchApp:
                 return 0
         return int(v) if str(v).isdigit() else 0
 
+    # ---------------- 行モデル（Treeview と同じ値を Python 側で保持） ----------------
+    def _rows_clear(self):
+        """全行削除（Treeview と行モデルの両方）"""
+        self.tree.delete(*self.tree.get_children())
+        self.row_values = {}
+        self.iid_by_resv = {}
+        self.row_counts = {}
+        self.footer_sums = [0, 0, 0, 0]
+        self._row_px = {}
+        self._autosize_dirty = set()
+
+    def _rows_insert(self, values):
+        """行を末尾に追加して iid を返す"""
+        iid = self.tree.insert("", "end", values=values)
+        self.row_values[iid] = list(values)
+        self._update_row_counts(iid, values)
+        self._autosize_dirty.add(iid)
+        if len(values) > 2 and values[2]:
+            self.iid_by_resv.setdefault(values[2], iid)
+        return iid
+
+    def _row_get(self, iid):
+        """行の値（コピー）。Tcl への問い合わせはしない"""
+        vals = self.row_values.get(iid)
+        return list(vals) if vals is not None else list(self.tree.item(iid, "values"))
+
+    def _row_set(self, iid, values, tags=None):
+        """行の値を更新（tags=None ならタグはそのまま）"""
+        self.row_values[iid] = list(values)
+        self._update_row_counts(iid, values)
+        self._journal_row(values)
+        self._autosize_dirty.add(iid)
+        if tags is None:
+            self.tree.item(iid, values=values)
+        else:
+            self.tree.item(iid, values=values, tags=tags)
+
+    def _rows_items(self):
+        """表示順に (iid, values) を返す"""
+        return [(iid, self.row_values.get(iid) or self.tree.item(iid, "values"))
+                for iid in self.tree.get_children("")]
+
+    def _snapshot_entry(self, vals):
+        """1行分の比較用データ {status,male,female,child,total}"""
+        return {
+            "status": vals[0] or "",
+            "male": self._safe_int_view(vals[4]),
+            "female": self._safe_int_view(vals[5]),
+            "child": self._safe_int_view(vals[6]),
+            "total": self._safe_int_view(vals[7]),
+        }
+
     def _make_snapshot_from_tree(self):
         """
         現在のTreeview内容を {resv: {status,male,female,child,total}} で返す。
         ※ resv（予約番号）をキーにするので行順やiidが変わってもOK
         """
         snap = {}
-        for iid in self.tree.get_children(""):
-            vals = self.tree.item(iid, "values")
+        for iid, vals in self._rows_items():
             if len(vals) < 8:
                 continue
-            resv   = vals[2]
-            status = vals[0] or ""
-            male   = self._safe_int_view(vals[4])
-            female = self._safe_int_view(vals[5])
-            child  = self._safe_int_view(vals[6])
-            total  = self._safe_int_view(vals[7])
-            snap[resv] = {"status": status, "male": male, "female": female, "child": child, "total": total}
+            snap[vals[2]] = self._snapshot_entry(vals)
         return snap
 
+    def _reset_baseline(self):
+        """現在の表示を基準にして変更ジャーナルを空にする（検索直後・保存直後）"""
+        self.baseline_snapshot = self._make_snapshot_from_tree()
+        self.dirty_resvs = set()
+        self.unsaved_changes = False
+
+    def _journal_row(self, values):
+        """編集された行を基準と比べ、変わっていればジャーナルに記録・元に戻っていれば外す"""
+        if len(values) < 8:
+            return
+        resv = values[2]
+        if self._snapshot_entry(values) != self.baseline_snapshot.get(resv):
+            self.dirty_resvs.add(resv)
+        else:
+            self.dirty_resvs.discard(resv)
+
     def _update_dirty_flag(self):
         """
-        現在の表示と baseline_snapshot を比較して unsaved_changes を更新。
+        変更ジャーナルから unsaved_changes を更新。
         '元の状態に戻した' 場合は False になる。
         """
-        current = self._make_snapshot_from_tree()
-        self.unsaved_changes = (current != getattr(self, "baseline_snapshot", {}))
+        self.unsaved_changes = bool(self.dirty_resvs)
 
 
     # どこでも良いですが class 内のユーティリティ群の近くに
     def _apply_ns_for_item(self, item_id):
         """選択行を NS として '元→0' 表示に更新（内部数値は safe_int で解釈）"""
-        values = list(self.tree.item(item_id, "values"))
+        values = self._row_get(item_id)
         if not values or len(values) < 8:
             return
         # いま表示されている数値（素の数値 / '2→1' の後ろ側など）を基準に NS 化
@@ -279,34 +684,64 @@ class PDFPassengerSearchApp:
         values[7] = f"{orig_t}→0" if orig_t > 0 else "0"
 
         # NS は色タグだけ（減算情報は保持不要）
-        self.tree.item(item_id, values=values, tags=('status_blue',))
+        self._row_set(item_id, values, tags=('status_blue',))
 
 
-    def _safe_int_for_total(self, v: str) -> int:
-            """セル表示が '2→1' のような書式でも後値を拾って整数化。非数は 0。"""
-            if isinstance(v, str) and "→" in v:
-                try:
-                    return int(v.split("→")[-1])
-                except Exception:
-                    return 0
-            return int(v) if str(v).isdigit() else 0
+    # ---------------- 固定フッター（合計人数） ----------------
+    FOOTER_COLS = ("男", "女", "子供", "合計")
+
+    def _create_footer_items(self):
+        """フッターの描画アイテムを作成（位置は _redraw_footer で合わせる）"""
+        c = self.footer_canvas
+        font = ("Arial", 10, "bold")
+        self.footer_texts["bg"] = c.create_rectangle(0, 0, 0, 24, fill="#f4f4f4", outline="#cccccc")
+        self.footer_texts["label"] = c.create_text(0, 12, text="合計人数", anchor="w", font=font)
+        for col in self.FOOTER_COLS:
+            self.footer_texts[col] = c.create_text(0, 12, text="0", font=font, fill="#000000")
 
     def update_footer_totals(self):
-        """Treeview を走査して固定フッターの合計を更新。"""
-        total_m = total_f = total_k = total_sum = 0
-        for iid in self.tree.get_children(""):
-            vals = self.tree.item(iid, "values")
-            if len(vals) < 8:
-                continue
-            total_m   += self._safe_int_for_total(vals[4])
-            total_f   += self._safe_int_for_total(vals[5])
-            total_k   += self._safe_int_for_total(vals[6])
-            total_sum += self._safe_int_for_total(vals[7])
+        """フッターの再描画を予約。何度呼ばれてもアイドル時に1回だけ描画する"""
+        if self._footer_pending:
+            return
+        self._footer_pending = True
+        self.root.after_idle(self._redraw_footer)
+
+    def _redraw_footer(self):
+        """列幅が変わったときだけ既存アイテムを移動し、合計値（footer_sums）を表示"""
+        self._footer_pending = False
+        c = self.footer_canvas
+        if not c.winfo_exists():
+            return
+
+        layout = tuple((col, self.tree.column(col, "width")) for col in self.tree["columns"])
+        if layout != self._footer_layout:
+            self._footer_layout = layout
+            x_offset = 0
+            col_pos = {}
+            for col, w in layout:
+                col_pos[col] = (x_offset, w)
+                x_offset += w
+            c.coords(self.footer_texts["bg"], 0, 0, x_offset, 24)
+            # 「合計人数」ラベル（男列の左隣に配置）
+            c.coords(self.footer_texts["label"], col_pos.get("男", (0, 0))[0] - 60, 12)
+            # 各列の中央に数値を配置
+            for col in self.FOOTER_COLS:
+                x, w = col_pos.get(col, (0, 0))
+                c.coords(self.footer_texts[col], x + w / 2, 12)
 
-        self.sum_male.config(text=str(total_m))
-        self.sum_female.config(text=str(total_f))
-        self.sum_child.config(text=str(total_k))
-        self.sum_total.config(text=str(total_sum))
+        for col, total in zip(self.FOOTER_COLS, self.footer_sums):
+            c.itemconfigure(self.footer_texts[col], text=str(total))
+
+    def _update_row_counts(self, iid, values):
+        """行の人数（'2→1' は後ろ側）を footer_sums へ差分で反映"""
+        if len(values) >= 8:
+            new = tuple(self._safe_int_view(v) for v in values[4:8])
+        else:
+            new = (0, 0, 0, 0)
+        old = self.row_counts.get(iid, (0, 0, 0, 0))
+        if new != old:
+            self.footer_sums = [t + n - o for t, n, o in zip(self.footer_sums, new, old)]
+            self.row_counts[iid] = new
 
     # ---------------- 設定ファイル読込 ----------------
     def load_config(self):
@@ -358,29 +793,58 @@ class PDFPassengerSearchApp:
 
     # ---------------- Treeview列自動調整 ----------------
     def autosize_tree_columns(self):
+        """
+        列幅を内容に合わせる。前回から追加・編集された行だけを測り（文字列ごとの幅はキャッシュ）、
+        列の最大幅が変わった列だけ幅を更新する。
+        """
         tv = self.tree
         try:
             style = ttk.Style()
             tv_font_name = style.lookup("Treeview", "font") or "TkDefaultFont"
             f = tkfont.nametofont(tv_font_name)
         except Exception:
+            tv_font_name = "TkDefaultFont"
             f = tkfont.nametofont("TkDefaultFont")
 
-        for col in tv["columns"]:
-            max_px = f.measure(col)
-            for iid in tv.get_children(""):
-                val = tv.set(iid, col)
-                max_px = max(max_px, f.measure(str(val)))
-            width = max(self.TV_COL_MIN, min(max_px + self.TV_COL_PAD, self.TV_COL_MAX))
-            tv.column(col, width=int(width))
+        # フォントが変わったら測り直し
+        if tv_font_name != self._measure_font_name:
+            self._measure_font_name = tv_font_name
+            self._text_px_cache = {}
+            self._autosize_dirty.update(self._row_px)
+
+        def measure(text):
+            px = self._text_px_cache.get(text)
+            if px is None:
+                px = self._text_px_cache[text] = f.measure(text)
+            return px
+
+        cols = tv["columns"]
+        for iid in self._autosize_dirty:
+            vals = self.row_values.get(iid)
+            if vals is None:
+                continue
+            self._row_px[iid] = tuple(measure(str(v)) for v in vals[:len(cols)])
+        self._autosize_dirty = set()
+
+        for i, col in enumerate(cols):
+            max_px = measure(col)
+            for px in self._row_px.values():
+                if i < len(px) and px[i] > max_px:
+                    max_px = px[i]
+            width = int(max(self.TV_COL_MIN, min(max_px + self.TV_COL_PAD, self.TV_COL_MAX)))
+            if self._col_widths.get(col) != width:
+                self._col_widths[col] = width
+                tv.column(col, width=width)
 
     # ---------------- コンテキストメニュー ----------------
     def show_context_menu(self, event):
+        if self._search_running:
+            return  # 検索結果の反映中は編集不可
         row_id = self.tree.identify_row(event.y)
         if not row_id:
             return
         self.tree.selection_set(row_id)
-        values = list(self.tree.item(row_id, "values"))
+        values = self._row_get(row_id)
         current_status = values[0] if values else ""
 
         self.menu.delete(0, tk.END)
@@ -413,7 +877,7 @@ class PDFPassengerSearchApp:
 
         # 既存：CXL を選ぶとダイアログ、などの処理
         for item in selected:
-            values = list(self.tree.item(item, "values"))
+            values = self._row_get(item)
             if not values:
                 continue
             values[0] = status
@@ -425,18 +889,18 @@ class PDFPassengerSearchApp:
             else:
                 tag = ()
                 
-            self.tree.item(item, values=values, tags=tag)
+            self._row_set(item, values, tags=tag)
         self.log_text.insert(tk.END, f"[STATUS更新] {status} を {len(selected)}件に設定\n")
 
 
     def clear_status(self, item_id):
         """ステータス解除処理"""
-        values = list(self.tree.item(item_id, "values"))
+        values = self._row_get(item_id)
         if not values:
             return
         prev = values[0]
         values[0] = ""
-        self.tree.item(item_id, values=values, tags=())
+        self._row_set(item_id, values, tags=())
         if item_id in self.cxl_deduction_map:
             del self.cxl_deduction_map[item_id]
         self.log_text.insert(tk.END, f"[解除] {values[3]} の {prev} を解除しました\n")
@@ -464,7 +928,7 @@ class PDFPassengerSearchApp:
         restored = 0
 
         for item_id in selected:
-            values = list(self.tree.item(item_id, "values"))
+            values = self._row_get(item_id)
             if len(values) < 4:
                 continue
 
@@ -491,20 +955,9 @@ class PDFPassengerSearchApp:
             words = page.get_text("words")
 
             # --- 該当ページだけで行再構築 ---
-            lines_by_y = {}
-            for w in words:
-                x0, y0, x1, y1, text = w[:5]
-                y = round(y0, 1)
-                found_y = next((yy for yy in lines_by_y if abs(yy - y) <= 1.5), None)
-                if found_y is not None:
-                    lines_by_y[found_y].append((x0, text))
-                else:
-                    lines_by_y[y] = [(x0, text)]
-
             found_line = None
-            for y in sorted(lines_by_y.keys()):
-                line_items = sorted(lines_by_y[y], key=lambda x: x[0])
-                raw_line = "".join([t for _, t in line_items])
+            for y, line_words in group_words_into_lines(words):
+                raw_line = "".join(w[4] for w in line_words)
                 norm_line = self.normalize_text(raw_line)
 
                 # ▶ 予約番号でヒット判定（normalize済みで比較）
@@ -524,7 +977,7 @@ class PDFPassengerSearchApp:
 
             # --- TreeView を “ステータス空” かつ “同じページ番号” で置き換え
             new_values = [""] + parsed + [page_index]
-            self.tree.item(item_id, values=new_values, tags=())
+            self._row_set(item_id, new_values, tags=())
 
             # CXL 減算データも除去
             if item_id in self.cxl_deduction_map:
@@ -564,7 +1017,7 @@ class PDFPassengerSearchApp:
         if not selected:
             return
         item_id = selected[0]
-        values = list(self.tree.item(item_id, "values"))
+        values = self._row_get(item_id)
         if not values:
             return
 
@@ -667,9 +1120,9 @@ class PDFPassengerSearchApp:
             # TreeView更新
             #self.tree.item(item_id, values=values, tags=('status_red',))
             if status == "CXL_CS":
-                self.tree.item(item_id, values=values, tags=('status_cxl_cs',))
+                self._row_set(item_id, values, tags=('status_cxl_cs',))
             else:
-                self.tree.item(item_id, values=values, tags=('status_red',))
+                self._row_set(item_id, values, tags=('status_red',))
                 
             self.log_text.insert(
                 tk.END,
@@ -725,120 +1178,69 @@ class PDFPassengerSearchApp:
         """
         号車別明細表の1行から各項目を抽出。
         電話番号が「0」以外で始まる(例: 336-5266-7188, 15089178424)ケースにも対応。
+        解析本体はモジュール共通の PASSENGER_LINE_PARSER。
         """
-        import re
-
-        def normalize_phone(raw: str) -> str:
-            """電話番号を統一フォーマットに整形"""
-            d = re.sub(r'\D', '', raw)
-            if len(d) == 11:
-                return f"{d[:3]}-{d[3:7]}-{d[7:]}"
-            elif len(d) == 10:
-                return f"{d[:2]}-{d[2:6]}-{d[6:]}"
-            else:
-                return raw
+        row = PASSENGER_LINE_PARSER.parse(line_text)
+        return list(row) if row else []
 
-        s = re.sub(r"\s+", "", line_text)
-        s = s.replace("⇒", "→").replace("―", "-").replace("ー", "-").replace("−", "-")
 
-        # 1️⃣ No(1〜2桁 任意) + 予約番号（数字1 + 英字1〜2 + '-' + 数字4+）
-        m_head = re.match(r'^(?:(?P<no>\d{1,2}))?(?P<resv>\d[A-Z]{1,2}-\d{4,})', s)
-        if not m_head:
-            return []
-        no = m_head.group("no") or ""
-        resv = m_head.group("resv")
-        idx = m_head.end()
-
-        # 2️⃣ 氏名 → 人数4桁（男女子計）
-        m_cnt = re.search(r'(\d)(\d)(\d)(\d)', s[idx:])
-        if not m_cnt:
-            return []
-        name = s[idx: idx + m_cnt.start()]
-        male, female, child, total = m_cnt.groups()
-        idx += m_cnt.end()
-
-        # 3️⃣ 電話番号抽出（拡張版）
-        tel = ""
-        # ハイフン付き、もしくは11桁数字、または3〜4桁始まり
-        phone_patterns = [
-            r'(?:0\d{1,4}|[1-9]\d{1,3})-\d{2,4}-\d{3,4}',  # ハイフン付き (例: 336-5266-7188, 03-1234-5678)
-            r'(?:0\d{9,10}|[1-9]\d{8,10})'                # ハイフンなし (例: 15089178424)
-        ]
-        phone_match = None
-        for p in phone_patterns:
-            m = re.search(p, s[idx:])
-            if m:
-                phone_match = m
-                break
-
-        if phone_match:
-            tel = normalize_phone(phone_match.group())
-            # 検出した電話部分を削除
-            start, end = idx + phone_match.start(), idx + phone_match.end()
-            s = s[:start] + s[end:]
 
-        # 4️⃣ 乗車地 → 下車地 + 便名
-        pickup, dropoff, flight = "", "", ""
-        m_route = re.search(r'([^→]+)→([^→]+?)(\d{1,3}便)', s[idx:])
-        if m_route:
-            pickup, dropoff, flight = m_route.group(1), m_route.group(2), m_route.group(3)
-            idx = idx + m_route.end()
-        else:
-            # 便名だけある場合
-            m_flight = re.search(r'(\d{1,3}便)', s[idx:])
-            if m_flight:
-                flight = m_flight.group(1)
-                before = s[idx: idx + m_flight.start()]
-                m_route2 = re.search(r'([^→]+)→([^→]+)', before)
-                if m_route2:
-                    pickup, dropoff = m_route2.group(1), m_route2.group(2)
-                idx = idx + m_flight.end()
+    def _get_page_text_index(self, pdf_path, log=None):
+        """
+        保管用PDF1件分の乗客行を解析して索引化（便名 → 行リスト）。
+        ファイルのサイズ・更新日時が変わるまでは再解析しない。
+        行は (page_index, 正規化行, ステータス, PASSENGER_LINE_PARSER の解析タプル)。
+        """
+        st = os.stat(pdf_path)
+        sig = (st.st_size, st.st_mtime_ns)
+        cached = self._page_text_index.get(pdf_path)
+        if cached and cached[0] == sig:
+            return cached[1]
+
+        rows = []
+        doc = fitz.open(pdf_path)
+        try:
+            for page_index, page in enumerate(doc):
+                words = page.get_text("words")
 
-        # 5️⃣ 旅行期間
-        period = ""
-        m_period = re.search(r'\d{2}/\d{2}/\d{2}-\d{2}/\d{2}', s[idx:])
-        if m_period:
-            period = m_period.group(0)
-            idx += m_period.end()
+                # y座標で行を再構築し、予約番号（9J-xxxxxxなど）を含む行のみ採用
+                norm_lines = []
+                for y, line_words in group_words_into_lines(words):
+                    norm_line = self.normalize_text("".join(w[4] for w in line_words))
+                    if RESV_IN_LINE_RE.search(norm_line):
+                        norm_lines.append(norm_line)
 
-        # 6️⃣ サイト + クラス
-        site, bus_class = "", ""
-        rest = s[idx:]
-        known_sites = [
-            "ｼﾞｬﾑｼﾞｬﾑﾋｶｸ", "ｼﾞｬﾑｼﾞｬﾑﾗｲﾅｰ",
-            "ジャムジャムヒカク", "ジャムジャムライナー",
-            "WILLER", "ﾗｸﾃﾝ", "ラクテン"
-        ]
-        for st in known_sites:
-            if st in rest:
-                site = st
-                after = rest.split(st, 1)[1]
-                m_cls = re.search(r'([0-9I][0-9])$', after)
-                if m_cls:
-                    bus_class = m_cls.group(1)
-                break
-        if not site:
-            m_cls = re.search(r'([0-9I][0-9])$', rest)
-            bus_class = m_cls.group(1) if m_cls else ""
+                # 🔹ページ単位でまとめて解析
+                for norm_line, parsed in zip(norm_lines, PASSENGER_LINE_PARSER.parse_many(norm_lines)):
+                    if not parsed:
+                        continue
 
-        return [
-            no, resv, name, male, female, child, total, tel,
-            pickup, dropoff, flight, period, site, bus_class
-        ]
+                    # 🔹 ステータス自動判定（NS/CXL）
+                    status = ""
+                    if re.search(r"NS(?![A-Za-z0-9])", norm_line):
+                        status = "NS"
+                    elif re.search(r"CXL(?![A-Za-z0-9])", norm_line):
+                        status = "CXL"
 
+                    rows.append((page_index, norm_line, status, parsed))
+        finally:
+            doc.close()
 
+        index = {"rows": rows, "by_flight": index_rows_by_flight(rows)}
+        self._page_text_index[pdf_path] = (sig, index)
+        msg = f"[INFO] 行索引を作成: {os.path.basename(pdf_path)}（{len(rows)} 行）"
+        if log is not None:
+            log(msg)
+        else:
+            self.log_text.insert(tk.END, msg + "\n")
+        return index
 
     def search_by_flight_name(self):
-        # search_by_flight_name() の先頭に追加（便名チェックの前でOK）
-        #self._update_dirty_flag()  # ← 先に最新の差分を再計算
-        #if self.unsaved_changes:
-            #proceed = messagebox.askyesno("確認", "未保存の変更があります。\n保存せずに便名を再検索しますか？", parent=self.root)
-            #if not proceed:
-            #    self.log_text.insert(tk.END, "[CANCEL] 便名検索を中止（未保存の変更あり）\n")
-            #    return
-
-
-        """コンボボックスの便名（例：262号車）を基に、PDF内で該当便の行を抽出して分割表示"""
+        """
+        コンボボックスの便名（例：262号車）を基に、PDF内で該当便の行を抽出して分割表示。
+        PDF解析・ステータスJSON復号はワーカースレッドで行い、行は root.after で少しずつ反映する。
+        検索中に便名が変わった場合は、古い検索を取り消して新しい検索を始める。
+        """
         flight_keyword = self.flight_cb.get().strip()
         if not flight_keyword:
             messagebox.showwarning("警告", "便名（号車）を選択してください。", parent=self.root)
@@ -848,236 +1250,294 @@ class PDFPassengerSearchApp:
         normalized_flight = self.normalize_text(flight_keyword)
         normalized_flight = re.sub(r"号車$", "便", normalized_flight)
 
-        self.tree.delete(*self.tree.get_children())
+        # 世代番号を進めると、実行中のワーカー・反映処理は自分で終了する
+        self._search_gen += 1
+        gen = self._search_gen
+        self._search_running = True
+        self._search_hits = 0
+        self.current_pdf_path = None
+
+        self._rows_clear()
+        self.cxl_deduction_map = {}
         self.log_text.insert(tk.END, f"\n--- [便名検索] {normalized_flight} ---\n")
 
-        # ✅ 「保管用」を含むPDFのみ対象、かつ _marked.pdf は除外
-        candidate_pdfs = [
-            os.path.join(self.pdf_folder, f)
-            for f in os.listdir(self.pdf_folder)
-            if f.lower().endswith(".pdf")
-            and "保管用" in f
-            and "_marked" not in f.lower()  # ← ★ 追加行：_marked.pdf除外
-        ]
+        self.search_progress.configure(value=0, maximum=1)
+        self.search_progress_label.config(text="検索中…")
+        self.search_progress.grid()
+        self.search_progress_label.grid()
 
-        total_hits = 0
-        matched_pdf = None  # ✅ 一致したPDFを記録して後で使用
+        results = queue.Queue()
+        threading.Thread(
+            target=self._search_worker, args=(gen, normalized_flight, results), daemon=True
+        ).start()
+        self.root.after(self.SEARCH_POLL_MS, self._poll_search_results, gen, normalized_flight, results)
 
-        for pdf_path in candidate_pdfs:
-            try:
-                doc = fitz.open(pdf_path)
-            except Exception as e:
-                self.log_text.insert(tk.END, f"[WARN] {pdf_path} を開けません: {e}\n")
-                continue
+    def _search_worker(self, gen, normalized_flight, results):
+        """
+        検索ワーカー（Tk には触らない）。結果は results へ
+        ("log", msg) / ("progress", 済, 全体) / ("rows", pdf_path, rows) / ("done", status_json) で送る。
+        """
+        def log(msg):
+            results.put(("log", msg))
 
-            for page_index, page in enumerate(doc):
-                words = page.get_text("words")
+        try:
+            # 旧版キーを引き継いだ場合はこの画面のログに出す
+            get_status_cipher().load(log)
+
+            # ✅ 「保管用」を含むPDFのみ対象、かつ _marked.pdf は除外
+            candidate_pdfs = [
+                os.path.join(self.pdf_folder, f)
+                for f in os.listdir(self.pdf_folder)
+                if f.lower().endswith(".pdf")
+                and "保管用" in f
+                and "_marked" not in f.lower()  # ← ★ 追加行：_marked.pdf除外
+            ]
 
-                # y座標で行を再構築
-                lines_by_y = {}
-                for w in words:
-                    x0, y0, x1, y1, text = w[:5]
-                    y = round(y0, 1)
-                    found_y = next((yy for yy in lines_by_y if abs(yy - y) <= 1.5), None)
-                    if found_y is not None:
-                        lines_by_y[found_y].append((x0, text))
-                    else:
-                        lines_by_y[y] = [(x0, text)]
+            # 削除されたPDFの索引は破棄
+            for path in list(self._page_text_index):
+                if path not in candidate_pdfs:
+                    self._page_text_index.pop(path, None)
 
-                # 各行を解析
-                for y in sorted(lines_by_y.keys()):
-                    line_items = sorted(lines_by_y[y], key=lambda x: x[0])
-                    line_text = "".join([t for _, t in line_items])
-                    norm_line = self.normalize_text(line_text)
+            matched_pdf = None  # ✅ 一致したPDFを記録して後で使用
+            results.put(("progress", 0, len(candidate_pdfs)))
+            for n, pdf_path in enumerate(candidate_pdfs, 1):
+                if gen != self._search_gen:
+                    return
+                try:
+                    index = self._get_page_text_index(pdf_path, log=log)
+                except Exception as e:
+                    log(f"[WARN] {pdf_path} を開けません: {e}")
+                    results.put(("progress", n, len(candidate_pdfs)))
+                    continue
 
-                    # 「262便」などが含まれる行を抽出
-                    if normalized_flight not in norm_line:
-                        continue
+                # 「262便」などの便名は便名欄の辞書引き、それ以外の表記は従来どおり部分一致
+                rows = rows_for_flight(index, normalized_flight)
 
-                    # 予約番号（9J-xxxxxxなど）を含む行のみ採用
-                    if not re.search(r"[A-Z0-9]{1,5}-[0-9]{3,}", norm_line):
-                        continue
+                for start in range(0, len(rows), self.SEARCH_BATCH_ROWS):
+                    results.put(("rows", pdf_path, rows[start:start + self.SEARCH_BATCH_ROWS]))
+                if rows:
+                    matched_pdf = pdf_path
+                results.put(("progress", n, len(candidate_pdfs)))
 
-                    # 🔹既存の解析関数を呼び出し
-                    parsed = self.parse_passenger_line(norm_line)
+            if gen != self._search_gen:
+                return
+            status_json = self._load_status(normalized_flight, matched_pdf, log)
+            results.put(("done", status_json))
+        except Exception as e:
+            log(f"[ERROR] 便名検索に失敗: {e}")
+            results.put(("done", None))
 
-                    if parsed and len(parsed) >= 3:
-                        # 🔹 ステータス自動判定（NS/CXL）
-                        status = ""
-                        if re.search(r"NS(?![A-Za-z0-9])", norm_line):
-                            status = "NS"
-                        elif re.search(r"CXL(?![A-Za-z0-9])", norm_line):
-                            status = "CXL"
+    def _poll_search_results(self, gen, normalized_flight, results):
+        """ワーカーの結果を Treeview へ反映（1回あたり SEARCH_BATCH_ROWS 行まで）"""
+        if gen != self._search_gen or not self.root.winfo_exists():
+            return  # 新しい検索に切り替わった
 
-                        # 🔹 Treeview に追加
-                        self.tree.insert("", "end", values=[status, *parsed, page_index])
-                        total_hits += 1
-                        matched_pdf = pdf_path
-                        self.log_text.insert(tk.END, f"[抽出] p.{page_index+1}: {norm_line[:80]}...\n")
+        inserted = 0
+        while inserted < self.SEARCH_BATCH_ROWS:
+            try:
+                msg = results.get_nowait()
+            except queue.Empty:
+                break
 
-            doc.close()
+            kind = msg[0]
+            if kind == "log":
+                self.log_text.insert(tk.END, msg[1] + "\n")
+            elif kind == "progress":
+                self.search_progress.configure(value=msg[1], maximum=max(msg[2], 1))
+                self.search_progress_label.config(text=f"検索中… {msg[1]}/{msg[2]}")
+            elif kind == "rows":
+                _, pdf_path, rows = msg
+                for page_index, norm_line, status, parsed in rows:
+                    # 🔹 Treeview に追加
+                    self._rows_insert([status, *parsed, page_index])
+                    self.log_text.insert(tk.END, f"[抽出] p.{page_index+1}: {norm_line[:80]}...\n")
+                self._search_hits += len(rows)
+                self.current_pdf_path = pdf_path
+                inserted += len(rows)
+            elif kind == "done":
+                self._finish_search(normalized_flight, msg[1])
+                return
 
-        # ✅ 抽出結果を記録（ここで current_pdf_path にセット）
-        if matched_pdf:
-            self.current_pdf_path = matched_pdf
-            self.log_text.insert(tk.END, f"[INFO] 対象PDFを設定: {os.path.basename(matched_pdf)}\n")
-        else:
-            self.current_pdf_path = None
+        self.root.after(self.SEARCH_POLL_MS, self._poll_search_results, gen, normalized_flight, results)
+
+    def _finish_search(self, normalized_flight, status_json):
+        """全行の反映後：ステータス復元・基準スナップショット・列幅/合計の更新"""
+        self._search_running = False
+        self.search_progress.grid_remove()
+        self.search_progress_label.grid_remove()
+
+        # ✅ 抽出結果を記録（current_pdf_path は行の反映時にセット済み）
+        if self.current_pdf_path:
+            self.log_text.insert(tk.END, f"[INFO] 対象PDFを設定: {os.path.basename(self.current_pdf_path)}\n")
 
         # ✅ 結果出力
-        if total_hits == 0:
+        if self._search_hits == 0:
             messagebox.showinfo("結果", f"{normalized_flight} の便に該当する行は見つかりませんでした。", parent=self.root)
             self.log_text.insert(tk.END, "[INFO] 条件に合う行なし。\n")
         else:
-            self.log_text.insert(tk.END, f"[完了] {total_hits} 行を抽出しました。\n")
+            self.log_text.insert(tk.END, f"[完了] {self._search_hits} 行を抽出しました。\n")
 
-        # ===== JSONステータスファイルの読み込み =====
-        base_status_folder = os.path.join(self.pdf_folder, "status_data")
-
-        # --- PDFファイル名から日付フォルダー名を生成 ---
-        pdf_name = os.path.basename(self.current_pdf_path) if getattr(self, "current_pdf_path", None) else ""
-        m = re.search(r"(\d{1,2})[.\-](\d{1,2})", pdf_name)
-        if m:
-            month, day = m.groups()
-            folder_name = f"{datetime.now().year}-{month.zfill(2)}-{day.zfill(2)}"
-            status_folder = os.path.join(base_status_folder, folder_name)
-        else:
-            status_folder = base_status_folder
+        if status_json:
+            latest_json, data = status_json
+            restored_count = self._restore_status_records(data)
+            self.log_text.insert(
+                tk.END,
+                f"[状態読込] {latest_json} から {restored_count} 件の状態を復元しました。\n"
+            )
 
-        # --- 安全な存在チェック ---
-        if not os.path.exists(status_folder):
-            self.log_text.insert(tk.END, f"[INFO] ステータスフォルダーが存在しません: {status_folder}\n")
-            self.unsaved_changes = False  # ← 強制的に変更なし
-            self.baseline_snapshot = self._make_snapshot_from_tree()  # 現在を基準に
-            self.log_text.insert(tk.END, "[INIT] 初期基準確定（フォルダー未生成）\n")
-        else:
-            # --- JSON検索処理 ---
-            normalized_json_prefix = re.sub(r"号車$", "便", normalized_flight)
-            json_candidates = [
-                f for f in os.listdir(status_folder)
-                if f.startswith(normalized_json_prefix) and f.endswith("_status.json")
-            ]
+        # 検索で表示を作り終えた時点を“基準”とする
+        self._reset_baseline()
 
-            if not json_candidates:
-                self.log_text.insert(tk.END, "[INFO] 該当するステータスJSONが見つかりません。\n")
-                self.unsaved_changes = False
-                self.baseline_snapshot = self._make_snapshot_from_tree()
-                self.log_text.insert(tk.END, "[INIT] 初期基準確定（JSONなし）\n")
-            else:
-                json_candidates.sort(
-                    key=lambda f: os.path.getmtime(os.path.join(status_folder, f)),
-                    reverse=True
-                )
-                latest_json = json_candidates[0]
-                json_path = os.path.join(status_folder, latest_json)
+        self.autosize_tree_columns()
+        self.root.after(120, self.update_footer_totals)
 
+    def _load_status(self, normalized_flight, pdf_path, log):
+        """
+        ステータスDBから該当便の状態を1回の索引付きクエリで読み込む（ワーカースレッドで実行）。
+        DB にまだない便は従来のステータスJSONを読み、DB へ取り込んでおく。
+        戻り値: (表示名, data) / 見つからない・読めない場合は None
+        """
+        base_status_folder = os.path.join(self.pdf_folder, "status_data")
+        date = status_date_for_pdf(pdf_path)
+        prefix = re.sub(r"号車$", "便", normalized_flight)
+        try:
+            hit = get_status_db(base_status_folder).load_flight(date, prefix)
+        except Exception as e:
+            log(f"[WARN] ステータスDBの読込に失敗: {e}")
+            hit = None
+        if hit:
+            flight, data = hit
+            return f"status.db（{date or '日付なし'} / {flight}）", data
+
+        status_json = self._load_status_json(normalized_flight, pdf_path, log)
+        if status_json:
+            status_folder = os.path.join(base_status_folder, date) if date else base_status_folder
             try:
-                #with open(json_path, "r", encoding="utf-8") as f:
-                #    data = json.load(f)
-                key = get_encryption_key()  # ← 自動生成＋永続再利用
-                fernet = Fernet(key)
+                n = import_status_file(get_status_db(base_status_folder),
+                                       os.path.join(status_folder, status_json[0]), date)
+                log(f"[INFO] {status_json[0]} をステータスDBへ取り込みました（{n} 件）")
+            except Exception as e:
+                log(f"[WARN] ステータスDBへの取り込みに失敗: {e}")
+        return status_json
 
-                with open(json_path, "rb") as f:
-                    enc = f.read()
+    def _load_status_json(self, normalized_flight, pdf_path, log):
+        """
+        対象PDFの日付フォルダーから最新のステータスJSONを読み込んで復号（ワーカースレッドで実行）。
+        戻り値: (ファイル名, data) / 見つからない・読めない場合は None
+        """
+        base_status_folder = os.path.join(self.pdf_folder, "status_data")
 
-                # 復号してからJSONとして読込
-                try:
-                    dec = fernet.decrypt(enc)
-                    data = json.loads(dec.decode("utf-8"))
-                except Exception as e:
-                    self.log_text.insert(tk.END, f"[WARN] ステータスJSONの復号に失敗: {e}\n")
-                    return
+        # --- PDFファイル名から日付フォルダー名を生成 ---
+        folder_name = status_date_for_pdf(pdf_path)
+        status_folder = os.path.join(base_status_folder, folder_name) if folder_name else base_status_folder
 
-                restored_count = 0
-                for record in data.get("records", []):
-                    name = record.get("name", "")
-                    status = record.get("status", "")
-                    male = record.get("male", "")
-                    female = record.get("female", "")
-                    child = record.get("child", "")
-                    total = record.get("total", "")
-                    cxl_deduction = record.get("cxl_deduction", {})
-
-                    for item_id in self.tree.get_children():
-                        values = list(self.tree.item(item_id, "values"))
-                        if len(values) > 3 and values[3] == name:
-                            values[0] = status
-
-                            # ✅ CXL処理：減算あり or なしを判定
-                            if status in ("CXL", "CXL-CS") and isinstance(cxl_deduction, dict):
-                                orig = cxl_deduction.get("orig", {})
-                                after = cxl_deduction.get("after", {})
-
-                                # 🔹 各列ごとに個別比較して、変化があるときだけ before→after 表示
-                                def fmt_each(before, after):
-                                    """変化がある場合のみ before→after、同じ値なら after のみ"""
-                                    try:
-                                        b = int(before)
-                                        a = int(after)
-                                        if b != a:
-                                            return f"{b}→{a}"
-                                        else:
-                                            return str(a)
-                                    except Exception:
-                                        if before != after:
-                                            return f"{before}→{after}"
-                                        else:
-                                            return str(after)
-
-                                values[4] = fmt_each(orig.get("男", ""), after.get("男", ""))
-                                values[5] = fmt_each(orig.get("女", ""), after.get("女", ""))
-                                values[6] = fmt_each(orig.get("子供", ""), after.get("子供", ""))
-                                values[7] = fmt_each(orig.get("合計", ""), after.get("合計", ""))
-
-                                if status == "CXL-CS":
-                                    self.tree.item(item_id, values=values, tags=('status_cxl_cs',))
-                                else:
-                                    self.tree.item(item_id, values=values, tags=('status_red',))
-
-                                self.cxl_deduction_map[item_id] = cxl_deduction
-
-                            # ✅ NS表示：「元→0」
-                            elif status == "NS":
-                                # 現在の after 値を元として NS 表示へ
-                                def aft(x): return self.safe_int(x)
-                                om, of_, ok = aft(values[4]), aft(values[5]), aft(values[6])
-                                ot = aft(values[7]) if str(values[7]).strip() else (om + of_ + ok)
-                                values[4] = f"{om}→0" if om > 0 else "0"
-                                values[5] = f"{of_}→0" if of_ > 0 else "0"
-                                values[6] = f"{ok}→0" if ok > 0 else "0"
-                                values[7] = f"{ot}→0" if ot > 0 else "0"
-                                #self.tree.item(item_id, tags=('status_red',))
-                                self.tree.item(item_id, tags=('status_blue',))
-                            else:
-                                self.tree.item(item_id, tags=())
-
-                            self.tree.item(item_id, values=values)
-                            restored_count += 1
-                            break
+        # --- 安全な存在チェック ---
+        if not os.path.exists(status_folder):
+            log(f"[INFO] ステータスフォルダーが存在しません: {status_folder}")
+            log("[INIT] 初期基準確定（フォルダー未生成）")
+            return None
+
+        # --- JSON検索処理 ---
+        normalized_json_prefix = re.sub(r"号車$", "便", normalized_flight)
+        json_candidates = [
+            f for f in os.listdir(status_folder)
+            if f.startswith(normalized_json_prefix) and f.endswith("_status.json")
+        ]
+        if not json_candidates:
+            log("[INFO] 該当するステータスJSONが見つかりません。")
+            log("[INIT] 初期基準確定（JSONなし）")
+            return None
+
+        json_candidates.sort(
+            key=lambda f: os.path.getmtime(os.path.join(status_folder, f)),
+            reverse=True
+        )
+        latest_json = json_candidates[0]
+        json_path = os.path.join(status_folder, latest_json)
 
+        try:
+            with open(json_path, "rb") as f:
+                enc = f.read()
+        except Exception as e:
+            log(f"[WARN] JSON読込エラー: {e}")
+            return None
 
-                self.log_text.insert(
-                    tk.END,
-                    f"[JSON読込] {latest_json} から {restored_count} 件の状態を復元しました。\n"
-                )
+        # 復号してからJSONとして読込（キーはプロセス内で共有）
+        try:
+            data = get_status_cipher().decrypt_json(enc)
+        except Exception as e:
+            log(f"[WARN] ステータスJSONの復号に失敗: {e}")
+            return None
 
+        return latest_json, data
 
-            except Exception as e:
-                self.log_text.insert(tk.END, f"[WARN] JSON読込エラー: {e}\n")
-        
-        # 検索で表示を作り終えた時点を“基準”とする
-        self.baseline_snapshot = self._make_snapshot_from_tree()
-        self.unsaved_changes = False
+    def _restore_status_records(self, data):
+        """
+        復号済みステータスJSONの内容を行モデルへ反映し、Treeview は最後にまとめて更新（UIスレッド）。
+        レコードは予約番号で照合（予約番号のない旧形式は氏名で照合）。戻り値は復元件数。
+        """
+        fmt_each = format_count_change   # 変化がある列だけ before→after 表示
 
+        def aft(x): return self.safe_int(x)
 
-        self.autosize_tree_columns()
-        self.root.after(120, self.update_footer_totals)
+        iid_by_name = {}
+        for iid, vals in self._rows_items():
+            if len(vals) > 3:
+                iid_by_name.setdefault(vals[3], iid)
 
+        pending_tags = {}   # iid → tags（Treeview へは最後に1回だけ反映）
+        for record in data.get("records", []):
+            resv = record.get("resv", "")
+            if resv == "合計人数":
+                continue
+            item_id = self.iid_by_resv.get(resv) if resv else iid_by_name.get(record.get("name", ""))
+            if item_id is None:
+                continue
 
-    def add_status_to_pdf_resv(self, page, resv, name, status, log_widget, page_index, fontsize, x_offset=None, y_offset=None):
+            status = record.get("status", "")
+            cxl_deduction = record.get("cxl_deduction", {})
+            values = self._row_get(item_id)
+            values[0] = status
+
+            # ✅ CXL処理：減算あり or なしを判定
+            if status in ("CXL", "CXL-CS") and isinstance(cxl_deduction, dict):
+                orig = cxl_deduction.get("orig", {})
+                after = cxl_deduction.get("after", {})
+                values[4] = fmt_each(orig.get("男", ""), after.get("男", ""))
+                values[5] = fmt_each(orig.get("女", ""), after.get("女", ""))
+                values[6] = fmt_each(orig.get("子供", ""), after.get("子供", ""))
+                values[7] = fmt_each(orig.get("合計", ""), after.get("合計", ""))
+                pending_tags[item_id] = ('status_cxl_cs',) if status == "CXL-CS" else ('status_red',)
+                self.cxl_deduction_map[item_id] = cxl_deduction
+
+            # ✅ NS表示：「元→0」
+            elif status == "NS":
+                # 現在の after 値を元として NS 表示へ
+                om, of_, ok = aft(values[4]), aft(values[5]), aft(values[6])
+                ot = aft(values[7]) if str(values[7]).strip() else (om + of_ + ok)
+                values[4] = f"{om}→0" if om > 0 else "0"
+                values[5] = f"{of_}→0" if of_ > 0 else "0"
+                values[6] = f"{ok}→0" if ok > 0 else "0"
+                values[7] = f"{ot}→0" if ot > 0 else "0"
+                pending_tags[item_id] = ('status_blue',)
+            else:
+                pending_tags[item_id] = ()
+
+            self.row_values[item_id] = values
+            self._update_row_counts(item_id, values)
+            self._autosize_dirty.add(item_id)
+
+        restored_count = len(pending_tags)
+        for item_id, tags in pending_tags.items():
+            self.tree.item(item_id, values=self.row_values[item_id], tags=tags)
+        return restored_count
+
+
+    def add_status_to_pdf_resv(self, page, resv, name, status, log_widget, page_index, fontsize, x_offset=None, y_offset=None, page_words=None):
         """
         予約番号をキーに検索し、その予約番号の左側に NS/CXL を描画。
         文字列の中心が基準位置に来るように調整。
+        page_words（PageWords）を渡すと単語の再抽出をしない。
         """
         import fitz
 
@@ -1090,53 +1550,53 @@ class PDFPassengerSearchApp:
         if y_offset is None:
             y_offset = getattr(self, "STATUS_OFFSET_Y", -2)
 
-        words = page.get_text("words")
+        if page_words is None:
+            page_words = PageWords(page)
         added = False
 
-        for w in words:
-            text = w[4]
-            if resv in text:
-                # --- 対象予約番号ワード座標取得 ---
-                x0, y0, x1, y1 = w[:4]
-                y_center = (y0 + y1) / 2
+        hits = page_words.find_resv(resv)
+        if hits:
+            w = hits[0]
+            # --- 対象予約番号ワード座標取得 ---
+            x0, y0, x1, y1 = w[:4]
+            y_center = (y0 + y1) / 2
 
-                # --- ステータス文字列の表示幅を算出 ---
-                # PyMuPDFのフォントメトリクスを利用
-                try:
-                    font = fitz.Font("MyArial")
-                except Exception:
-                    font = fitz.Font("helv")
+            # --- ステータス文字列の表示幅を算出 ---
+            # PyMuPDFのフォントメトリクスを利用
+            try:
+                font = fitz.Font("MyArial")
+            except Exception:
+                font = fitz.Font("helv")
 
-                text_width = font.text_length(status, fontsize=fontsize)
-                text_height = fontsize * 0.4
+            text_width = font.text_length(status, fontsize=fontsize)
+            text_height = fontsize * 0.4
 
-                # --- 描画位置を調整（文字中心を基準） ---
-                x_target = x0 + x_offset - (text_width / 2)
-                y_target = y_center + y_offset - (text_height / 2)
+            # --- 描画位置を調整（文字中心を基準） ---
+            x_target = x0 + x_offset - (text_width / 2)
+            y_target = y_center + y_offset - (text_height / 2)
 
-                try:
-                    page.insert_font(fontfile=r"C:\Windows\Fonts\arial.ttf", fontname="MyArial")
-                except Exception:
-                    pass
-
-                # --- 描画実行 ---
-                page.insert_text(
-                    fitz.Point(x_target, y_target),
-                    status,
-                    fontsize=fontsize,
-                    color=(1, 0, 0),
-                    fontname="MyArial",
-                    overlay=True
-                )
+            try:
+                page.insert_font(fontfile=r"C:\Windows\Fonts\arial.ttf", fontname="MyArial")
+            except Exception:
+                pass
 
-                log_widget.insert(
-                    tk.END,
-                    f"[PDF追記] '{resv}' 左に {status} (中心基準) "
-                    f"(x={x_target:.1f}, y={y_target:.1f}, w={text_width:.1f}, offset=({x_offset},{y_offset})) p.{page_index+1}\n"
-                )
+            # --- 描画実行 ---
+            page.insert_text(
+                fitz.Point(x_target, y_target),
+                status,
+                fontsize=fontsize,
+                color=(1, 0, 0),
+                fontname="MyArial",
+                overlay=True
+            )
 
-                added = True
-                break
+            log_widget.insert(
+                tk.END,
+                f"[PDF追記] '{resv}' 左に {status} (中心基準) "
+                f"(x={x_target:.1f}, y={y_target:.1f}, w={text_width:.1f}, offset=({x_offset},{y_offset})) p.{page_index+1}\n"
+            )
+
+            added = True
 
         if not added:
             log_widget.insert(
@@ -1147,15 +1607,338 @@ class PDFPassengerSearchApp:
         return added
 
 
+    def _ensure_status_font(self, page):
+        try:
+            page.insert_font(fontname="MyArial", fontfile=r"C:\Windows\Fonts\arial.ttf")
+            return "MyArial"
+        except Exception:
+            return "helv"
+
+    def _stamp_status_rows(self, page, page_index, page_words, rows, cxl_map, fontname):
+        """
+        1ページ分の乗客行へステータスを印字する（予約番号左のステータス、人数欄の取り消し線・減算後値）。
+        rows: [(row_key, status, resv, name, vals)]。vals は Treeview の行と同じ並び、CXL の減算情報は cxl_map[row_key]。
+        """
+        page_ns_sum = 0
+        page_cxl_ded_sum = 0
+
+        for (row_key, status, resv, name, vals) in rows:
+            men = int(vals[4]) if str(vals[4]).isdigit() else 0
+            women = int(vals[5]) if str(vals[5]).isdigit() else 0
+            kids = int(vals[6]) if str(vals[6]).isdigit() else 0
+            total = int(vals[7]) if str(vals[7]).isdigit() else 0
+
+            if status == "NS":
+                page_ns_sum += total
+            elif status in ("CXL", "CXL-CS"):
+                cxl = cxl_map.get(row_key, {})
+                for k in ("男", "女", "子供"):
+                    v = cxl.get(k, 0)
+                    if str(v).isdigit():
+                        page_cxl_ded_sum += int(v)
+
+            # ✅ 予約番号左にステータス印字（位置補正あり）
+            self.add_status_to_pdf_resv(
+                page, resv, name, status, self.log_text,
+                page_index, fontsize=20, page_words=page_words
+            )
+
+            # ✅ 人数欄の取り消し線＆CXL減算処理
+            if not page_words.words:
+                continue
+
+            resv_words = page_words.find_resv(resv)
+            if not resv_words:
+                self.log_text.insert(tk.END, f"[WARN] 予約番号 '{resv}' が見つかりません。\n")
+                continue
+
+            line_numbers = page_words.row_numbers(resv_words[-1])
+
+            seq = ["男", "女", "子供", "合計"]
+
+            # Treeviewには減算後値が入っている
+            def to_int(x): return int(x) if str(x).isdigit() else 0
+
+            # 減算後の値
+            after_m = to_int(vals[4])
+            after_f = to_int(vals[5])
+            after_k = to_int(vals[6])
+            after_total = to_int(vals[7])
+
+            # 元の人数を cxl_deduction_map に保持している場合はそれを利用、
+            # 無ければ減算前データを別途保持（ここでは同じと仮定）
+            orig = cxl_map.get(row_key, {})
+
+            # 元の値は after + deduction（Treeviewが減算後なので逆算）
+            orig_m = after_m + to_int(orig.get("男", 0))
+            orig_f = after_f + to_int(orig.get("女", 0))
+            orig_k = after_k + to_int(orig.get("子供", 0))
+            orig_total = after_total + to_int(orig.get("合計", 0))
+
+            seq = ["男", "女", "子供", "合計"]
+            cxl_info = cxl_map.get(row_key, {}) if status == "CXL" else {}
+            orig_map = {}
+            after_map = {}
+
+            # PDF上の元数値をキー毎に読む（全角対策）
+            for i, key in enumerate(seq):
+                if i >= len(line_numbers):
+                    continue
+                wnum = line_numbers[i]
+                tok = re.sub(r"\D", "", wnum[4].strip())
+                orig_map[key] = int(tok) if tok.isdigit() else 0
+
+            # CXLの「減算後値」を決める
+            if status in ("CXL", "CXL-CS"):
+                if isinstance(cxl_info, dict) and "after" in cxl_info:
+                    # すでに after / orig を保持している形式に対応
+                    after_map["男"] = int(cxl_info["after"].get("男", orig_map.get("男", 0)))
+                    after_map["女"] = int(cxl_info["after"].get("女", orig_map.get("女", 0)))
+                    after_map["子供"] = int(cxl_info["after"].get("子供", orig_map.get("子供", 0)))
+                    # 合計は再計算（安全）
+                    after_map["合計"] = after_map["男"] + after_map["女"] + after_map["子供"]
+                else:
+                    # TreeViewの値（vals[4:7]）は“減算後値”として使う前提
+                    def tv_int(idx, default):
+                        v = vals[idx]
+                        return int(v) if str(v).isdigit() else default
+                    after_map["男"]   = tv_int(4, orig_map.get("男", 0))
+                    after_map["女"]   = tv_int(5, orig_map.get("女", 0))
+                    after_map["子供"] = tv_int(6, orig_map.get("子供", 0))
+                    after_map["合計"] = after_map["男"] + after_map["女"] + after_map["子供"]
+
+            # どれか1つでも減算があるか？
+            any_reduced = False
+            if status in ("CXL", "CXL-CS"):
+                for k in ("男", "女", "子供", "合計"):
+                    if k in orig_map and k in after_map and after_map[k] < orig_map[k]:
+                        any_reduced = True
+                        break
+
+            for i, key in enumerate(seq):
+                if i >= len(line_numbers):
+                    continue
+
+                wnum = line_numbers[i]
+                x0, x1 = wnum[0] - self.LINE_MARGIN, wnum[2] + self.LINE_MARGIN
+                y_mid = (wnum[1] + wnum[3]) / 2
+
+                orig_val = orig_map.get(key, 0)
+                # 元が0なら全てスキップ
+                if orig_val == 0:
+                    continue
+
+                if status == "NS":
+                    # NSは常に線のみ
+                    page.draw_line(p1=(x0, y_mid), p2=(x1, y_mid),
+                                color=(1, 0, 0), width=self.LINE_WIDTH)
+                    continue
+
+                if status in ("CXL", "CXL-CS"):
+                    after_val = after_map.get(key, orig_val)
+
+                    if any_reduced:
+                        # ✅ 減算ありの列のみ：線＋減算後数値（0でも描画）
+                        if after_val < orig_val:
+                            page.draw_line(
+                                p1=(x0, y_mid),
+                                p2=(x1, y_mid),
+                                color=(1, 0, 0),
+                                width=self.LINE_WIDTH
+                            )
+                            # 減算後値は 0 でも必ず描画
+                            page.insert_text(
+                                (x0 - self.LINE_MARGIN * 2, y_mid - 4),
+                                str(after_val),
+                                fontsize=10,
+                                color=(1, 0, 0),
+                                fontname=fontname,
+                                overlay=True
+                            )
+                        # 減算なし列は描画しない
+                    else:
+                        # ✅ CXL全列変更なし → 線のみ
+                        page.draw_line(
+                            p1=(x0, y_mid),
+                            p2=(x1, y_mid),
+                            color=(1, 0, 0),
+                            width=self.LINE_WIDTH
+                        )
+
+    def _stamp_total_line(self, page, page_index, page_words, totals, fontname, below_y=None):
+        """
+        「合計人数」行へ合計（男, 女, 子供, 合計）を反映する。
+        変わった列は取り消し線＋変更後値、全列同じなら合計を○で囲む。
+        below_y: その便の最後の乗客行の y。1ページに複数便の合計行があるとき、その下の合計行を選ぶ。
+        """
+        total_m, total_f, total_k, total_sum = totals
+        try:
+            # === 「合計人数」行をPDFから検索（便の最終行より下で最初のもの） ===
+            line_words = page_words.total_line(below_y)
+            target_line = [(w[0], w[1], w[3], w[4]) for w in line_words] if line_words else None
+
+            if not target_line:
+                self.log_text.insert(tk.END, "[INFO] PDF内に『合計人数』行が見つかりません。\n")
+            else:
+                # --- 数値トークン抽出 ---
+                seen_label = False
+                num_tokens = []
+                for (x0, y0, y1, text) in target_line:
+                    if "合計人数" in text.replace(" ", ""):
+                        seen_label = True
+                        continue
+                    if seen_label and re.fullmatch(r"\d+", text.strip()):
+                        num_tokens.append((x0, y0, y1, text))
+
+                if len(num_tokens) >= 4:
+                    seq = ["男", "女", "子供", "合計"]
+                    after_vals = [total_m, total_f, total_k, total_sum]
+
+                    for i, (x0, y0, y1, text) in enumerate(num_tokens[:4]):
+                        y_mid = (y0 + y1) / 2
+                        x_left = x0 - self.LINE_MARGIN
+                        x_right = x0 + len(text) * 5
+
+                        # --- PDF上の元値を取得（全角→半角変換） ---
+                        try:
+                            orig_val = int(re.sub(r"\D", "", text))
+                        except Exception:
+                            orig_val = None
+
+                        after_val = after_vals[i]
+
+                        # ✅ 元値と同じならスキップ（線も描画しない）
+                        if orig_val is not None and orig_val == after_val:
+                            continue
+
+                        # --- 取り消し線 ---
+                        page.draw_line(
+                            p1=(x_left, y_mid),
+                            p2=(x_right, y_mid),
+                            color=(1, 0, 0),
+                            width=self.LINE_WIDTH
+                        )
+
+                        # --- 変更後値を描画（赤文字） ---
+                        page.insert_text(
+                            (x_right + 6, y_mid - 4),
+                            str(after_val),
+                            fontsize=10,
+                            color=(1, 0, 0),
+                            fontname=fontname,
+                            overlay=True
+                        )
+
+            # === ★追加：この位置（forループの外）に配置 ===
+            try:
+                self.log_text.insert(
+                    tk.END, f"[DEBUG] ○判定: p.{page_index+1}\n"
+                )
+
+                same_flags = []
+                for i in range(min(4, len(num_tokens))):
+                    orig_text = num_tokens[i][3]
+                    orig_num = re.sub(r"\D", "", orig_text)
+                    after_val = after_vals[i]
+                    same = (str(after_val) == orig_num)
+                    same_flags.append(same)
+                    self.log_text.insert(
+                        tk.END,
+                        f"[DEBUG]  列={seq[i]} orig='{orig_text}'({orig_num}) → after={after_val} same={same}\n"
+                    )
+
+                if all(same_flags):
+                    x0, y0, y1, text = num_tokens[3]
+                    cx = (x0 + x0 + len(text) * 5) / 2
+                    cy = (y0 + y1) / 2
+                    radius = max(6, (len(text) * 3))
+                    page.draw_circle(
+                        center=(cx, cy),
+                        radius=radius,
+                        color=(1, 0, 0),
+                        width=1.2,
+                        overlay=True
+                    )
+                    self.log_text.insert(
+                        tk.END,
+                        f"[○] p.{page_index+1} 合計人数を○で囲み（人数変更なし）\n"
+                    )
+                else:
+                    self.log_text.insert(
+                        tk.END,
+                        f"[DEBUG] ○条件未達: same_flags={same_flags}\n"
+                    )
+
+            except Exception as e:
+                self.log_text.insert(
+                    tk.END,
+                    f"[WARN] ○描画処理中エラー: {e}\n"
+                )
+
+        except Exception as e:
+            self.log_text.insert(tk.END, f"[ERROR] フッター合計人数処理失敗: {e}\n")
+
+
+    def _plan_other_flights_restamp(self, base_pdf, flight_name, pages):
+        """
+        描き直すページ（pages）に行がある他便の保存済みステータスを status.db から読み、plan_restamp でページ別にまとめる。
+        保管用PDFは全便で1ファイルなので、作り直しで消えた他便の印字をここから復元する。
+        """
+        if not pages:
+            return {}
+        try:
+            index = self._get_page_text_index(base_pdf)
+            pages_set = set(pages)
+            flights = sorted({r[3][10] for r in index["rows"]
+                              if r[0] in pages_set and r[3][10] and r[3][10] != flight_name})
+            if not flights:
+                return {}
+            status_db = get_status_db(os.path.join(os.path.dirname(base_pdf), "status_data"))
+            date = status_date_for_pdf(base_pdf)
+            flight_records = {}
+            for flight in flights:
+                hit = status_db.load_flight(date, flight, exact=True)
+                if hit:
+                    flight_records[flight] = hit[1]["records"]
+        except Exception as e:
+            self.log_text.insert(tk.END, f"[WARN] 他便のステータス復元に失敗: {e}\n")
+            return {}
+        return plan_restamp(index, flight_records, pages)
+
     # ---------------- PDF書き込み（2→1対応safe_int統合版） ----------------
+    def _save_marked_pdf(self, doc, marked_pdf, base_pdf):
+        """
+        _marked.pdf を保存して閉じる。可能なら増分保存（変更ページ分だけ追記）。
+        増分保存できない・ファイルが肥大化した場合は一時ファイルへ全体を書いて置き換える。
+        戻り値はログ用の保存方法
+        """
+        try:
+            grown = os.path.getsize(marked_pdf) > os.path.getsize(base_pdf) * self.MARKED_PDF_MAX_GROWTH
+        except OSError:
+            grown = True
+        if not grown and doc.can_save_incrementally():
+            doc.saveIncr()
+            doc.close()
+            return "増分保存"
+
+        temp_path = marked_pdf + ".tmp"
+        doc.save(temp_path, garbage=3)
+        doc.close()
+        os.replace(temp_path, marked_pdf)
+        return "全体保存"
+
     def write_all_status_to_pdf(self):
         """画面表示PDFは常にベースファイル。
         書き込みは既存 _marked.pdf に追記。
-        ステータス解除時は該当ページのみ元PDFから再描画。
-        JSONは上書き更新。
+        保存済みステータスから変わった行のあるページ（＋合計人数の最終ページ）と、元PDFの内容が変わったページだけを
+        元PDFから作り直して再描画し、可能なら増分保存する。作り直したページにある他便の印字は status.db から復元する。
+        ステータスは status.db に保存し、保存後に Excel 用の <便名>_status.json を DB から書き出す。
         """
         import shutil
-        from collections import defaultdict
+
+        if self._search_running:
+            messagebox.showinfo("検索中", "便名検索が終わってから書き込んでください。", parent=self.root)
+            return
 
         base_pdf = getattr(self, "current_pdf_path", None)
         if not base_pdf or not os.path.exists(base_pdf):
@@ -1164,23 +1947,24 @@ class PDFPassengerSearchApp:
 
         # ✅ 書き込み対象は常に既存 _marked.pdf（なければ元から生成）
         marked_pdf = base_pdf.replace(".pdf", "_marked.pdf")
-        if not os.path.exists(marked_pdf):
+        created_marked = not os.path.exists(marked_pdf)
+        if created_marked:
             shutil.copyfile(base_pdf, marked_pdf)
             self.log_text.insert(tk.END, f"[INFO] 新規 _marked.pdf 作成: {os.path.basename(marked_pdf)}\n")
         else:
             self.log_text.insert(tk.END, f"[INFO] 既存 _marked.pdf に追記します: {os.path.basename(marked_pdf)}\n")
 
         # ✅ 便名取得
-        if self.tree.get_children():
-            first_row = self.tree.item(self.tree.get_children()[0], "values")
+        rows = self._rows_items()
+        if rows:
+            first_row = rows[0][1]
             flight_name = first_row[11] if len(first_row) > 11 else "Unknown便"
         else:
             flight_name = "Unknown便"
 
         # ✅ TreeViewからターゲット抽出
         targets = []
-        for item_id in self.tree.get_children():
-            vals = self.tree.item(item_id, "values")
+        for item_id, vals in rows:
             if len(vals) < 9:
                 continue
             status = vals[0]
@@ -1200,473 +1984,156 @@ class PDFPassengerSearchApp:
         try:
             doc_marked = fitz.open(marked_pdf)
             doc_base = fitz.open(base_pdf)
+            if len(doc_marked) != len(doc_base):
+                # ページ構成が食い違う _marked.pdf は元PDFから作り直す
+                doc_marked.close()
+                shutil.copyfile(base_pdf, marked_pdf)
+                doc_marked = fitz.open(marked_pdf)
+                created_marked = True
+                self.log_text.insert(tk.END, "[WARN] _marked.pdf のページ数が元PDFと異なるため作り直しました。\n")
         except Exception as e:
             messagebox.showerror("エラー", f"PDFを開けませんでした:\n{e}", parent=self.root)
             return
 
         # === 対象便ページ特定 ===
         target_pages = sorted(set(p for (_, _, _, _, p, _) in targets))
+        last_page_index = target_pages[-1]
         self.log_text.insert(tk.END, f"[INFO] 対象ページ: {target_pages}\n")
 
-        # === ステータス解除（空欄）のページを元PDFからリセット ===
-        reset_pages = [
-            int(vals[-1]) for (_, status, _, _, _, vals) in targets if not status
-        ]
-        if reset_pages:
-            for pno in sorted(set(reset_pages)):
+        # === 元PDFの各ページ内容ハッシュを前回の記録と比べる（ページ数が同じままの作り直しも検知） ===
+        base_hashes = base_page_hashes(doc_base)
+        stored_hashes = None if created_marked else read_base_page_hashes(doc_marked)
+        if created_marked:
+            changed_pages = []
+        elif stored_hashes is None:
+            # ハッシュを記録する前の _marked.pdf は比べようがないので、今の元PDFを基準として記録だけする
+            changed_pages = []
+            self.log_text.insert(tk.END, "[INFO] _marked.pdf に元PDFのページ記録がないため、今回の内容を基準にします。\n")
+        else:
+            changed_pages = [p for p, h in enumerate(base_hashes)
+                             if p >= len(stored_hashes) or stored_hashes[p] != h]
+            if changed_pages:
+                self.log_text.insert(
+                    tk.END, f"[WARN] 元PDFの内容が変わったページ: {[p + 1 for p in changed_pages]}（作り直します）\n"
+                )
+
+        # === 書き直すページを決定 ===
+        # 保存済みステータス（基準）から変わった行のあるページと、元PDFの内容が変わったページ。
+        # 合計人数行のある最終ページは1行でも変われば対象。
+        if created_marked:
+            rebuild_pages = target_pages
+        else:
+            rebuild_pages = sorted({p for (_, _, resv, _, p, _) in targets if resv in self.dirty_resvs}
+                                   | (set(target_pages) & set(changed_pages)))
+            if rebuild_pages and last_page_index not in rebuild_pages:
+                rebuild_pages.append(last_page_index)
+
+        # === 元PDFの状態から描き直すページ（同じページにある他便の印字も消えるので、後で status.db から復元） ===
+        if created_marked:
+            fresh_pages = list(range(len(doc_marked)))
+        else:
+            fresh_pages = sorted(set(rebuild_pages) | set(changed_pages))
+            for pno in fresh_pages:
                 if pno < len(doc_base) and pno < len(doc_marked):
                     doc_marked.delete_page(pno)
                     doc_marked.insert_pdf(doc_base, from_page=pno, to_page=pno, start_at=pno)
-                    self.log_text.insert(tk.END, f"[RESET] p.{pno+1} を元PDFから再描画（解除処理）\n")
+                    self.log_text.insert(tk.END, f"[RESET] p.{pno+1} を元PDFから再描画\n")
+        doc_base.close()
+        other_plan = self._plan_other_flights_restamp(base_pdf, flight_name, fresh_pages)
 
-        # === ステータス付きデータをページ別に分類 ===
-        by_page = defaultdict(list)
+        # === ステータス付きデータをページ別に分類（書き直すページのみ） ===
+        by_page = {pno: [] for pno in rebuild_pages}
         for item in targets:
-            if item[1] in ("NS", "CXL", "CXL-CS"):
+            if item[4] in by_page and item[1] in ("NS", "CXL", "CXL-CS"):
                 by_page[item[4]].append(item)
 
         # === ステータス付き書き込み ===
         self.log_text.insert(tk.END, "\n--- PDF書き込み開始（追記処理） ---\n")
 
-        def ensure_font(page):
-            try:
-                page.insert_font(fontname="MyArial", fontfile=r"C:\Windows\Fonts\arial.ttf")
-                return "MyArial"
-            except Exception:
-                return "helv"
-            
-        if not by_page:
-            self.log_text.insert(tk.END, "[INFO] NS/CXLなし。合計人数チェックのみ実行。\n")
-            last_page_index = targets[-1][4] if targets else 0
-            by_page[last_page_index] = []  # ダミー行を入れて処理ループを起動
+        # ページの単語は書き込み前に1ページ1回だけ抽出（予約番号・人数欄・合計人数行の索引）
+        page_words_cache = {}
+
+        def words_of(pno):
+            pw = page_words_cache.get(pno)
+            if pw is None:
+                pw = page_words_cache[pno] = PageWords(doc_marked[pno])
+            return pw
+
+        # 印字で単語が増える前に、描き直す全ページの単語を取っておく（当便・他便どちらの印字位置にも使う）
+        for pno in set(by_page) | set(other_plan):
+            if 0 <= pno < len(doc_marked):
+                words_of(pno)
+
+        # --- GUIフッターの合計人数（行モデルで差分集計済み）を使用 ---
+        total_m, total_f, total_k, total_sum = self.footer_sums
+        self.log_text.insert(
+            tk.END,
+            f"[INFO] フッター合計取得: 男={total_m}, 女={total_f}, 子供={total_k}, 合計={total_sum}\n"
+        )
+
+        # --- JSON用 orig/after 構造（ステータス文書に同梱） ---
+        total_record = {
+            "resv": "合計人数",
+            "name": "",
+            "status": "合計",
+            "orig": {"男": 0, "女": 0, "子供": 0, "合計": 0},
+            "after": {"男": total_m, "女": total_f, "子供": total_k, "合計": total_sum},
+        }
+
+        if not fresh_pages:
+            self.log_text.insert(tk.END, "[INFO] 前回保存から変更のあるページなし。PDFは書き換えません。\n")
 
         for page_index, rows in sorted(by_page.items()):
             if not (0 <= page_index < len(doc_marked)):
                 continue
             page = doc_marked[page_index]
-            fontname = ensure_font(page)
-            page_ns_sum = 0
-            page_cxl_ded_sum = 0
-
-            for (item_id, status, resv, name, _, vals) in rows:
-                men = int(vals[4]) if str(vals[4]).isdigit() else 0
-                women = int(vals[5]) if str(vals[5]).isdigit() else 0
-                kids = int(vals[6]) if str(vals[6]).isdigit() else 0
-                total = int(vals[7]) if str(vals[7]).isdigit() else 0
-
-                if status == "NS":
-                    page_ns_sum += total
-                elif status in ("CXL", "CXL-CS"):
-                    cxl = self.cxl_deduction_map.get(item_id, {})
-                    for k in ("男", "女", "子供"):
-                        v = cxl.get(k, 0)
-                        if str(v).isdigit():
-                            page_cxl_ded_sum += int(v)
-
-                # ✅ 予約番号左にステータス印字（位置補正あり）
-                self.add_status_to_pdf_resv(
-                    page, resv, name, status, self.log_text,
-                    page_index, fontsize=20
-                )
-
-                # ✅ 人数欄の取り消し線＆CXL減算処理
-                words = page.get_text("words")
-                if not words:
-                    continue
-
-                resv_words = [w for w in words if resv in w[4]]
-                if not resv_words:
-                    self.log_text.insert(tk.END, f"[WARN] 予約番号 '{resv}' が見つかりません。\n")
-                    continue
-
-                resv_end_x = resv_words[-1][2]
-                line_y = (resv_words[-1][1] + resv_words[-1][3]) / 2
-
-                line_numbers = [
-                    w for w in words
-                    if w[0] > resv_end_x + 2
-                    and abs(((w[1] + w[3]) / 2) - line_y) < 6
-                    and w[4].strip().isdigit()
-                ]
-                line_numbers.sort(key=lambda w: w[0])
-
-                seq = ["男", "女", "子供", "合計"]
-
-                # Treeviewには減算後値が入っている
-                def to_int(x): return int(x) if str(x).isdigit() else 0
-
-                # 減算後の値
-                after_m = to_int(vals[4])
-                after_f = to_int(vals[5])
-                after_k = to_int(vals[6])
-                after_total = to_int(vals[7])
-
-                # 元の人数を cxl_deduction_map に保持している場合はそれを利用、
-                # 無ければ減算前データを別途保持（ここでは同じと仮定）
-                orig = self.cxl_deduction_map.get(item_id, {})
-
-                # 元の値は after + deduction（Treeviewが減算後なので逆算）
-                orig_m = after_m + to_int(orig.get("男", 0))
-                orig_f = after_f + to_int(orig.get("女", 0))
-                orig_k = after_k + to_int(orig.get("子供", 0))
-                orig_total = after_total + to_int(orig.get("合計", 0))
-
-                seq = ["男", "女", "子供", "合計"]
-                cxl_info = self.cxl_deduction_map.get(item_id, {}) if status == "CXL" else {}
-                orig_map = {}
-                after_map = {}
-
-                # PDF上の元数値をキー毎に読む（全角対策）
-                for i, key in enumerate(seq):
-                    if i >= len(line_numbers):
-                        continue
-                    wnum = line_numbers[i]
-                    tok = re.sub(r"\D", "", wnum[4].strip())
-                    orig_map[key] = int(tok) if tok.isdigit() else 0
-
-                # CXLの「減算後値」を決める
-                if status in ("CXL", "CXL-CS"):
-                    if isinstance(cxl_info, dict) and "after" in cxl_info:
-                        # すでに after / orig を保持している形式に対応
-                        after_map["男"] = int(cxl_info["after"].get("男", orig_map.get("男", 0)))
-                        after_map["女"] = int(cxl_info["after"].get("女", orig_map.get("女", 0)))
-                        after_map["子供"] = int(cxl_info["after"].get("子供", orig_map.get("子供", 0)))
-                        # 合計は再計算（安全）
-                        after_map["合計"] = after_map["男"] + after_map["女"] + after_map["子供"]
-                    else:
-                        # TreeViewの値（vals[4:7]）は“減算後値”として使う前提
-                        def tv_int(idx, default):
-                            v = vals[idx]
-                            return int(v) if str(v).isdigit() else default
-                        after_map["男"]   = tv_int(4, orig_map.get("男", 0))
-                        after_map["女"]   = tv_int(5, orig_map.get("女", 0))
-                        after_map["子供"] = tv_int(6, orig_map.get("子供", 0))
-                        after_map["合計"] = after_map["男"] + after_map["女"] + after_map["子供"]
-
-                # どれか1つでも減算があるか？
-                any_reduced = False
-                if status in ("CXL", "CXL-CS"):
-                    for k in ("男", "女", "子供", "合計"):
-                        if k in orig_map and k in after_map and after_map[k] < orig_map[k]:
-                            any_reduced = True
-                            break
-
-                for i, key in enumerate(seq):
-                    if i >= len(line_numbers):
-                        continue
-
-                    wnum = line_numbers[i]
-                    x0, x1 = wnum[0] - self.LINE_MARGIN, wnum[2] + self.LINE_MARGIN
-                    y_mid = (wnum[1] + wnum[3]) / 2
-
-                    orig_val = orig_map.get(key, 0)
-                    # 元が0なら全てスキップ
-                    if orig_val == 0:
-                        continue
-
-                    if status == "NS":
-                        # NSは常に線のみ
-                        page.draw_line(p1=(x0, y_mid), p2=(x1, y_mid),
-                                    color=(1, 0, 0), width=self.LINE_WIDTH)
-                        continue
-
-                    if status in ("CXL", "CXL-CS"):
-                        after_val = after_map.get(key, orig_val)
-
-                        if any_reduced:
-                            # ✅ 減算ありの列のみ：線＋減算後数値（0でも描画）
-                            if after_val < orig_val:
-                                page.draw_line(
-                                    p1=(x0, y_mid),
-                                    p2=(x1, y_mid),
-                                    color=(1, 0, 0),
-                                    width=self.LINE_WIDTH
-                                )
-                                # 減算後値は 0 でも必ず描画
-                                page.insert_text(
-                                    (x0 - self.LINE_MARGIN * 2, y_mid - 4),
-                                    str(after_val),
-                                    fontsize=10,
-                                    color=(1, 0, 0),
-                                    fontname=fontname,
-                                    overlay=True
-                                )
-                            # 減算なし列は描画しない
-                        else:
-                            # ✅ CXL全列変更なし → 線のみ
-                            page.draw_line(
-                                p1=(x0, y_mid),
-                                p2=(x1, y_mid),
-                                color=(1, 0, 0),
-                                width=self.LINE_WIDTH
-                            )
-
-
-            # === ✅ 各便（by_page単位）の最終ページで「合計人数」行を処理 ===
-            # === ✅ 合計人数（GUIの最終行）を使ってPDFに反映し、JSONにも保存 ===
-            # --- GUIフッターから合計人数を取得（TreeViewではなくfooter_canvasで計算） ---
-            try:
-                total_m = total_f = total_k = total_sum = 0
-                for iid in self.tree.get_children(""):
-                    vals = self.tree.item(iid, "values")
-                    if len(vals) < 8:
-                        continue
-                    def safe_int(v):
-                        # 「2→1」形式の場合は後ろ側（after値）を使用
-                        if isinstance(v, str) and "→" in v:
-                            try:
-                                return int(v.split("→")[-1])
-                            except:
-                                return 0
-                        return int(v) if str(v).isdigit() else 0
-                    total_m += safe_int(vals[4])
-                    total_f += safe_int(vals[5])
-                    total_k += safe_int(vals[6])
-                    total_sum += safe_int(vals[7])
-
-                self.log_text.insert(
-                    tk.END,
-                    f"[INFO] フッター合計取得: 男={total_m}, 女={total_f}, 子供={total_k}, 合計={total_sum}\n"
-                )
-
-                # --- JSON用 orig/after 構造 ---
-                total_record = {
-                    "resv": "合計人数",
-                    "name": "",
-                    "status": "合計",
-                    "orig": {"男": 0, "女": 0, "子供": 0, "合計": 0},
-                    "after": {"男": total_m, "女": total_f, "子供": total_k, "合計": total_sum},
-                }
-
-                # === 最終ページ特定 ===
-                last_page_index = max(sorted(set(p for (_, _, _, _, p, _) in targets)))
-                if last_page_index >= len(doc_marked):
-                    raise RuntimeError("最終ページ番号が不正")
-
-                page = doc_marked[last_page_index]
-                fontname = ensure_font(page)
-                words = page.get_text("words") or []
-
-                # === 「合計人数」行をPDFから検索 ===
-                lines_by_y = {}
-                for w in words:
-                    x0, y0, x1, y1, text = w[:5]
-                    yk = round(y0, 1)
-                    for yy in lines_by_y.keys():
-                        if abs(yy - yk) <= 1.5:
-                            yk = yy
-                            break
-                    lines_by_y.setdefault(yk, []).append((x0, y0, y1, text))
-
-                target_line = None
-                for yy, items in sorted(lines_by_y.items()):
-                    line_text = "".join(t[3] for t in sorted(items, key=lambda t: t[0]))
-                    if "合計人数" in line_text.replace(" ", ""):
-                        target_line = sorted(items, key=lambda t: t[0])
-                        break
-
-                if not target_line:
-                    self.log_text.insert(tk.END, "[INFO] PDF内に『合計人数』行が見つかりません。\n")
-                else:
-                    # --- 数値トークン抽出 ---
-                    seen_label = False
-                    num_tokens = []
-                    for (x0, y0, y1, text) in target_line:
-                        if "合計人数" in text.replace(" ", ""):
-                            seen_label = True
-                            continue
-                        if seen_label and re.fullmatch(r"\d+", text.strip()):
-                            num_tokens.append((x0, y0, y1, text))
-
-                    if len(num_tokens) >= 4:
-                        seq = ["男", "女", "子供", "合計"]
-                        after_vals = [total_m, total_f, total_k, total_sum]
-
-                        for i, (x0, y0, y1, text) in enumerate(num_tokens[:4]):
-                            y_mid = (y0 + y1) / 2
-                            x_left = x0 - self.LINE_MARGIN
-                            x_right = x0 + len(text) * 5
-
-                            # --- PDF上の元値を取得（全角→半角変換） ---
-                            try:
-                                orig_val = int(re.sub(r"\D", "", text))
-                            except Exception:
-                                orig_val = None
-
-                            after_val = after_vals[i]
-
-                            # ✅ 元値と同じならスキップ（線も描画しない）
-                            if orig_val is not None and orig_val == after_val:
-                                continue
-
-                            # --- 取り消し線 ---
-                            page.draw_line(
-                                p1=(x_left, y_mid),
-                                p2=(x_right, y_mid),
-                                color=(1, 0, 0),
-                                width=self.LINE_WIDTH
-                            )
-
-                            # --- 変更後値を描画（赤文字） ---
-                            page.insert_text(
-                                (x_right + 6, y_mid - 4),
-                                str(after_val),
-                                fontsize=10,
-                                color=(1, 0, 0),
-                                fontname=fontname,
-                                overlay=True
-                            )
-
-                # === ★追加：この位置（forループの外）に配置 ===
-                try:
-                    self.log_text.insert(
-                        tk.END, f"[DEBUG] ○判定: p.{last_page_index+1}\n"
-                    )
-
-                    same_flags = []
-                    for i in range(min(4, len(num_tokens))):
-                        orig_text = num_tokens[i][3]
-                        orig_num = re.sub(r"\D", "", orig_text)
-                        after_val = after_vals[i]
-                        same = (str(after_val) == orig_num)
-                        same_flags.append(same)
-                        self.log_text.insert(
-                            tk.END,
-                            f"[DEBUG]  列={seq[i]} orig='{orig_text}'({orig_num}) → after={after_val} same={same}\n"
-                        )
-
-                    if all(same_flags):
-                        x0, y0, y1, text = num_tokens[3]
-                        cx = (x0 + x0 + len(text) * 5) / 2
-                        cy = (y0 + y1) / 2
-                        radius = max(6, (len(text) * 3))
-                        page.draw_circle(
-                            center=(cx, cy),
-                            radius=radius,
-                            color=(1, 0, 0),
-                            width=1.2,
-                            overlay=True
-                        )
-                        self.log_text.insert(
-                            tk.END,
-                            f"[○] p.{last_page_index+1} 合計人数を○で囲み（人数変更なし）\n"
-                        )
-                    else:
-                        self.log_text.insert(
-                            tk.END,
-                            f"[DEBUG] ○条件未達: same_flags={same_flags}\n"
-                        )
-
-                except Exception as e:
-                    self.log_text.insert(
-                        tk.END,
-                        f"[WARN] ○描画処理中エラー: {e}\n"
-                    )
-            
-
-                # --- JSONに合計人数も保存 ---
-                # === PDFファイル名から日付フォルダーを決定 ===
-                pdf_name = os.path.basename(base_pdf)
-                match = re.search(r"(\d{1,2})[.\-](\d{1,2})", pdf_name)
-                if match:
-                    month, day = match.groups()
-                    try:
-                        year = datetime.now().year
-                        month = month.zfill(2)
-                        day = day.zfill(2)
-                        folder_name = f"{year}-{month}-{day}"
-                        status_folder = os.path.join(os.path.dirname(base_pdf), "status_data", folder_name)
-                        self.log_text.insert(tk.END, f"[INFO] PDF名から日付フォルダー決定: {folder_name}\n")
-                    except Exception as e:
-                        self.log_text.insert(tk.END, f"[WARN] 日付フォルダー名生成失敗: {e}\n")
-                        status_folder = os.path.join(os.path.dirname(base_pdf), "status_data")
-                else:
-                    status_folder = os.path.join(os.path.dirname(base_pdf), "status_data")
-                    self.log_text.insert(tk.END, "[INFO] PDF名に日付が含まれないため既定status_dataを使用。\n")
-
-                os.makedirs(status_folder, exist_ok=True)
-                json_path = os.path.join(status_folder, f"{flight_name}_status.json")
-
-                try:
-                    if os.path.exists(json_path):
-                        #with open(json_path, "r", encoding="utf-8") as f:
-                        #    data = json.load(f)
-                        key = get_encryption_key()  # ← 自動生成＋永続再利用
-                        fernet = Fernet(key)
-
-                        with open(json_path, "rb") as f:
-                            enc = f.read()
-
-                        # 復号してからJSONとして読込
-                        try:
-                            dec = fernet.decrypt(enc)
-                            data = json.loads(dec.decode("utf-8"))
-                        except Exception as e:
-                            self.log_text.insert(tk.END, f"[WARN] ステータスJSONの復号に失敗: {e}\n")
-                            return
-                    else:
-                        data = {"records": []}
-                except Exception:
-                    data = {"records": []}
-
-                # 合計人数レコードを更新／追加
-                data["records"] = [r for r in data.get("records", []) if r.get("resv") != "合計人数"]
-                data["records"].append(total_record)
-
-                #with open(json_path, "w", encoding="utf-8") as f:
-                #    json.dump(data, f, ensure_ascii=False, indent=2)
-                # 暗号化キー読込
-                key = get_encryption_key()  # ← 自動生成＋永続再利用
-                fernet = Fernet(key)
-
-                # JSON文字列化
-                json_str = json.dumps(data, ensure_ascii=False, indent=2)
-
-                # 暗号化してバイナリ書き込み
-                enc = fernet.encrypt(json_str.encode("utf-8"))
-                with open(json_path, "wb") as f:
-                    f.write(enc)
-
-
-                self.log_text.insert(tk.END, f"[JSON更新] 合計人数を保存しました ({json_path})\n")
-
-            except Exception as e:
-                self.log_text.insert(tk.END, f"[ERROR] フッター合計人数処理失敗: {e}\n")
+            page_words = words_of(page_index)
+            fontname = self._ensure_status_font(page)
+            self._stamp_status_rows(
+                page, page_index, page_words,
+                [(item_id, status, resv, name, vals) for (item_id, status, resv, name, _, vals) in rows],
+                self.cxl_deduction_map, fontname
+            )
 
-        import time
+            # === ✅ 最終ページを処理するときに1回だけ「合計人数」行を処理（GUIの合計を反映） ===
+            if page_index == last_page_index:
+                last_resvs = [resv for (_, _, resv, _, p, _) in targets if p == last_page_index]
+                self._stamp_total_line(page, page_index, page_words, self.footer_sums, fontname,
+                                       below_y=page_words.bottom_of(last_resvs))
 
-        # --- PDF保存 ---
-        temp_path = marked_pdf + ".tmp"
-        doc_marked.save(temp_path)
-        doc_marked.close()
-
-        time.sleep(0.3)
-        os.replace(temp_path, marked_pdf)
-        self.log_text.insert(tk.END, f"[PDF保存] {os.path.basename(marked_pdf)} に追記完了。\n")
-
-        # --- JSON保存 ---
-        # --- JSON保存 ---
-        # === PDFファイル名から日付フォルダーを決定 ===
-        pdf_name = os.path.basename(base_pdf)
-        match = re.search(r"(\d{1,2})[.\-](\d{1,2})", pdf_name)
-        if match:
-            month, day = match.groups()
-            try:
-                year = datetime.now().year
-                month = month.zfill(2)
-                day = day.zfill(2)
-                folder_name = f"{year}-{month}-{day}"
-                status_folder = os.path.join(os.path.dirname(base_pdf), "status_data", folder_name)
-                self.log_text.insert(tk.END, f"[INFO] PDF名から日付フォルダー決定: {folder_name}\n")
-            except Exception as e:
-                self.log_text.insert(tk.END, f"[WARN] 日付フォルダー名生成失敗: {e}\n")
-                status_folder = os.path.join(os.path.dirname(base_pdf), "status_data")
+        # === 同じ保管用PDFの他便: 描き直したページの印字を status.db の保存内容から復元 ===
+        for page_index, entries in sorted(other_plan.items()):
+            if not (0 <= page_index < len(doc_marked)):
+                continue
+            page = doc_marked[page_index]
+            page_words = words_of(page_index)
+            fontname = self._ensure_status_font(page)
+            for other_flight, rows, cxl_map, totals, last_resvs in entries:
+                self._stamp_status_rows(page, page_index, page_words, rows, cxl_map, fontname)
+                if totals is not None:
+                    self._stamp_total_line(page, page_index, page_words, totals, fontname,
+                                           below_y=page_words.bottom_of(last_resvs))
+                self.log_text.insert(tk.END, f"[復元] p.{page_index+1} {other_flight}（{len(rows)} 件）\n")
+
+        # --- PDF保存（描き直したページ・ページ記録の更新があるときだけ） ---
+        if fresh_pages or stored_hashes != base_hashes:
+            write_base_page_hashes(doc_marked, base_hashes)
+            mode = self._save_marked_pdf(doc_marked, marked_pdf, base_pdf)
+            self.log_text.insert(
+                tk.END,
+                f"[PDF保存] {os.path.basename(marked_pdf)} に追記完了（{mode}・{len(fresh_pages)} ページ）。\n"
+            )
         else:
-            status_folder = os.path.join(os.path.dirname(base_pdf), "status_data")
-            self.log_text.insert(tk.END, "[INFO] PDF名に日付が含まれないため既定status_dataを使用。\n")
-
-        os.makedirs(status_folder, exist_ok=True)
-        json_path = os.path.join(status_folder, f"{flight_name}_status.json")
+            doc_marked.close()
+
+        # --- ステータス保存（DB） ---
+        # === PDFファイル名から日付を決定 ===
+        status_root = os.path.join(os.path.dirname(base_pdf), "status_data")
+        folder_name = status_date_for_pdf(base_pdf)
+        if folder_name:
+            self.log_text.insert(tk.END, f"[INFO] PDF名から日付決定: {folder_name}\n")
+        else:
+            self.log_text.insert(tk.END, "[INFO] PDF名に日付が含まれないため日付なしで保存。\n")
 
 
         # ▼▼▼ ここから置換：orig/after の堅牢な算出ロジック ▼▼▼
@@ -1749,13 +2216,7 @@ class PDFPassengerSearchApp:
             return om, of, ok, ot
         # ▲▲▲ ここまで置換 ▲▲▲
 
-        data = {
-            "便名": flight_name,
-            "pdf_path": base_pdf,
-            "timestamp": datetime.now().isoformat(),
-            "records": []
-        }
-
+        records = []
         for item_id, status, resv, name, _, vals in targets:
             # after/orig を必ず両方確定（NSもCXLも同じ枠に格納する）
             after_m, after_f, after_k, after_t = _get_after_values(status, item_id, vals)
@@ -1779,28 +2240,36 @@ class PDFPassengerSearchApp:
                     "after": {"男": after_m, "女": after_f, "子供": after_k, "合計": after_t},
                 }
 
-            data["records"].append(record)
-
-        #with open(json_path, "w", encoding="utf-8") as f:
-        #    json.dump(data, f, ensure_ascii=False, indent=2)
-        # 暗号化キー読込
-        key = get_encryption_key()  # ← 自動生成＋永続再利用
-        fernet = Fernet(key)
+            records.append(record)
 
-        # JSON文字列化
-        json_str = json.dumps(data, ensure_ascii=False, indent=2)
+        # 乗客レコード＋合計人数を1つの文書にまとめて DB へ保存
+        data = build_status_document(flight_name, base_pdf, records, total_record)
+        get_status_cipher().load(lambda msg: self.log_text.insert(tk.END, msg + "\n"))
+        status_db = get_status_db(status_root)
+        if status_db.flight_updated_at(folder_name, flight_name) is None:
+            # 初回はスナップショットとして全件保存
+            status_db.replace_flight(
+                folder_name, flight_name, data["records"], pdf_path=base_pdf, updated_at=data["timestamp"]
+            )
+            self.log_text.insert(tk.END, f"[DB保存] {folder_name or '日付なし'} / {flight_name}（{len(data['records'])} 件）\n")
+        else:
+            # 2回目以降は基準から変わった予約番号＋合計人数だけを変更履歴に追記
+            changed = [r for r in data["records"]
+                       if r.get("resv") in self.dirty_resvs or r.get("resv") == "合計人数"]
+            status_db.append_changes(folder_name, flight_name, changed, pdf_path=base_pdf)
+            self.log_text.insert(tk.END, f"[DB追記] {folder_name or '日付なし'} / {flight_name}（変更 {len(changed)} 件）\n")
 
-        # 暗号化してバイナリ書き込み
-        enc = fernet.encrypt(json_str.encode("utf-8"))
-        with open(json_path, "wb") as f:
-            f.write(enc)
+        # Excel 側が読む <便名>_status.json を DB の内容で書き出す（DB 保存とは別。失敗しても保存済み）
+        try:
+            json_path = export_status_json(status_db, status_root, folder_name, flight_name)
+            self.log_text.insert(tk.END, f"[JSON書き出し] {json_path}\n")
+        except Exception as e:
+            self.log_text.insert(tk.END, f"[WARN] <便名>_status.json の書き出しに失敗（DBには保存済み）: {e}\n")
 
-        self.log_text.insert(tk.END, f"[JSON上書き] {json_path}\n")
 
 
         # すべて正常保存できたら、現在表示を新たな基準にする
-        self.baseline_snapshot = self._make_snapshot_from_tree()
-        self.unsaved_changes = False
+        self._reset_baseline()
         self.log_text.insert(tk.END, "[INFO] 保存完了 → 未保存フラグOFF\n")
 
         messagebox.showinfo("完了", "PDFへの書き込みが完了しました。", parent=self.root)
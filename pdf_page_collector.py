@@ -0,0 +1,1381 @@
+"""
+出発名簿PDF抽出のコア処理（GUI非依存）。
+GUI版（pdf_page_collector_gui_full_2.9.py）とコマンドライン版で共用する。
+
+コマンドライン:
+    python -m pdf_page_collector extract <フォルダ> [--output DIR] [--workers N] [--backend fitz|pypdf2]
+    python -m pdf_page_collector watch [--folder DIR] [--output DIR]
+"""
+import os
+import re
+import bisect
+import time
+import threading
+import json
+import sys
+import hashlib
+import unicodedata
+from collections import defaultdict
+
+if getattr(sys, 'frozen', False):
+    # PyInstaller で exe 化した場合
+    base_dir = os.path.dirname(sys.executable)
+else:
+    # スクリプトとして実行している場合
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+
+
+MAIN_FILE = os.path.join(base_dir, "出力便名リスト.txt")
+CONFIG_FILE = os.path.join(base_dir, "config.json")
+WATCH_FOLDER = base_dir
+OUTPUT_FOLDER = base_dir
+
+# 抽出エンジンの既定値（設定なし・不明な名前のときもこれを使う）
+DEFAULT_PDF_BACKEND = "fitz"
+
+# 抽出設定（config.json の "extract"）: max_jobs は同時処理フォルダ数、
+# workers<=1 なら直列抽出、backend は "fitz" / "pypdf2"
+DEFAULT_EXTRACT_SETTINGS = {
+    "max_jobs": 2,
+    "retries": 1,
+    "workers": 4,
+    "chunk_pages": 50,
+    "backend": DEFAULT_PDF_BACKEND,
+    "cache": True,
+    "cache_days": 30,
+    "cache_max_mb": 100,
+}
+EXTRACT_SETTINGS = dict(DEFAULT_EXTRACT_SETTINGS)
+
+# 監視設定（config.json の "watch"）: 最後の変更から quiet_seconds 静止したら抽出開始
+DEFAULT_WATCH_SETTINGS = {"quiet_seconds": 5, "poll_seconds": 1, "max_wait_seconds": 300}
+WATCH_SETTINGS = dict(DEFAULT_WATCH_SETTINGS)
+
+
+def set_current_folder(name):
+    """抽出中フォルダの表示更新。GUI版では run_gui() がラベル更新関数に差し替える"""
+    pass
+
+
+# =====================
+# 設定ロード/保存
+# =====================
+def load_config(ben_list):
+    cfg = {}
+    if os.path.exists(CONFIG_FILE):
+        try:
+            with open(CONFIG_FILE,"r",encoding="utf-8") as f:
+                cfg = json.load(f)
+        except:
+            cfg = {}
+    config={}
+    for ben in ben_list:
+        config[ben]={
+            "座席表": cfg.get(ben,{}).get("座席表",False),
+            "バス号車別明細表_乗務員用": cfg.get(ben,{}).get("バス号車別明細表_乗務員用",False),
+            "バス号車別明細表_保管用": cfg.get(ben,{}).get("バス号車別明細表_保管用",False)
+        }
+    return config
+
+def save_config(config):
+    with open(CONFIG_FILE,"w",encoding="utf-8") as f:
+        json.dump(config,f,ensure_ascii=False,indent=2)
+
+# =====================
+# 便名判定（ページ単位・1回走査）
+# =====================
+# 便名の前後に来てはいけない文字（英数字・漢字・ひらがな・カタカナ）
+BOUNDARY_CHARS = r"0-9A-Za-z\u4e00-\u9fff\u3040-\u309f\u30a0-\u30ff"
+
+
+# --- テキスト正規化 ---
+def normalize_text(s):
+    if s is None:
+        return ""
+    s = unicodedata.normalize("NFKC", s)
+    s = s.replace("\u3000", " ").replace("\u200b", "")
+    return re.sub(r"\s+", " ", s).strip().lower()
+
+
+def _spaced_pattern(norm_kw):
+    """1文字ごとに空白を許容する便名パターン（厳密一致も含む）"""
+    return "".join([re.escape(ch) + r"\s*" for ch in norm_kw])
+
+
+# --- 厳密マッチ ---
+def keyword_strict_match(norm_text, norm_kw):
+    strict_pat = rf"(?<![{BOUNDARY_CHARS}]){re.escape(norm_kw)}(?![{BOUNDARY_CHARS}])"
+    if re.search(strict_pat, norm_text):
+        return True
+    spaced_pat = rf"(?<![{BOUNDARY_CHARS}]){_spaced_pattern(norm_kw)}(?![{BOUNDARY_CHARS}])"
+    return re.search(spaced_pat, norm_text) is not None
+
+
+class BenClassifier:
+    """
+    ben_list 全体を1本の正規表現にまとめ、1ページ1回の走査で該当便をすべて返す。
+    判定結果は keyword_strict_match を便ごとに呼んだ場合と同一。
+    """
+
+    def __init__(self, ben_list):
+        self.ben_list = list(ben_list)
+        self.norm_map = {ben: normalize_text(ben) for ben in self.ben_list}
+
+        keys = list(dict.fromkeys(self.norm_map.values()))
+        flat = {k: re.sub(r"\s", "", k) for k in keys}
+
+        # 同じ位置から始まる別の便名に隠れうるもの（前方一致）や空文字は個別に判定
+        self.single_keys = [
+            k for k in keys
+            if not flat[k] or any(o != k and flat[o].startswith(flat[k]) for o in keys)
+        ]
+        self.single_patterns = {
+            k: re.compile(
+                rf"(?<![{BOUNDARY_CHARS}]){_spaced_pattern(k)}(?![{BOUNDARY_CHARS}])"
+            )
+            for k in self.single_keys
+        }
+
+        # 残りは長い順に名前付きグループで連結（先読み内なので重なりも拾える）
+        self.group_keys = {}
+        alts = []
+        for i, k in enumerate(sorted((k for k in keys if k not in self.single_keys), key=len, reverse=True)):
+            name = f"k{i}"
+            self.group_keys[name] = k
+            alts.append(rf"(?P<{name}>{_spaced_pattern(k)})(?![{BOUNDARY_CHARS}])")
+        self.scan_pattern = (
+            re.compile(rf"(?<![{BOUNDARY_CHARS}])(?=(?:{'|'.join(alts)}))") if alts else None
+        )
+
+    def match(self, norm_text):
+        """正規化済みページテキストに含まれる便を ben_list の順で返す"""
+        hits = set()
+        if self.scan_pattern is not None:
+            for m in self.scan_pattern.finditer(norm_text):
+                hits.add(self.group_keys[m.lastgroup])
+        for k, pat in self.single_patterns.items():
+            if pat.search(norm_text):
+                hits.add(k)
+        return [ben for ben in self.ben_list if self.norm_map[ben] in hits]
+
+
+# =====================
+# PDFバックエンド（PyPDF2 / PyMuPDF）
+# =====================
+class PyPDF2Backend:
+    """PyPDF2 によるテキスト抽出・ページ複製"""
+    name = "pypdf2"
+
+    def open(self, path):
+        import PyPDF2
+        return PyPDF2.PdfReader(path)
+
+    def page_count(self, doc):
+        return len(doc.pages)
+
+    def page_text(self, doc, index):
+        return doc.pages[index].extract_text() or ""
+
+    def new_writer(self):
+        import PyPDF2
+        return PyPDF2.PdfWriter()
+
+    def insert_page(self, writer, doc, index, at):
+        # insert_page はページを writer 側へ複製するため、元の reader は閉じてよい
+        writer.insert_page(doc.pages[index], at)
+
+    def save(self, writer, out_path):
+        with open(out_path, "wb") as f:
+            writer.write(f)
+
+    def close(self, doc):
+        pass
+
+
+class FitzBackend:
+    """PyMuPDF(fitz) によるテキスト抽出・ページ複製（get_text / insert_pdf）"""
+    name = "fitz"
+
+    def open(self, path):
+        import fitz
+        return fitz.open(path)
+
+    def page_count(self, doc):
+        return len(doc)
+
+    def page_text(self, doc, index):
+        return doc[index].get_text() or ""
+
+    def new_writer(self):
+        import fitz
+        return fitz.open()
+
+    def insert_page(self, writer, doc, index, at):
+        start_at = at if at < len(writer) else -1
+        writer.insert_pdf(doc, from_page=index, to_page=index, start_at=start_at)
+
+    def save(self, writer, out_path):
+        writer.save(out_path, garbage=3, deflate=True)
+        writer.close()
+
+    def close(self, doc):
+        doc.close()
+
+
+PDF_BACKENDS = {b.name: b for b in (PyPDF2Backend(), FitzBackend())}
+
+
+def write_pages_streaming(backend, refs, out_path):
+    """
+    refs: 出力順の [(pdf_path, ページ番号)]。
+    入力PDFを1ファイルずつ開いて必要なページを最終位置へ差し込み、すぐ閉じる。
+    同時に開いている入力は常に1ファイルだけなので、メモリは最大の入力1つ分＋出力で収まる。
+    """
+    by_file = {}
+    for pos, (path, index) in enumerate(refs):
+        by_file.setdefault(path, []).append((pos, index))
+
+    writer = backend.new_writer()
+    placed = []  # 差し込み済みページの最終位置（昇順）
+    for path, items in by_file.items():
+        doc = backend.open(path)
+        try:
+            for pos, index in items:
+                at = bisect.bisect_left(placed, pos)
+                backend.insert_page(writer, doc, index, at)
+                placed.insert(at, pos)
+        finally:
+            backend.close(doc)
+    backend.save(writer, out_path)
+    return len(refs)
+
+
+def get_pdf_backend(name):
+    """config.json の extract.backend からバックエンドを取得（未指定・不明な名前は DEFAULT_PDF_BACKEND）"""
+    return PDF_BACKENDS.get(str(name or "").lower(), PDF_BACKENDS[DEFAULT_PDF_BACKEND])
+
+
+# =====================
+# ページテキスト抽出（プロセスプール対応）
+# =====================
+_classifier_cache = {}
+
+
+def _get_classifier(ben_list):
+    """ワーカープロセス内で BenClassifier を使い回す"""
+    key = tuple(ben_list)
+    if key not in _classifier_cache:
+        _classifier_cache[key] = BenClassifier(key)
+    return _classifier_cache[key]
+
+
+def classify_page_range(pdf_path, start, stop, ben_list, backend_name=DEFAULT_PDF_BACKEND, reader=None):
+    """
+    pdf_path の start〜stop-1 ページを読み、
+    (ページ番号, 正規化テキスト, 該当便リスト, 座席表か, バス号車別明細表か) のリストを返す。
+    ワーカープロセスから呼ばれるためモジュール直下に置く。
+    """
+    backend = get_pdf_backend(backend_name)
+    own_reader = reader is None
+    if own_reader:
+        reader = backend.open(pdf_path)
+    classifier = _get_classifier(ben_list)
+
+    results = []
+    try:
+        for i in range(start, stop):
+            text = backend.page_text(reader, i)
+            norm_text = normalize_text(text)
+            results.append((i, norm_text, classifier.match(norm_text), "座席表" in text, "バス号車別明細表" in text))
+    finally:
+        if own_reader:
+            backend.close(reader)
+    return results
+
+
+def read_pdf_pages(pdf_paths, ben_list, log_queue, workers=1, chunk_pages=50, backend=None):
+    """
+    pdf_paths を順番どおりに分類し、{pdf_path: ページ結果リスト} を返す（読込失敗のファイルは含まない）。
+    workers > 1 のときはページ範囲ごとにプロセスプールへ分散。結果の並びは直列実行と同一。
+    直列時も1ファイルずつ開いて閉じるため、同時に保持する文書は1つだけ。
+    """
+    backend = backend or get_pdf_backend(None)
+    use_pool = workers > 1
+
+    jobs = []
+    results = {}
+    for pdf_path in pdf_paths:
+        fname = os.path.basename(pdf_path)
+        try:
+            reader = backend.open(pdf_path)
+        except Exception as e:
+            log_queue.put(f"[ERROR] {fname} 読み込み失敗 ({e})")
+            continue
+        try:
+            n = backend.page_count(reader)
+            results[pdf_path] = []
+            if not use_pool:
+                results[pdf_path] = classify_page_range(pdf_path, 0, n, ben_list, backend.name, reader=reader)
+                continue
+        finally:
+            backend.close(reader)
+        step = max(1, int(chunk_pages))
+        for start in range(0, n, step):
+            jobs.append((pdf_path, start, min(start + step, n)))
+
+    if not use_pool:
+        return results
+
+    if len(jobs) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        from concurrent.futures.process import BrokenProcessPool
+
+        t0 = time.perf_counter()
+        try:
+            with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+                futures = [
+                    pool.submit(classify_page_range, path, s, e, list(ben_list), backend.name)
+                    for path, s, e in jobs
+                ]
+                for (path, _, _), fut in zip(jobs, futures):
+                    results[path].extend(fut.result())
+            log_queue.put(
+                f"[INFO] 並列抽出完了: {len(jobs)}ジョブ / {workers}プロセス ({time.perf_counter() - t0:.2f}秒)"
+            )
+            return results
+        except (BrokenProcessPool, OSError) as e:
+            log_queue.put(f"[WARN] プロセスプール利用不可のため直列抽出に切替: {e}")
+            results = {pdf_path: [] for pdf_path in results}
+
+    # --- 直列フォールバック ---
+    for path, s, e in jobs:
+        results[path].extend(classify_page_range(path, s, e, ben_list, backend.name))
+    return results
+
+
+# =====================
+# 抽出キャッシュ（ファイル内容ハッシュ → ページ別の判定結果）
+# =====================
+EXTRACT_CACHE_FILE = ".pdf_extract_cache_v2.sqlite"
+LEGACY_EXTRACT_CACHE_FILES = (".pdf_extract_cache.sqlite",)   # ページ本文を平文で持っていた旧形式
+
+
+def file_hash(path):
+    """ファイル内容ハッシュ（抽出キャッシュのキー）"""
+    h = hashlib.md5()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(4096), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def ben_list_key(ben_list):
+    """便名リストの識別子（便名リストが変わればキャッシュは別エントリになる）"""
+    return hashlib.sha1("\n".join(ben_list).encode("utf-8")).hexdigest()[:16]
+
+
+def extract_run_signature(pdf_entries, ben_list, config, backend_name, output_folder, folder_display):
+    """
+    フォルダ1回分の抽出条件の署名。
+    pdf_entries は os.listdir 順の [(ファイル名, サイズ, 更新時刻)]。並び順・便名リスト・印刷設定・エンジンも含める。
+    """
+    payload = json.dumps(
+        [pdf_entries, list(ben_list), {ben: config.get(ben) for ben in ben_list},
+         backend_name, os.path.abspath(output_folder), folder_display],
+        ensure_ascii=False, sort_keys=True
+    )
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+class ExtractCache:
+    """
+    出力フォルダー直下の SQLite に、PDF内容ハッシュごとのページ判定結果（該当便・座席表か・明細表か）を保存する。
+    ページ本文（氏名・電話番号を含む）は保存しない。便名リストが変わった場合は別エントリとして再抽出する。
+    フォルダ単位の前回実行（入力の署名・出力PDF・状態表示）も記録し、何も変わっていなければ出力を再利用する。
+    """
+
+    def __init__(self, folder, max_age_days=30, max_mb=100):
+        import sqlite3
+
+        self.path = os.path.join(folder, EXTRACT_CACHE_FILE)
+        self.max_age = float(max_age_days) * 86400
+        self.max_bytes = float(max_mb) * 1024 * 1024
+        for name in LEGACY_EXTRACT_CACHE_FILES:
+            legacy = os.path.join(folder, name)
+            if os.path.exists(legacy):
+                try:
+                    os.remove(legacy)
+                except OSError:
+                    pass
+        self.conn = sqlite3.connect(self.path, timeout=10)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS files (
+                hash TEXT, backend TEXT, bens TEXT, pages TEXT, size INTEGER, last_used REAL,
+                PRIMARY KEY (hash, backend, bens)
+            );
+            CREATE TABLE IF NOT EXISTS runs (
+                folder TEXT PRIMARY KEY, signature TEXT, data TEXT, last_used REAL
+            );
+        """)
+
+    def get(self, file_hash, backend_name, bens_key):
+        """キャッシュ済みなら [(ページ番号, 該当便リスト, 座席表か, 明細表か)] を返す。なければ None"""
+        row = self.conn.execute(
+            "SELECT pages FROM files WHERE hash=? AND backend=? AND bens=?", (file_hash, backend_name, bens_key)
+        ).fetchone()
+        if row is None:
+            return None
+        with self.conn:
+            self.conn.execute(
+                "UPDATE files SET last_used=? WHERE hash=? AND backend=? AND bens=?",
+                (time.time(), file_hash, backend_name, bens_key)
+            )
+        return [(i, bens, bool(s), bool(m)) for i, bens, s, m in json.loads(row[0])]
+
+    def put(self, file_hash, backend_name, bens_key, pages):
+        """pages: [(ページ番号, 該当便リスト, 座席表か, 明細表か)]"""
+        data = json.dumps([[i, list(bens), int(s), int(m)] for i, bens, s, m in pages], ensure_ascii=False)
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?)",
+                (file_hash, backend_name, bens_key, data, len(data.encode("utf-8")), time.time())
+            )
+
+    def get_run(self, folder):
+        """フォルダの前回実行 (署名, data) を返す。なければ None"""
+        row = self.conn.execute("SELECT signature, data FROM runs WHERE folder=?", (folder,)).fetchone()
+        return (row[0], json.loads(row[1])) if row else None
+
+    def put_run(self, folder, signature, data):
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO runs VALUES (?, ?, ?, ?)",
+                (folder, signature, json.dumps(data, ensure_ascii=False), time.time())
+            )
+
+    def evict(self):
+        """古いエントリ（max_age_days 超過）と容量超過分（古い順）を削除。削除件数を返す"""
+        rows = self.conn.execute(
+            "SELECT hash, backend, bens, size, last_used FROM files ORDER BY last_used DESC"
+        ).fetchall()
+        now = time.time()
+        total = 0
+        drop = []
+        for h, b, k, size, last_used in rows:
+            total += size or 0
+            if now - (last_used or 0) > self.max_age or total > self.max_bytes:
+                drop.append((h, b, k))
+        with self.conn:
+            if drop:
+                self.conn.executemany("DELETE FROM files WHERE hash=? AND backend=? AND bens=?", drop)
+            self.conn.execute("DELETE FROM runs WHERE last_used < ?", (now - self.max_age,))
+        return len(drop)
+
+    def close(self):
+        self.conn.close()
+
+
+# =====================
+# PDF抽出
+# （省略せず既存のまま）
+# =====================
+def pdf_folder_signature(folder_path):
+    """フォルダ内PDFの (ファイル名, サイズ, 更新時刻) 集合。追加・差し替えの検知に使う"""
+    sig = set()
+    for f in os.listdir(folder_path):
+        if not f.lower().endswith(".pdf"):
+            continue
+        try:
+            st = os.stat(os.path.join(folder_path, f))
+        except OSError:
+            continue
+        sig.add((f, st.st_size, st.st_mtime_ns))
+    return frozenset(sig)
+
+
+def extract_pdf_by_criteria(pdf_folder, ben_list, config, output_folder, log_queue, status_queue, folder_display,
+                            workers=None, backend=None, file_state=None, cancel_event=None):
+    """
+    file_state: 前回実行時のファイル状態 {パス: {"size", "mtime", "hash", "backend", "pages"}}。
+    渡された場合はサイズ・更新時刻が同じファイルのハッシュ計算と抽出を省略し、実行後に内容を更新する。
+    cancel_event: セットされていればページ抽出前・PDF出力前に ExtractCancelled で中断する。
+    """
+    def check_cancel():
+        if cancel_event is not None and cancel_event.is_set():
+            raise ExtractCancelled(folder_display)
+
+    # 戻り値（コマンドライン版の終了コード判定などに使用）
+    result = {"folder": folder_display, "pdf_files": 0, "pages": 0, "outputs": []}
+
+    log_queue.put(f"[INFO] PDF抽出開始: {folder_display} ({pdf_folder})")
+
+    if backend is None:
+        backend = EXTRACT_SETTINGS.get("backend", DEFAULT_PDF_BACKEND)
+    backend = get_pdf_backend(backend)
+
+    cache = None
+    if EXTRACT_SETTINGS.get("cache", True):
+        try:
+            cache = ExtractCache(
+                output_folder,
+                max_age_days=EXTRACT_SETTINGS.get("cache_days", 30),
+                max_mb=EXTRACT_SETTINGS.get("cache_max_mb", 100)
+            )
+        except Exception as e:
+            log_queue.put(f"[WARN] 抽出キャッシュを開けません: {e}")
+
+    try:
+        return _extract_with_cache(
+            pdf_folder, ben_list, config, output_folder, log_queue, status_queue, folder_display,
+            workers, backend, file_state, check_cancel, cache, result
+        )
+    finally:
+        if cache is not None:
+            cache.close()
+
+
+def _extract_with_cache(pdf_folder, ben_list, config, output_folder, log_queue, status_queue, folder_display,
+                        workers, backend, file_state, check_cancel, cache, result):
+    """extract_pdf_by_criteria の本体（cache は呼び出し側で開閉する）"""
+    # --- 入力一覧（os.listdir 順）。前回と同じ入力・設定で出力PDFも残っていれば何もしない ---
+    entries = []
+    for f in os.listdir(pdf_folder):
+        if not f.lower().endswith(".pdf"):
+            continue
+        try:
+            st = os.stat(os.path.join(pdf_folder, f))
+        except OSError:
+            continue
+        entries.append((f, st.st_size, st.st_mtime_ns))
+
+    run_key = os.path.abspath(pdf_folder)
+    signature = extract_run_signature(entries, ben_list, config, backend.name, output_folder, folder_display)
+    if cache is not None:
+        try:
+            prev_run = cache.get_run(run_key)
+        except Exception as e:
+            prev_run = None
+            log_queue.put(f"[WARN] 抽出キャッシュ読込失敗: {e}")
+        if prev_run and prev_run[0] == signature and _outputs_unchanged(prev_run[1].get("outputs", [])):
+            data = prev_run[1]
+            for item in data.get("status", []):
+                status_queue.put(tuple(item))
+            result.update(data["result"])
+            log_queue.put(f"[SKIP] 入力PDF・設定とも前回と同じため、出力済みPDFをそのまま使います: {folder_display}")
+            set_current_folder(f"{folder_display}　抽出完了")
+            return result
+
+    # 状態表示は前回実行の再現用に記録しておく
+    status_queue = RecordingQueue(status_queue)
+
+    # --- PDFファイル取得（重複判定あり） ---
+    pdf_files = []
+    file_hashes = {}
+    seen_names = set()
+    seen_hashes = set()
+    for f, _, _ in entries:
+        full_path = os.path.join(pdf_folder, f)
+        norm_name = f.lower().strip()
+
+        # ファイル名重複
+        if norm_name in seen_names:
+            log_queue.put(f"[SKIP] 重複ファイル名: {f}")
+            continue
+        seen_names.add(norm_name)
+
+        # 内容重複（前回とサイズ・更新時刻が同じならハッシュを再利用）
+        try:
+            st = os.stat(full_path)
+            prev = file_state.get(full_path) if file_state is not None else None
+            if prev and prev["size"] == st.st_size and prev["mtime"] == st.st_mtime_ns:
+                h = prev["hash"]
+            else:
+                h = file_hash(full_path)
+                if file_state is not None:
+                    file_state[full_path] = {"size": st.st_size, "mtime": st.st_mtime_ns, "hash": h}
+            if h in seen_hashes:
+                log_queue.put(f"[SKIP] 重複内容: {f}")
+                continue
+            seen_hashes.add(h)
+        except Exception as e:
+            log_queue.put(f"[WARN] ハッシュ計算失敗: {f} ({e})")
+            continue
+
+        pdf_files.append(full_path)
+        file_hashes[full_path] = h
+
+    if file_state is not None:
+        # 削除・重複になったファイルは前回状態から外す
+        for path in list(file_state):
+            if path not in file_hashes:
+                del file_state[path]
+
+    if not pdf_files:
+        log_queue.put(f"[INFO] PDFなし: {folder_display}")
+        return result
+    result["pdf_files"] = len(pdf_files)
+
+    # --- ページ抽出 ---
+    # (出力種別, 便名, 書類種別) → [(ファイル, ページ番号)]（抽出順を保持）
+    intermediate_files = defaultdict(list)
+    extract_counts = {
+        ben: {
+            "座席表": 0,
+            "バス号車別明細表(乗務員用)": 0,
+            "バス号車別明細表(保管用)": 0
+        }
+        for ben in ben_list
+    }
+
+    log_queue.put(f"[INFO] 抽出エンジン: {backend.name}")
+
+    # --- キャッシュ済みファイルは抽出をスキップ ---
+    bens_key = ben_list_key(ben_list)
+    page_results = {}
+    to_extract = []
+    reused = 0
+    for pdf_path in pdf_files:
+        cached = None
+        prev = file_state.get(pdf_path) if file_state is not None else None
+        if prev and prev.get("backend") == backend.name and prev.get("bens") == bens_key and "pages" in prev:
+            # 前回実行時のページ一覧をそのまま使う（ファイル読込なし）
+            cached = prev["pages"]
+            reused += 1
+        elif cache is not None:
+            try:
+                cached = cache.get(file_hashes[pdf_path], backend.name, bens_key)
+            except Exception as e:
+                log_queue.put(f"[WARN] 抽出キャッシュ読込失敗: {e}")
+        if cached is None:
+            to_extract.append(pdf_path)
+        else:
+            page_results[pdf_path] = [
+                (i, None, matched_bens, is_seat, is_meisai)
+                for i, matched_bens, is_seat, is_meisai in cached
+            ]
+    if reused:
+        log_queue.put(f"[INFO] 変更なしPDF: {reused}件（前回の抽出結果を再利用）")
+    if cache is not None:
+        log_queue.put(f"[INFO] 抽出キャッシュ: ヒット {len(pdf_files) - len(to_extract) - reused}件 / 抽出 {len(to_extract)}件")
+
+    if workers is None:
+        workers = EXTRACT_SETTINGS.get("workers", 1)
+    check_cancel()
+    if to_extract:
+        page_results.update(read_pdf_pages(
+            to_extract, ben_list, log_queue,
+            workers=workers,
+            chunk_pages=EXTRACT_SETTINGS.get("chunk_pages", 50),
+            backend=backend
+        ))
+
+    if cache is not None:
+        try:
+            for pdf_path in to_extract:
+                if pdf_path not in page_results:
+                    continue
+                cache.put(
+                    file_hashes[pdf_path], backend.name, bens_key,
+                    [(i, bens, s, m) for i, _, bens, s, m in page_results[pdf_path]]
+                )
+            evicted = cache.evict()
+            if evicted:
+                log_queue.put(f"[INFO] 抽出キャッシュ: 古いエントリ {evicted}件を削除")
+        except Exception as e:
+            log_queue.put(f"[WARN] 抽出キャッシュ保存失敗: {e}")
+
+    if file_state is not None:
+        for pdf_path in page_results:
+            file_state[pdf_path]["backend"] = backend.name
+            file_state[pdf_path]["bens"] = bens_key
+            file_state[pdf_path]["pages"] = [(i, bens, s, m) for i, _, bens, s, m in page_results[pdf_path]]
+
+    # 中間結果は (ファイル, ページ番号) の参照のみ保持し、ページ本体は出力時に読む
+    for pdf_path in pdf_files:
+        if pdf_path not in page_results:
+            continue
+        fname = os.path.basename(pdf_path)
+
+        for i, _, matched_bens, is_seat, is_meisai in page_results[pdf_path]:
+            page = (pdf_path, i)
+
+            for ben in matched_bens:
+                # 座席表
+                if is_seat:
+                    if config[ben]["座席表"]:
+                        intermediate_files[("乗務員用", ben, "座席表")].append(page)
+                        extract_counts[ben]["座席表"] += 1  # ✅ 抽出数カウント
+                        log_queue.put(f"[PAGE] {fname} → {ben} 座席表")
+                        status_queue.put((ben, "座席表", 1))
+                    else:
+                        status_queue.put((ben, "座席表", 0))  # 赤判定（印刷OFF）
+
+                # バス号車別明細
+                if is_meisai:
+                    # 乗務員用
+                    if config[ben]["バス号車別明細表_乗務員用"]:
+                        intermediate_files[("乗務員用", ben, "バス号車別明細表")].append(page)
+                        extract_counts[ben]["バス号車別明細表(乗務員用)"] += 1  # ✅ 抽出数カウント
+                        log_queue.put(f"[PAGE] {fname} → {ben} バス号車別明細表(乗務員用)")
+                        status_queue.put((ben, "バス号車別明細表(乗務員用)", 1))
+                    else:
+                        status_queue.put((ben, "バス号車別明細表(乗務員用)", 0))
+
+                    # 保管用
+                    if config[ben]["バス号車別明細表_保管用"]:
+                        intermediate_files[("保管用", ben, "バス号車別明細表")].append(page)
+                        extract_counts[ben]["バス号車別明細表(保管用)"] += 1  # ✅ 抽出数カウント
+                        log_queue.put(f"[PAGE] {fname} → {ben} バス号車別明細表(保管用)")
+                        status_queue.put((ben, "バス号車別明細表(保管用)", 1))
+                    else:
+                        status_queue.put((ben, "バス号車別明細表(保管用)", 0))
+
+    # --- 黄色判定（印刷ONなのに抽出なし） ---
+    for ben in ben_list:
+        if config[ben]["座席表"] and extract_counts[ben]["座席表"] == 0:
+            status_queue.put((ben, "座席表", 0))
+        if config[ben]["バス号車別明細表_乗務員用"] and extract_counts[ben]["バス号車別明細表(乗務員用)"] == 0:
+            status_queue.put((ben, "バス号車別明細表(乗務員用)", 0))
+        if config[ben]["バス号車別明細表_保管用"] and extract_counts[ben]["バス号車別明細表(保管用)"] == 0:
+            status_queue.put((ben, "バス号車別明細表(保管用)", 0))
+
+    if not intermediate_files:
+        log_queue.put(f"[INFO] 抽出結果なし: {folder_display}（PDFは出力しません）")
+        _record_run(cache, run_key, signature, result, status_queue.items, log_queue)
+        return result
+
+    # --- PDF出力 ---
+    check_cancel()
+    for mode, refs in build_output_refs(intermediate_files, ben_list).items():
+        out_path = os.path.join(output_folder, f"{folder_display}_{mode}.pdf")
+
+        if refs:
+            write_pages_streaming(backend, refs, out_path)
+            result["pages"] += len(refs)
+            result["outputs"].append(out_path)
+            log_queue.put(f"[DONE] {mode}PDF出力: {out_path}")
+        else:
+            log_queue.put(f"[SKIP] {mode}PDFは出力対象ページなし（スキップ）")
+    
+    _record_run(cache, run_key, signature, result, status_queue.items, log_queue)
+    set_current_folder(f"{folder_display}　抽出完了")
+    
+     # --- 抽出完了通知音 ---
+    play_finish_sound(log_queue)
+    return result
+
+
+def build_output_refs(intermediate_files, ben_list):
+    """
+    (出力種別, 便名, 書類種別) → [(ファイル, ページ番号)] から、出力PDFごとのページ順を組み立てる。
+    乗務員用は便名リスト順に座席表→明細表、保管用は便名リストの逆順。便×種別ごとに辞書を1回引くだけ。
+    """
+    crew = []
+    for ben in ben_list:
+        for typ in ("座席表", "バス号車別明細表"):
+            crew.extend(intermediate_files.get(("乗務員用", ben, typ), ()))
+
+    keep = []
+    for ben in reversed(ben_list):
+        keep.extend(intermediate_files.get(("保管用", ben, "バス号車別明細表"), ()))
+
+    return {"乗務員用": crew, "保管用": keep}
+
+
+class RecordingQueue:
+    """put された内容を items に控えつつ、元のキューへそのまま渡す"""
+
+    def __init__(self, target):
+        self.target = target
+        self.items = []
+
+    def put(self, item):
+        self.items.append(item)
+        self.target.put(item)
+
+
+def _outputs_unchanged(outputs):
+    """前回記録した出力PDF [(パス, サイズ, 更新時刻)] がすべてそのまま残っているか"""
+    for path, size, mtime in outputs:
+        try:
+            st = os.stat(path)
+        except OSError:
+            return False
+        if st.st_size != size or st.st_mtime_ns != mtime:
+            return False
+    return True
+
+
+def _record_run(cache, run_key, signature, result, status_log, log_queue):
+    """今回の実行（入力署名・出力PDFの状態・状態表示）を記録。次回同じ条件なら出力を再利用する"""
+    if cache is None:
+        return
+    try:
+        outputs = []
+        for path in result["outputs"]:
+            st = os.stat(path)
+            outputs.append((path, st.st_size, st.st_mtime_ns))
+        cache.put_run(run_key, signature, {
+            "result": {k: result[k] for k in ("pdf_files", "pages", "outputs")},
+            "outputs": outputs,
+            "status": [list(item) for item in status_log],
+        })
+    except Exception as e:
+        log_queue.put(f"[WARN] 抽出キャッシュ保存失敗: {e}")
+
+
+def play_finish_sound(log_queue):
+    """抽出完了音を再生（winsound のない環境では何もしない）"""
+    try:
+        import winsound
+    except ImportError:
+        return
+    sound_path = os.path.join(base_dir, "finish_sound.wav")  # または .wav
+    if os.path.exists(sound_path):
+        try:
+            threading.Thread(target=lambda: winsound.PlaySound(sound_path, winsound.SND_FILENAME | winsound.SND_ASYNC), daemon=True).start()
+        except Exception as e:
+            log_queue.put(f"[WARN] 音声再生失敗: {e}")
+    else:
+        log_queue.put("[INFO] 通知音ファイルが見つからなかったため、音声再生をスキップしました。")
+
+
+# =====================
+# 抽出ジョブスケジューラ（フォルダ単位・同時実行数制限）
+# =====================
+class FolderJobScheduler:
+    """
+    フォルダ抽出ジョブを優先度付きキューで管理し、固定数のワーカースレッドで実行する。
+    ・同じフォルダの待機ジョブは1件にまとめる（実行中のフォルダは終わるまで次を開始しない）
+    ・当日フォルダ（名前に MM.DD を含む）を優先
+    ・待機ジョブの取消、実行中ジョブへの中断要求、失敗ジョブの自動/手動再実行
+    """
+
+    def __init__(self, log_queue, max_workers=2, retries=1):
+        self.log_queue = log_queue
+        self.max_workers = max(1, int(max_workers))
+        self.retries = max(0, int(retries))
+        self.cond = threading.Condition()
+        self.queued = []        # [(優先度, 連番, job)]
+        self.running = {}       # フォルダ名 → job
+        self.failed = {}        # フォルダ名 → job
+        self.seq = 0
+        self.workers = []
+
+    def submit(self, folder_name, func, *args, **kwargs):
+        """ジョブを登録。同じフォルダが待機中なら登録しない。登録したら True"""
+        priority = 0 if time.strftime("%m.%d") in folder_name else 1
+        with self.cond:
+            if any(job["name"] == folder_name for _, _, job in self.queued):
+                self.log_queue.put(f"[JOB] 待機中のため統合: {folder_name}")
+                return False
+            self.seq += 1
+            job = {
+                "name": folder_name, "func": func, "args": args, "kwargs": kwargs,
+                "attempt": 0, "cancel": threading.Event(),
+            }
+            self.queued.append((priority, self.seq, job))
+            self.queued.sort(key=lambda x: (x[0], x[1]))
+            self.failed.pop(folder_name, None)
+            self._ensure_workers()
+            self.cond.notify()
+        self.log_queue.put(f"[JOB] 登録: {folder_name}（待機{len(self.queued)}件）")
+        return True
+
+    def cancel(self, folder_name=None):
+        """待機ジョブを取消し、実行中ジョブには中断を要求。folder_name 省略時は全件"""
+        with self.cond:
+            removed = [j for _, _, j in self.queued if folder_name in (None, j["name"])]
+            self.queued = [q for q in self.queued if q[2] not in removed]
+            for name, job in self.running.items():
+                if folder_name in (None, name):
+                    job["cancel"].set()
+                    removed.append(job)
+        for job in removed:
+            self.log_queue.put(f"[JOB] 取消: {job['name']}")
+        return len(removed)
+
+    def retry_failed(self):
+        """失敗したジョブを再登録"""
+        with self.cond:
+            jobs = list(self.failed.values())
+            self.failed.clear()
+        for job in jobs:
+            self.submit(job["name"], job["func"], *job["args"], **job["kwargs"])
+        return len(jobs)
+
+    def snapshot(self):
+        """(待機フォルダ名リスト, 実行中フォルダ名リスト, 失敗件数)"""
+        with self.cond:
+            return [j["name"] for _, _, j in self.queued], list(self.running), len(self.failed)
+
+    def _ensure_workers(self):
+        self.workers = [t for t in self.workers if t.is_alive()]
+        while len(self.workers) < self.max_workers:
+            t = threading.Thread(target=self._worker, daemon=True)
+            t.start()
+            self.workers.append(t)
+
+    def _next_job(self):
+        # 実行中でないフォルダのジョブのうち最優先のもの
+        for idx, (_, _, job) in enumerate(self.queued):
+            if job["name"] not in self.running:
+                del self.queued[idx]
+                return job
+        return None
+
+    def _worker(self):
+        while True:
+            with self.cond:
+                job = self._next_job()
+                while job is None:
+                    self.cond.wait()
+                    job = self._next_job()
+                self.running[job["name"]] = job
+
+            job["attempt"] += 1
+            t0 = time.perf_counter()
+            error = None
+            try:
+                job["func"](*job["args"], cancel_event=job["cancel"], **job["kwargs"])
+            except Exception as e:
+                error = e
+
+            with self.cond:
+                self.running.pop(job["name"], None)
+                self.cond.notify_all()
+
+            if error is None:
+                self.log_queue.put(f"[JOB] 完了: {job['name']}（{time.perf_counter() - t0:.1f}秒）")
+            elif job["cancel"].is_set():
+                self.log_queue.put(f"[JOB] 中断: {job['name']}")
+            elif job["attempt"] <= self.retries:
+                self.log_queue.put(f"[ERROR] {job['name']}: {error} → 再実行します（{job['attempt']}回目失敗）")
+                job["cancel"] = threading.Event()
+                with self.cond:
+                    self.seq += 1
+                    self.queued.append((0, self.seq, job))
+                    self.queued.sort(key=lambda x: (x[0], x[1]))
+                    self.cond.notify()
+            else:
+                self.log_queue.put(f"[ERROR] {job['name']}: {error}（再実行上限のため失敗扱い）")
+                with self.cond:
+                    self.failed[job["name"]] = job
+
+
+class ExtractCancelled(Exception):
+    """スケジューラからの中断要求で抽出を打ち切ったときに送出"""
+
+
+# =====================
+# フォルダ監視
+# =====================
+class FolderHandler:
+    """
+    watchdog の Observer に渡すイベントハンドラ。
+    Observer が呼ぶ dispatch() を自前で持つので、このモジュールの import 時に watchdog は読み込まない
+    （watchdog は監視を始める箇所で Observer と一緒に読み込む）。
+    """
+
+    def __init__(self, log_queue, notify_func, ben_list, config,
+                 status_queue, reset_status_callback=None,
+                 bring_front_callback=None,
+                 set_current_folder_callback=None,  # ★ 追加
+                 scheduler=None):
+        self.scheduler = scheduler or FolderJobScheduler(log_queue)
+        self.reset_status_callback = reset_status_callback
+        self.bring_front_callback = bring_front_callback
+        self.set_current_folder_callback = set_current_folder_callback  # ★ 追加
+        self.log_queue = log_queue
+        self.notify_func = notify_func
+        self.processed = set()
+        self.folder_signatures = {}  # フォルダ名 → 前回処理時のPDF一覧（名前・サイズ・更新時刻）
+        self.folder_states = {}      # フォルダ名 → extract_pdf_by_criteria の file_state
+        self.folder_locks = {}
+        self.pending = {}            # フォルダ名 → 集約中のイベント数（安定待ち中）
+        self.last_event = {}         # フォルダ名 → 最終イベント時刻
+        self.pending_lock = threading.Lock()
+        self.ben_list = ben_list
+        self.config = config
+        self.status_queue = status_queue
+
+    def dispatch(self, event):
+        """watchdog の FileSystemEventHandler.dispatch と同じく event_type で振り分ける"""
+        handler = getattr(self, f"on_{event.event_type}", None)
+        if handler is not None:
+            handler(event)
+
+    def on_created(self, event): self._check_folder(event)
+    def on_moved(self, event): self._check_folder(event)
+    def on_modified(self, event): self._check_folder(event)
+
+    def _check_folder(self, event):
+        # フォルダ以外（PDFなどのファイル変更）は無視する
+        if not getattr(event, "is_directory", False):
+            return
+
+        # watchdog 4 以降は作成イベントにも dest_path（空文字）があるため、空なら src_path を使う
+        folder_path = getattr(event, 'dest_path', '') or event.src_path
+        folder_name = os.path.basename(folder_path)
+        today = time.strftime("%m.%d")
+
+        if "出発名簿" in folder_name and today in folder_name and "●" in folder_name:
+            self._debounce(folder_path, folder_name)
+
+    # --- イベント集約・書き込み完了待ち ---
+    def _debounce(self, folder_path, folder_name):
+        """同じフォルダのイベントをまとめ、PDFの書き込みが落ち着いてから1回だけ処理する"""
+        with self.pending_lock:
+            self.last_event[folder_name] = time.monotonic()
+            if folder_name in self.pending:
+                self.pending[folder_name] += 1
+                return
+            self.pending[folder_name] = 1
+
+        threading.Thread(
+            target=self._wait_until_settled,
+            args=(folder_path, folder_name),
+            daemon=True
+        ).start()
+
+    def _wait_until_settled(self, folder_path, folder_name):
+        """PDFのサイズ・更新時刻が quiet_seconds 間変化しなくなるまで待機"""
+        quiet = float(WATCH_SETTINGS.get("quiet_seconds", 5))
+        poll = max(0.1, float(WATCH_SETTINGS.get("poll_seconds", 1)))
+        max_wait = float(WATCH_SETTINGS.get("max_wait_seconds", 300))
+
+        t0 = time.monotonic()
+        prev_sig = None
+        stable_since = t0
+        timed_out = False
+        while True:
+            try:
+                sig = pdf_folder_signature(folder_path)
+            except OSError:
+                sig = None
+            now = time.monotonic()
+            if sig != prev_sig:
+                prev_sig = sig
+                stable_since = now
+            with self.pending_lock:
+                quiet_from = max(stable_since, self.last_event.get(folder_name, t0))
+            if sig and now - quiet_from >= quiet:
+                break
+            if now - t0 >= max_wait:
+                timed_out = True
+                break
+            time.sleep(poll)
+
+        with self.pending_lock:
+            events = self.pending.pop(folder_name, 1)
+        elapsed = time.monotonic() - t0
+        if timed_out:
+            self.log_queue.put(
+                f"[WARN] 書き込み完了待ちタイムアウト: {folder_name}（{elapsed:.1f}秒, イベント{events}件）→ 現状で処理します"
+            )
+        else:
+            self.log_queue.put(
+                f"[INFO] フォルダ安定検知: {folder_name}（イベント{events}件を集約, 待機{elapsed:.1f}秒, "
+                f"静止{quiet:.1f}秒, PDF{len(sig or ())}件）"
+            )
+
+        if sig is None:
+            return
+        self._on_folder_settled(folder_path, folder_name)
+
+    def _on_folder_settled(self, folder_path, folder_name):
+        if folder_name in self.processed:
+            # 処理済みフォルダにPDFが追加・差し替えされた場合は差分のみ再抽出
+            try:
+                signature = pdf_folder_signature(folder_path)
+            except OSError:
+                return
+            if signature != self.folder_signatures.get(folder_name):
+                self.folder_signatures[folder_name] = signature
+                self.log_queue.put(f"[INFO] 処理済みフォルダのPDF変更を検知: {folder_name}（差分抽出）")
+                if self.reset_status_callback:
+                    self.reset_status_callback()
+                self.scheduler.submit(folder_name, self.process_folder, folder_path, folder_name)
+            return
+
+        if folder_name not in self.processed:
+            self.processed.add(folder_name)
+            try:
+                self.folder_signatures[folder_name] = pdf_folder_signature(folder_path)
+            except OSError:
+                pass
+
+            # ★ フォルダ検知時点でUI更新
+            if callable(self.set_current_folder_callback):
+                self.set_current_folder_callback(folder_name)
+
+            if self.reset_status_callback:
+                self.reset_status_callback()
+
+            if self.bring_front_callback:
+                self.bring_front_callback()
+
+            self.log_queue.put(f"[INFO] 検知対象フォルダ: {folder_name}")
+            try:
+                self.notify_func("フォルダ検出", f"{folder_name} の抽出を開始します")
+            except:
+                pass
+
+            self.scheduler.submit(folder_name, self.process_folder, folder_path, folder_name)
+
+    def process_folder(self, folder_path, folder_name, cancel_event=None):
+        # 念のため開始時にもう一度ラベルを更新
+        if callable(self.set_current_folder_callback):
+            try:
+                self.set_current_folder_callback(folder_name)
+            except Exception as e:
+                self.log_queue.put(f"[WARN] set_current_folder_callback失敗: {e}")
+
+        # 同じフォルダの抽出は直列化（前回のページ一覧を共有するため）
+        # 例外はスケジューラ側でログ出力・再実行する
+        lock = self.folder_locks.setdefault(folder_name, threading.Lock())
+        with lock:
+            extract_pdf_by_criteria(
+                folder_path,
+                self.ben_list,
+                self.config,
+                OUTPUT_FOLDER,
+                self.log_queue,
+                self.status_queue,
+                folder_name,
+                file_state=self.folder_states.setdefault(folder_name, {}),
+                cancel_event=cancel_event
+            )
+
+# =====================
+# 起動時/手動フォルダスキャン
+# =====================
+def scan_existing_folders(ben_list, config, log_queue, status_queue, notify_func, ignore_dot=False, scheduler=None):
+    if scheduler is None:
+        scheduler = FolderJobScheduler(log_queue)
+    today = time.strftime("%m.%d")
+    for fname in os.listdir(WATCH_FOLDER):
+        folder_path = os.path.join(WATCH_FOLDER, fname)
+        if os.path.isdir(folder_path) and "出発名簿" in fname and today in fname:
+            if ignore_dot or "●" in fname:
+                set_current_folder(fname)
+                scheduler.submit(
+                    fname, extract_pdf_by_criteria,
+                    folder_path, ben_list, config, OUTPUT_FOLDER, log_queue, status_queue, fname
+                )
+                log_queue.put(f"[INFO] フォルダを検知・処理開始: {fname}")
+                try:
+                    notify_func("フォルダ検知", f"{fname} の抽出を開始します")
+                except:
+                    pass
+
+
+# =====================
+# 設定一括読込（GUI / コマンドライン共通）
+# =====================
+def load_ben_list():
+    ben_list = []
+    if os.path.exists(MAIN_FILE):
+        with open(MAIN_FILE,"r",encoding="utf-8") as f:
+            ben_list = [line.strip() for line in f if line.strip()]
+    return ben_list
+
+
+def load_app_config(log_queue=None, save=False):
+    """
+    config.json と便名リストを読み込み、監視/出力フォルダ・抽出設定をモジュール変数へ反映する。
+    戻り値: (cfg 全体, ben_list, 便名別設定)
+    """
+    global WATCH_FOLDER, OUTPUT_FOLDER
+    global EXTRACT_SETTINGS, WATCH_SETTINGS
+
+    # --- 出発便リスト ---
+    ben_list = load_ben_list()
+
+    # --- config 読み込み ---
+    cfg = {}
+    if os.path.exists(CONFIG_FILE):
+        try:
+            with open(CONFIG_FILE, "r", encoding="utf-8") as f:
+                cfg = json.load(f)
+        except:
+            cfg = {}
+    if "folders" not in cfg:
+        cfg["folders"] = {"watch_folder": base_dir, "output_folder": base_dir}
+    WATCH_FOLDER = cfg["folders"].get("watch_folder", base_dir)
+    OUTPUT_FOLDER = cfg["folders"].get("output_folder", base_dir)
+    # --- 抽出設定（並列プロセス数など） ---
+    if "extract" not in cfg:
+        cfg["extract"] = dict(DEFAULT_EXTRACT_SETTINGS)
+    for k, v in DEFAULT_EXTRACT_SETTINGS.items():
+        cfg["extract"].setdefault(k, v)
+    EXTRACT_SETTINGS = cfg["extract"]
+    if "watch" not in cfg:
+        cfg["watch"] = dict(DEFAULT_WATCH_SETTINGS)
+    for k, v in DEFAULT_WATCH_SETTINGS.items():
+        cfg["watch"].setdefault(k, v)
+    WATCH_SETTINGS = cfg["watch"]
+    # --- config 読み込み ---
+    if "ben_settings" not in cfg:
+        cfg["ben_settings"] = load_config(ben_list)
+
+    config = cfg["ben_settings"]
+
+    # ★ ここを追加：便名リストに合わせて不足設定を自動追加
+    for ben in ben_list:
+        if ben not in config:
+            config[ben] = {
+                "座席表": False,
+                "バス号車別明細表_乗務員用": False,
+                "バス号車別明細表_保管用": False
+            }
+
+    # ついでに削除された便名は消しておく（※任意）
+    for ben in list(config.keys()):
+        if ben not in ben_list:
+            del config[ben]
+
+    if save:
+        save_config(cfg)
+
+    if not os.path.isdir(WATCH_FOLDER):
+        if log_queue is not None:
+            log_queue.put(f"[WARNING] 監視フォルダが存在しません: {WATCH_FOLDER} → デフォルトに変更")
+        WATCH_FOLDER = base_dir
+    if not os.path.isdir(OUTPUT_FOLDER):
+        if log_queue is not None:
+            log_queue.put(f"[WARNING] PDF出力フォルダが存在しません: {OUTPUT_FOLDER} → デフォルトに変更")
+        OUTPUT_FOLDER = base_dir
+
+    return cfg, ben_list, config
+
+
+# =====================
+# コマンドライン（GUIなし・バッチ実行）
+# =====================
+class JsonLineQueue:
+    """log_queue / status_queue の代わりに、受け取った内容を1行1JSONで標準出力へ書く"""
+
+    def __init__(self, kind, stream=None):
+        self.kind = kind
+        self.stream = stream or sys.stdout
+        self.lock = threading.Lock()
+
+    def put(self, item):
+        if self.kind == "status":
+            ben, item_name, count = item
+            rec = {"type": "status", "ben": ben, "item": item_name, "count": count}
+        else:
+            rec = {"type": "log", "message": str(item)}
+        rec["time"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+        with self.lock:
+            self.stream.write(json.dumps(rec, ensure_ascii=False) + "\n")
+            self.stream.flush()
+
+
+# 終了コード
+EXIT_OK = 0          # PDFを出力した
+EXIT_ERROR = 1       # 抽出中にエラー
+EXIT_USAGE = 2       # 引数・フォルダ指定の誤り
+EXIT_NO_OUTPUT = 3   # 対象ページなし（PDFは出力していない）
+
+
+def cmd_extract(args):
+    log_queue = JsonLineQueue("log")
+    status_queue = JsonLineQueue("status")
+    cfg, ben_list, config = load_app_config(log_queue)
+
+    folder = os.path.abspath(args.folder)
+    if not os.path.isdir(folder):
+        log_queue.put(f"[ERROR] フォルダが存在しません: {folder}")
+        return EXIT_USAGE
+    output_folder = args.output or OUTPUT_FOLDER
+    if not os.path.isdir(output_folder):
+        log_queue.put(f"[ERROR] 出力フォルダが存在しません: {output_folder}")
+        return EXIT_USAGE
+
+    t0 = time.perf_counter()
+    try:
+        result = extract_pdf_by_criteria(
+            folder, ben_list, config, output_folder, log_queue, status_queue,
+            os.path.basename(folder.rstrip(os.sep)),
+            workers=args.workers, backend=args.backend
+        )
+    except Exception as e:
+        log_queue.put(f"[ERROR] {e}")
+        return EXIT_ERROR
+
+    result["elapsed"] = round(time.perf_counter() - t0, 3)
+    print(json.dumps({"type": "result", **result}, ensure_ascii=False), flush=True)
+    return EXIT_OK if result["outputs"] else EXIT_NO_OUTPUT
+
+
+def cmd_watch(args):
+    global WATCH_FOLDER, OUTPUT_FOLDER
+    from watchdog.observers import Observer
+
+    log_queue = JsonLineQueue("log")
+    status_queue = JsonLineQueue("status")
+    cfg, ben_list, config = load_app_config(log_queue)
+    if args.folder:
+        WATCH_FOLDER = os.path.abspath(args.folder)
+    if args.output:
+        OUTPUT_FOLDER = os.path.abspath(args.output)
+    for path in (WATCH_FOLDER, OUTPUT_FOLDER):
+        if not os.path.isdir(path):
+            log_queue.put(f"[ERROR] フォルダが存在しません: {path}")
+            return EXIT_USAGE
+
+    def notify(title, message):
+        log_queue.put(f"[NOTIFY] {title}: {message}")
+
+    scheduler = FolderJobScheduler(
+        log_queue,
+        max_workers=EXTRACT_SETTINGS.get("max_jobs", 2),
+        retries=EXTRACT_SETTINGS.get("retries", 1)
+    )
+    handler = FolderHandler(log_queue, notify, ben_list, config, status_queue, scheduler=scheduler)
+    observer = Observer()
+    observer.schedule(handler, WATCH_FOLDER, recursive=False)
+    observer.start()
+    log_queue.put(f"[INFO] 監視開始: {WATCH_FOLDER}")
+    scan_existing_folders(ben_list, config, log_queue, status_queue, notify, scheduler=scheduler)
+
+    try:
+        while observer.is_alive():
+            observer.join(timeout=1)
+    except KeyboardInterrupt:
+        log_queue.put("[INFO] 監視終了")
+    finally:
+        observer.stop()
+        observer.join(timeout=5)
+    return EXIT_OK
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="pdf_page_collector", description="出発名簿PDF抽出（GUIなし）")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_extract = sub.add_parser("extract", help="指定フォルダを1回抽出して終了")
+    p_extract.add_argument("folder", help="出発名簿フォルダ")
+    p_extract.add_argument("--output", help="PDF出力フォルダ（省略時は config.json の output_folder）")
+    p_extract.add_argument("--workers", type=int, default=None, help="抽出プロセス数（1で直列）")
+    p_extract.add_argument("--backend", choices=sorted(PDF_BACKENDS), default=None, help="抽出エンジン")
+    p_extract.set_defaults(func=cmd_extract)
+
+    p_watch = sub.add_parser("watch", help="監視フォルダを監視し続ける（Ctrl+Cで終了）")
+    p_watch.add_argument("--folder", help="監視フォルダ（省略時は config.json の watch_folder）")
+    p_watch.add_argument("--output", help="PDF出力フォルダ（省略時は config.json の output_folder）")
+    p_watch.set_defaults(func=cmd_watch)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    # exe 化した場合の子プロセス起動対策（並列抽出用）
+    import multiprocessing
+    multiprocessing.freeze_support()
+    sys.exit(main())
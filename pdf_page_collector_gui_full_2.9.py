@@ -4,35 +4,20 @@ import threading
 import tkinter as tk
 from tkinter import messagebox, scrolledtext, filedialog, ttk
 import json
-from watchdog.observers import Observer
-from watchdog.events import FileSystemEventHandler
-import PyPDF2
-import unicodedata
-import pystray
-from pystray import MenuItem as item
-from PIL import Image, ImageDraw
-from win10toast import ToastNotifier
-from pdf_list_find_write import PDFPassengerSearchApp
-from excel_write_preview_gui import NSExcelPreviewer
+# pystray / PIL / win10toast / watchdog は run_gui() 内、
+# 検索ツール（fitz・cryptography）と NS報告ツールは各ウィンドウを開くときに読み込む
+# （二重起動チェックを先に済ませ、起動を軽くするため）
 import queue
 import sys
-import winsound
 import socket
+import pdf_page_collector as collector
+from pdf_page_collector import (
+    base_dir, save_config, load_app_config,
+    FolderHandler, FolderJobScheduler, scan_existing_folders,
+)
 
 ock_socket = None  # ← これがロック保持に必要
 
-if getattr(sys, 'frozen', False):
-    # PyInstaller で exe 化した場合
-    base_dir = os.path.dirname(sys.executable)
-else:
-    # スクリプトとして実行している場合
-    base_dir = os.path.dirname(os.path.abspath(__file__))
-
-
-MAIN_FILE = os.path.join(base_dir, "出力便名リスト.txt")
-CONFIG_FILE = os.path.join(base_dir, "config.json")
-WATCH_FOLDER = base_dir
-OUTPUT_FOLDER = base_dir
 LOCK_FILE = os.path.join(base_dir, "app.lock")
 
 ICON_FILE = os.path.join(base_dir, "tray_icon.png")
@@ -51,324 +36,15 @@ def acquire_single_instance_lock(port=56789):
     except OSError:
         return False
 
-# =====================
-# 設定ロード/保存
-# =====================
-def load_config(ben_list):
-    cfg = {}
-    if os.path.exists(CONFIG_FILE):
-        try:
-            with open(CONFIG_FILE,"r",encoding="utf-8") as f:
-                cfg = json.load(f)
-        except:
-            cfg = {}
-    config={}
-    for ben in ben_list:
-        config[ben]={
-            "座席表": cfg.get(ben,{}).get("座席表",False),
-            "バス号車別明細表_乗務員用": cfg.get(ben,{}).get("バス号車別明細表_乗務員用",False),
-            "バス号車別明細表_保管用": cfg.get(ben,{}).get("バス号車別明細表_保管用",False)
-        }
-    return config
-
-def save_config(config):
-    with open(CONFIG_FILE,"w",encoding="utf-8") as f:
-        json.dump(config,f,ensure_ascii=False,indent=2)
-
-# =====================
-# PDF抽出
-# （省略せず既存のまま）
-# =====================
-def extract_pdf_by_criteria(pdf_folder, ben_list, config, output_folder, log_queue, status_queue, folder_display):
-    import re
-    import hashlib
-    import unicodedata
-    import PyPDF2
-    import os
-
-    # --- テキスト正規化 ---
-    def normalize_text(s):
-        if s is None:
-            return ""
-        s = unicodedata.normalize("NFKC", s)
-        s = s.replace("\u3000", " ").replace("\u200b", "")
-        return re.sub(r"\s+", " ", s).strip().lower()
-
-    # --- 厳密マッチ ---
-    def keyword_strict_match(norm_text, norm_kw):
-        boundary_chars = r"0-9A-Za-z\u4e00-\u9fff\u3040-\u309f\u30a0-\u30ff"
-        strict_pat = rf"(?<![{boundary_chars}]){re.escape(norm_kw)}(?![{boundary_chars}])"
-        if re.search(strict_pat, norm_text):
-            return True
-        spaced = "".join([re.escape(ch) + r"\s*" for ch in norm_kw])
-        spaced_pat = rf"(?<![{boundary_chars}]){spaced}(?![{boundary_chars}])"
-        return re.search(spaced_pat, norm_text) is not None
-
-    # --- ファイル内容ハッシュ ---
-    def file_hash(path):
-        h = hashlib.md5()
-        with open(path, "rb") as f:
-            for chunk in iter(lambda: f.read(4096), b""):
-                h.update(chunk)
-        return h.hexdigest()
-
-    log_queue.put(f"[INFO] PDF抽出開始: {folder_display} ({pdf_folder})")
-
-    # --- PDFファイル取得（重複判定あり） ---
-    pdf_files = []
-    seen_names = set()
-    seen_hashes = set()
-    for f in os.listdir(pdf_folder):
-        if not f.lower().endswith(".pdf"):
-            continue
-        full_path = os.path.join(pdf_folder, f)
-        norm_name = f.lower().strip()
-
-        # ファイル名重複
-        if norm_name in seen_names:
-            log_queue.put(f"[SKIP] 重複ファイル名: {f}")
-            continue
-        seen_names.add(norm_name)
-
-        # 内容重複
-        try:
-            h = file_hash(full_path)
-            if h in seen_hashes:
-                log_queue.put(f"[SKIP] 重複内容: {f}")
-                continue
-            seen_hashes.add(h)
-        except Exception as e:
-            log_queue.put(f"[WARN] ハッシュ計算失敗: {f} ({e})")
-            continue
-
-        pdf_files.append(full_path)
-
-    if not pdf_files:
-        log_queue.put(f"[INFO] PDFなし: {folder_display}")
-        return
-
-    # --- ページ抽出 ---
-    intermediate_files = []
-    extract_counts = {
-        ben: {
-            "座席表": 0,
-            "バス号車別明細表(乗務員用)": 0,
-            "バス号車別明細表(保管用)": 0
-        }
-        for ben in ben_list
-    }
-
-    for pdf_path in pdf_files:
-        fname = os.path.basename(pdf_path)
-        try:
-            reader = PyPDF2.PdfReader(pdf_path)
-        except Exception as e:
-            log_queue.put(f"[ERROR] {fname} 読み込み失敗 ({e})")
-            continue
-
-        for i, page in enumerate(reader.pages):
-            text = page.extract_text() or ""
-            norm_text = normalize_text(text)
-
-            for ben in ben_list:
-                if not keyword_strict_match(norm_text, normalize_text(ben)):
-                    continue
-
-                # 座席表
-                if "座席表" in text:
-                    if config[ben]["座席表"]:
-                        intermediate_files.append(("乗務員用", ben, "座席表", page))
-                        extract_counts[ben]["座席表"] += 1  # ✅ 抽出数カウント
-                        log_queue.put(f"[PAGE] {fname} → {ben} 座席表")
-                        status_queue.put((ben, "座席表", 1))
-                    else:
-                        status_queue.put((ben, "座席表", 0))  # 赤判定（印刷OFF）
-
-                # バス号車別明細
-                if "バス号車別明細表" in text:
-                    # 乗務員用
-                    if config[ben]["バス号車別明細表_乗務員用"]:
-                        intermediate_files.append(("乗務員用", ben, "バス号車別明細表", page))
-                        extract_counts[ben]["バス号車別明細表(乗務員用)"] += 1  # ✅ 抽出数カウント
-                        log_queue.put(f"[PAGE] {fname} → {ben} バス号車別明細表(乗務員用)")
-                        status_queue.put((ben, "バス号車別明細表(乗務員用)", 1))
-                    else:
-                        status_queue.put((ben, "バス号車別明細表(乗務員用)", 0))
-
-                    # 保管用
-                    if config[ben]["バス号車別明細表_保管用"]:
-                        intermediate_files.append(("保管用", ben, "バス号車別明細表", page))
-                        extract_counts[ben]["バス号車別明細表(保管用)"] += 1  # ✅ 抽出数カウント
-                        log_queue.put(f"[PAGE] {fname} → {ben} バス号車別明細表(保管用)")
-                        status_queue.put((ben, "バス号車別明細表(保管用)", 1))
-                    else:
-                        status_queue.put((ben, "バス号車別明細表(保管用)", 0))
-
-    # --- 黄色判定（印刷ONなのに抽出なし） ---
-    for ben in ben_list:
-        if config[ben]["座席表"] and extract_counts[ben]["座席表"] == 0:
-            status_queue.put((ben, "座席表", 0))
-        if config[ben]["バス号車別明細表_乗務員用"] and extract_counts[ben]["バス号車別明細表(乗務員用)"] == 0:
-            status_queue.put((ben, "バス号車別明細表(乗務員用)", 0))
-        if config[ben]["バス号車別明細表_保管用"] and extract_counts[ben]["バス号車別明細表(保管用)"] == 0:
-            status_queue.put((ben, "バス号車別明細表(保管用)", 0))
-
-    if not intermediate_files:
-        log_queue.put(f"[INFO] 抽出結果なし: {folder_display}（PDFは出力しません）")
-        return
-
-    # --- PDF出力 ---
-    for mode in ["乗務員用", "保管用"]:
-        writer = PyPDF2.PdfWriter()
-        page_count = 0
-
-        if mode == "乗務員用":
-            for ben in ben_list:
-                for typ in ["座席表", "バス号車別明細表"]:
-                    for entry in intermediate_files:
-                        if entry[0] == mode and entry[1] == ben and entry[2] == typ:
-                            writer.add_page(entry[3])
-                            page_count += 1
-            out_path = os.path.join(output_folder, f"{folder_display}_乗務員用.pdf")
-
-        else:  # 保管用
-            for ben in reversed(ben_list):
-                for entry in intermediate_files:
-                    if entry[0] == mode and entry[1] == ben and entry[2] == "バス号車別明細表":
-                        writer.add_page(entry[3])
-                        page_count += 1
-            out_path = os.path.join(output_folder, f"{folder_display}_保管用.pdf")
-
-        if page_count > 0:
-            with open(out_path, "wb") as f:
-                writer.write(f)
-            log_queue.put(f"[DONE] {mode}PDF出力: {out_path}")
-        else:
-            log_queue.put(f"[SKIP] {mode}PDFは出力対象ページなし（スキップ）")
-    
-    set_current_folder(f"{folder_display}　抽出完了")
-    
-     # --- 抽出完了通知音 ---
-    sound_path = os.path.join(base_dir, "finish_sound.wav")  # または .wav
-    if os.path.exists(sound_path):
-        try:
-            threading.Thread(target=lambda: winsound.PlaySound(sound_path, winsound.SND_FILENAME | winsound.SND_ASYNC), daemon=True).start()
-        except Exception as e:
-            log_queue.put(f"[WARN] 音声再生失敗: {e}")
-    else:
-        log_queue.put("[INFO] 通知音ファイルが見つからなかったため、音声再生をスキップしました。")
-
-
-# =====================
-# フォルダ監視
-# =====================
-import os
-import time
-import threading
-from watchdog.events import FileSystemEventHandler
-
-class FolderHandler(FileSystemEventHandler):
-    def __init__(self, log_queue, notify_func, ben_list, config,
-                 status_queue, reset_status_callback=None,
-                 bring_front_callback=None,
-                 set_current_folder_callback=None):  # ★ 追加
-        self.reset_status_callback = reset_status_callback
-        self.bring_front_callback = bring_front_callback
-        self.set_current_folder_callback = set_current_folder_callback  # ★ 追加
-        self.log_queue = log_queue
-        self.notify_func = notify_func
-        self.processed = set()
-        self.ben_list = ben_list
-        self.config = config
-        self.status_queue = status_queue
-
-    def on_created(self, event): self._check_folder(event)
-    def on_moved(self, event): self._check_folder(event)
-    def on_modified(self, event): self._check_folder(event)
-
-    def _check_folder(self, event):
-        # フォルダ以外（PDFなどのファイル変更）は無視する
-        if not getattr(event, "is_directory", False):
-            return
-
-        folder_path = getattr(event, 'dest_path', event.src_path)
-        folder_name = os.path.basename(folder_path)
-        today = time.strftime("%m.%d")
-
-        if "出発名簿" in folder_name and today in folder_name and "●" in folder_name:
-            if folder_name not in self.processed:
-                self.processed.add(folder_name)
-
-                # ★ フォルダ検知時点でUI更新
-                if callable(self.set_current_folder_callback):
-                    self.set_current_folder_callback(folder_name)
-
-                if self.reset_status_callback:
-                    self.reset_status_callback()
-
-                if self.bring_front_callback:
-                    self.bring_front_callback()
-
-                self.log_queue.put(f"[INFO] 検知対象フォルダ: {folder_name}")
-                try:
-                    self.notify_func("フォルダ検出", f"{folder_name} の抽出を開始します")
-                except:
-                    pass
-
-                threading.Thread(
-                    target=self.process_folder,
-                    args=(folder_path, folder_name),
-                    daemon=True
-                ).start()
-
-    def process_folder(self, folder_path, folder_name):
-        # 念のため開始時にもう一度ラベルを更新
-        if callable(self.set_current_folder_callback):
-            try:
-                self.set_current_folder_callback(folder_name)
-            except Exception as e:
-                self.log_queue.put(f"[WARN] set_current_folder_callback失敗: {e}")
-
-        try:
-            extract_pdf_by_criteria(
-                folder_path,
-                self.ben_list,
-                self.config,
-                OUTPUT_FOLDER,
-                self.log_queue,
-                self.status_queue,
-                folder_name
-            )
-        except Exception as e:
-            self.log_queue.put(f"[ERROR] {e}")
-
-# =====================
-# 起動時/手動フォルダスキャン
-# =====================
-def scan_existing_folders(ben_list, config, log_queue, status_queue, notify_func, ignore_dot=False):
-    today = time.strftime("%m.%d")
-    for fname in os.listdir(WATCH_FOLDER):
-        folder_path = os.path.join(WATCH_FOLDER, fname)
-        if os.path.isdir(folder_path) and "出発名簿" in fname and today in fname:
-            if ignore_dot or "●" in fname:
-                set_current_folder(fname)
-                threading.Thread(
-                    target=extract_pdf_by_criteria,
-                    args=(folder_path, ben_list, config, OUTPUT_FOLDER, log_queue, status_queue, fname),
-                    daemon=True
-                ).start()
-                log_queue.put(f"[INFO] フォルダを検知・処理開始: {fname}")
-                try:
-                    notify_func("フォルダ検知", f"{fname} の抽出を開始します")
-                except:
-                    pass
-
 # =====================
 # GUI + トレイ + ステータスウィンドウ統合
 # =====================
 def run_gui():
-    global WATCH_FOLDER, OUTPUT_FOLDER
-    global set_current_folder
+    import pystray
+    from pystray import MenuItem as item
+    from PIL import Image, ImageDraw
+    from win10toast import ToastNotifier
+
     root = tk.Tk()
     root.withdraw()  # メインウィンドウ非表示
     root.title("📄 出発名簿自動PDF抽出ツール")
@@ -426,54 +102,10 @@ def run_gui():
             toast.show_toast(title, message, duration=5, threaded=True)
         root.after(0, _notify)
 
-    # --- 出発便リスト ---
-    ben_list = []
-    if os.path.exists(MAIN_FILE):
-        with open(MAIN_FILE,"r",encoding="utf-8") as f:
-            ben_list = [line.strip() for line in f if line.strip()]
+    # --- 出発便リスト・config 読み込み（監視/出力フォルダ・抽出設定を反映） ---
+    cfg, ben_list, config = load_app_config(log_queue, save=True)
 
-    # --- config 読み込み ---
-    cfg = {}
-    if os.path.exists(CONFIG_FILE):
-        try:
-            with open(CONFIG_FILE, "r", encoding="utf-8") as f:
-                cfg = json.load(f)
-        except:
-            cfg = {}
-    if "folders" not in cfg:
-        cfg["folders"] = {"watch_folder": base_dir, "output_folder": base_dir}
-    WATCH_FOLDER = cfg["folders"].get("watch_folder", base_dir)
-    OUTPUT_FOLDER = cfg["folders"].get("output_folder", base_dir)
-    # --- config 読み込み ---
-    if "ben_settings" not in cfg:
-        cfg["ben_settings"] = load_config(ben_list)
-
-    config = cfg["ben_settings"]
-
-    # ★ ここを追加：便名リストに合わせて不足設定を自動追加
-    for ben in ben_list:
-        if ben not in config:
-            config[ben] = {
-                "座席表": False,
-                "バス号車別明細表_乗務員用": False,
-                "バス号車別明細表_保管用": False
-            }
-
-    # ついでに削除された便名は消しておく（※任意）
-    for ben in list(config.keys()):
-        if ben not in ben_list:
-            del config[ben]
-
-    save_config(cfg)
-
-
-    if not os.path.isdir(WATCH_FOLDER):
-        log_queue.put(f"[WARNING] 監視フォルダが存在しません: {WATCH_FOLDER} → デフォルトに変更")
-        WATCH_FOLDER = base_dir
-    if not os.path.isdir(OUTPUT_FOLDER):
-        log_queue.put(f"[WARNING] PDF出力フォルダが存在しません: {OUTPUT_FOLDER} → デフォルトに変更")
-        OUTPUT_FOLDER = base_dir
-    watch_label.config(text=f"監視フォルダ: {WATCH_FOLDER}")
+    watch_label.config(text=f"監視フォルダ: {collector.WATCH_FOLDER}")
 
     # --- ステータスウィンドウ ---
     status_window = tk.Toplevel(root)
@@ -499,6 +131,15 @@ def run_gui():
     for c, col in enumerate(columns, start=1):
         tk.Label(status_window, text=col, relief="ridge", bg="#cccccc").grid(row=1, column=c, sticky="nsew")
 
+    job_label = tk.Label(status_window, text="ジョブ：待機 0件 / 実行中 -", bg="#eef", fg="black", anchor="w")
+    job_label.grid(row=len(ben_list)+2, column=0, columnspan=4, sticky="nsew", padx=1, pady=(6,3))
+
+    scheduler = FolderJobScheduler(
+        log_queue,
+        max_workers=collector.EXTRACT_SETTINGS.get("max_jobs", 2),
+        retries=collector.EXTRACT_SETTINGS.get("retries", 1)
+    )
+
     status_window.update_idletasks()
     status_window.geometry(f"{status_window.winfo_reqwidth()}x{status_window.winfo_reqheight()}")
     status_window.resizable(False, False)
@@ -599,6 +240,14 @@ def run_gui():
 
             status_labels[ben]["便名"].config(bg=ben_color)
 
+        # ジョブ状況
+        queued, running, failed = scheduler.snapshot()
+        job_text = f"ジョブ：待機 {len(queued)}件 / 実行中 {', '.join(running) or '-'}"
+        if failed:
+            job_text += f" / 失敗 {failed}件"
+        if job_label.cget("text") != job_text:
+            job_label.config(text=job_text)
+
         status_window.after(200, update_status_loop)
 
     status_window.after(200, update_status_loop)
@@ -610,6 +259,9 @@ def run_gui():
 
         root.after(0, _upd)  # UIスレッドへ確実に投げる
 
+    # 抽出処理側（pdf_page_collector）からもラベル更新できるよう差し替え
+    collector.set_current_folder = set_current_folder
+
 
 
         # --- 子ウィンドウ管理 ---
@@ -642,20 +294,19 @@ def run_gui():
         frm.pack(padx=15, pady=10, fill="both", expand=True)
         tk.Label(frm, text="監視フォルダ:", bg="#f4f6f8").pack(anchor="w")
         watch_entry = tk.Entry(frm, width=60)
-        watch_entry.insert(0, WATCH_FOLDER)
+        watch_entry.insert(0, collector.WATCH_FOLDER)
         watch_entry.pack(pady=5)
         tk.Button(frm, text="参照", command=lambda: watch_entry.delete(0, tk.END) or watch_entry.insert(0, filedialog.askdirectory())).pack(pady=5)
         tk.Label(frm, text="PDF出力フォルダ:", bg="#f4f6f8").pack(anchor="w")
         output_entry = tk.Entry(frm, width=60)
-        output_entry.insert(0, OUTPUT_FOLDER)
+        output_entry.insert(0, collector.OUTPUT_FOLDER)
         output_entry.pack(pady=5)
         tk.Button(frm, text="参照", command=lambda: output_entry.delete(0, tk.END) or output_entry.insert(0, filedialog.askdirectory())).pack(pady=5)
         def apply():
-            global WATCH_FOLDER, OUTPUT_FOLDER
             w,o = watch_entry.get(), output_entry.get()
             if os.path.isdir(w) and os.path.isdir(o):
-                WATCH_FOLDER, OUTPUT_FOLDER = w,o
-                watch_label.config(text=f"監視フォルダ: {WATCH_FOLDER}")
+                collector.WATCH_FOLDER, collector.OUTPUT_FOLDER = w,o
+                watch_label.config(text=f"監視フォルダ: {collector.WATCH_FOLDER}")
                 cfg["folders"]["watch_folder"], cfg["folders"]["output_folder"] = w,o
                 save_config(cfg)
                 folder_win.destroy()
@@ -712,6 +363,8 @@ def run_gui():
             child_windows["passenger"].lift()
             return
 
+        from pdf_list_find_write import PDFPassengerSearchApp  # fitz / cryptography は初回のみ読み込み
+
         top = tk.Toplevel()
         top.title("乗客名簿検索ツール")
         app = PDFPassengerSearchApp(top)
@@ -725,6 +378,8 @@ def run_gui():
                 child_windows["excel"].lift()
                 return
 
+            from excel_write_preview_gui import NSExcelPreviewer
+
             top = tk.Toplevel()
             top.title("NS報告作成ツール")
             app = NSExcelPreviewer(top)
@@ -736,7 +391,16 @@ def run_gui():
         log_queue.put("[INFO] 手動抽出開始")
         bring_status_to_front()  # ★ 追加
         reset_status_display()  # ★ ステータスリセットを追加
-        threading.Thread(target=lambda: scan_existing_folders(ben_list, config, log_queue, status_queue, tray_notify, ignore_dot=True), daemon=True).start()
+        threading.Thread(target=lambda: scan_existing_folders(ben_list, config, log_queue, status_queue, tray_notify, ignore_dot=True, scheduler=scheduler), daemon=True).start()
+
+    # --- ジョブ取消・再実行 ---
+    def cancel_jobs(*args):
+        n = scheduler.cancel()
+        log_queue.put(f"[INFO] 抽出ジョブ取消: {n}件")
+
+    def retry_jobs(*args):
+        n = scheduler.retry_failed()
+        log_queue.put(f"[INFO] 失敗ジョブ再実行: {n}件")
 
     # --- トレイアイコン ---
     def load_tray_icon():
@@ -781,28 +445,32 @@ def run_gui():
         item("フォルダー設定", open_folder_settings),
         item("印刷設定", open_print_settings),
         item("手動抽出", manual_extract),
+        item("抽出ジョブ取消", cancel_jobs),
+        item("失敗ジョブ再実行", retry_jobs),
         item("乗客名簿検索ツール（テスト用）", open_passenger_search),
         item("NS報告作成ツール（テスト用）", open_excel_write_preview),
         item("終了", quit_app)
     )
 
+    # --- 起動時に常駐トレイ表示（監視開始より先に出す） ---
+    start_tray_icon_once()
+    log_queue.put("[INFO] 常駐トレイ起動")
+
     # --- フォルダ監視 ---
     handler = FolderHandler(
         log_queue, tray_notify, ben_list, config, status_queue,
         reset_status_callback=reset_status_display,
         bring_front_callback=bring_status_to_front,
-        set_current_folder_callback=set_current_folder  # ★ ここで渡す
+        set_current_folder_callback=set_current_folder,  # ★ ここで渡す
+        scheduler=scheduler
     )
     #handler.set_current_folder = set_current_folder  # ← これが有効に働く
+    from watchdog.observers import Observer
     observer = Observer()
-    observer.schedule(handler, WATCH_FOLDER, recursive=False)
+    observer.schedule(handler, collector.WATCH_FOLDER, recursive=False)
     observer.start()
-    log_queue.put(f"[INFO] 監視開始: {WATCH_FOLDER}")
-    scan_existing_folders(ben_list, config, log_queue, status_queue, tray_notify)
-
-    # --- 起動時に常駐トレイ表示 ---
-    start_tray_icon_once()
-    log_queue.put("[INFO] 常駐トレイ起動")
+    log_queue.put(f"[INFO] 監視開始: {collector.WATCH_FOLDER}")
+    scan_existing_folders(ben_list, config, log_queue, status_queue, tray_notify, scheduler=scheduler)
 
     # --- 閉じるときは最小化してトレイ常駐 ---
     def on_close():
@@ -816,6 +484,10 @@ def run_gui():
 
 
 if __name__=="__main__":
+    # exe 化した場合の子プロセス起動対策（並列抽出用）
+    import multiprocessing
+    multiprocessing.freeze_support()
+
     if not acquire_single_instance_lock():
         try:
             from win10toast import ToastNotifier
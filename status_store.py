@@ -0,0 +1,680 @@
+"""
+乗客ステータス（NS/CXL など）の保存まわり。
+暗号化キーは config.json と同じフォルダーの status_key.key を使う。
+ステータスは status_data/status.db（SQLite）に保存する。
+DB は便ごとのスナップショット（status_records）と追記専用の変更履歴（status_journal）からなる。
+Excel 側が読む <便名>_status.json は DB から作る書き出し用のファイル。送信（保存）のたびに
+DB への保存の後で export_status_json が書き直す（まとめて作り直すときは python status_store.py export <フォルダー>）。
+"""
+import os
+import re
+import sys
+import getpass
+import json
+import sqlite3
+from datetime import datetime
+import hashlib
+import threading
+from cryptography.fernet import Fernet, InvalidToken
+
+if getattr(sys, 'frozen', False):
+    # PyInstaller で exe 化した場合
+    base_dir = os.path.dirname(sys.executable)
+else:
+    # スクリプトとして実行している場合
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+
+CONFIG_FILE = os.path.join(base_dir, "config.json")
+KEY_FILE = os.path.join(os.path.dirname(CONFIG_FILE), "status_key.key")
+# 旧版は相対パス "status_key.key"、つまり起動時のカレントフォルダーにキーを作っていた。
+# ファイル選択ダイアログなどで後からカレントが変わっても同じ場所を見るよう、import 時に絶対パスで固定する。
+LAUNCH_DIR = os.getcwd()
+LEGACY_KEY_FILE = os.path.join(LAUNCH_DIR, "status_key.key")
+
+
+def get_encryption_key(key_path=KEY_FILE, log=None, legacy_key_path=None):
+    """
+    暗号化キーを取得。存在しなければ一度だけ生成して保存。
+    すでに存在する場合は再利用。
+    key_path が既定の KEY_FILE でまだ無く、旧版のキー（legacy_key_path、既定は LEGACY_KEY_FILE）があれば、それを引き継ぐ。
+    引き継いだことは log（呼び出し側のログ関数）へ [INFO] で知らせる。
+    """
+    legacy_key_path = legacy_key_path or LEGACY_KEY_FILE
+    if (not os.path.exists(key_path) and key_path == KEY_FILE
+            and os.path.exists(legacy_key_path)):
+        with open(legacy_key_path, "rb") as f:
+            key = f.read()
+        with open(key_path, "wb") as f:
+            f.write(key)
+        if log:
+            log(f"[INFO] 暗号化キーを移動しました: {legacy_key_path} → {key_path}")
+        return key
+
+    if os.path.exists(key_path):
+        with open(key_path, "rb") as f:
+            key = f.read()
+    else:
+        key = Fernet.generate_key()
+        with open(key_path, "wb") as f:
+            f.write(key)
+    return key
+
+
+class StatusDecryptError(Exception):
+    """ステータスデータを現在のキーで復号できない"""
+
+
+class StatusCipher:
+    """
+    ステータスJSON用の Fernet をキーファイル1つにつき1回だけ作る。
+    読み込みは初回のみ・ロック付きなので複数スレッドから呼んでよい。
+    """
+
+    def __init__(self, key_path=KEY_FILE):
+        self.key_path = key_path
+        self.fingerprint = ""
+        self._fernet = None
+        self._lock = threading.Lock()
+
+    def load(self, log=None):
+        """キーを読み込む（2回目以降は何もしない）。旧版キーの引き継ぎは log へ出す"""
+        if self._fernet is None:
+            with self._lock:
+                if self._fernet is None:
+                    key = get_encryption_key(self.key_path, log=log)
+                    # ログ用のキー指紋（キーそのものは出さない）
+                    self.fingerprint = hashlib.sha256(key).hexdigest()[:12]
+                    self._fernet = Fernet(key)
+        return self._fernet
+
+    def fernet(self):
+        return self.load()
+
+    def encrypt_json(self, data):
+        """dict → 暗号化済みバイト列"""
+        json_str = json.dumps(data, ensure_ascii=False, indent=2)
+        return self.fernet().encrypt(json_str.encode("utf-8"))
+
+    def decrypt_json(self, enc):
+        """暗号化済みバイト列 → dict。復号できなければ StatusDecryptError（キー指紋付き）"""
+        fernet = self.fernet()
+        try:
+            dec = fernet.decrypt(enc)
+        except InvalidToken:
+            raise StatusDecryptError(
+                f"現在のキー（指紋 {self.fingerprint}, {self.key_path}）では復号できません"
+            ) from None
+        return json.loads(dec.decode("utf-8"))
+
+
+_ciphers = {}
+_ciphers_lock = threading.Lock()
+
+
+def get_status_cipher(key_path=KEY_FILE):
+    """キーファイルごとに共有する StatusCipher を返す"""
+    with _ciphers_lock:
+        cipher = _ciphers.get(key_path)
+        if cipher is None:
+            cipher = _ciphers[key_path] = StatusCipher(key_path)
+        return cipher
+
+
+# =====================
+# ステータス文書（<便名>_status.json）
+# =====================
+def build_status_document(flight_name, pdf_path, records, total_record=None):
+    """
+    1便分のステータス文書を組み立てる。
+    合計人数レコード（resv="合計人数"）は乗客レコードの後ろに1件だけ入れる。
+    """
+    records = [r for r in records if r.get("resv") != "合計人数"]
+    if total_record is not None:
+        records.append(total_record)
+    return {
+        "便名": flight_name,
+        "pdf_path": pdf_path,
+        "timestamp": datetime.now().isoformat(),
+        "records": records
+    }
+
+
+def save_status_document(json_path, data, cipher=None):
+    """1回だけ暗号化し、一時ファイルに書いてから os.replace で置き換える"""
+    enc = (cipher or get_status_cipher()).encrypt_json(data)
+    tmp_path = json_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(enc)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, json_path)
+
+
+def load_status_document(json_path, cipher=None):
+    """ステータス文書を読み込んで復号（復号できなければ StatusDecryptError）"""
+    with open(json_path, "rb") as f:
+        enc = f.read()
+    return (cipher or get_status_cipher()).decrypt_json(enc)
+
+
+def status_date_for_pdf(pdf_path):
+    """PDFファイル名の「月.日」から日付フォルダー名（YYYY-MM-DD）を作る。日付がなければ空文字"""
+    m = re.search(r"(\d{1,2})[.\-](\d{1,2})", os.path.basename(pdf_path or ""))
+    if not m:
+        return ""
+    month, day = m.groups()
+    return f"{datetime.now().year}-{month.zfill(2)}-{day.zfill(2)}"
+
+
+# =====================
+# ステータスDB（status_data/status.db）
+# =====================
+STATUS_DB_NAME = "status.db"
+TOTAL_RESV = "合計人数"
+JOURNAL_COMPACT_THRESHOLD = 200   # 未反映の変更履歴がこの件数を超えたらスナップショットへ畳み込む
+
+_STATUS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS status_flights (
+    date       TEXT NOT NULL,
+    flight     TEXT NOT NULL,
+    pdf_path   TEXT NOT NULL DEFAULT '',
+    updated_at TEXT NOT NULL,
+    PRIMARY KEY (date, flight)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS status_records (
+    date       TEXT NOT NULL,
+    flight     TEXT NOT NULL,
+    resv       TEXT NOT NULL,
+    status     TEXT NOT NULL DEFAULT '',
+    payload    BLOB NOT NULL,
+    updated_at TEXT NOT NULL,
+    PRIMARY KEY (date, flight, resv)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_status_records_resv ON status_records (resv);
+CREATE INDEX IF NOT EXISTS idx_status_records_status ON status_records (date, status);
+CREATE TABLE IF NOT EXISTS status_journal (
+    seq        INTEGER PRIMARY KEY AUTOINCREMENT,
+    date       TEXT NOT NULL,
+    flight     TEXT NOT NULL,
+    resv       TEXT NOT NULL,
+    status     TEXT NOT NULL DEFAULT '',
+    payload    BLOB NOT NULL,
+    changed_at TEXT NOT NULL,
+    changed_by TEXT NOT NULL DEFAULT '',
+    compacted  INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_status_journal_pending ON status_journal (date, flight, compacted, seq);
+CREATE INDEX IF NOT EXISTS idx_status_journal_resv ON status_journal (date, flight, resv, seq);
+"""
+
+
+def status_db_path(status_root):
+    """status_data フォルダーに置く DB のパス"""
+    return os.path.join(status_root, STATUS_DB_NAME)
+
+
+def current_user():
+    """変更履歴に残す作業者名（OS のログインユーザー）"""
+    try:
+        return getpass.getuser()
+    except Exception:
+        return ""
+
+
+def record_key(record):
+    """
+    DB の主キーに使う予約番号。
+    予約番号のない旧形式は氏名のハッシュを使う（氏名そのものは暗号化ペイロードにだけ入れる）。
+    """
+    resv = record.get("resv", "")
+    if resv:
+        return resv
+    return "#" + hashlib.sha256(record.get("name", "").encode("utf-8")).hexdigest()[:16]
+
+
+class StatusDB:
+    """
+    便・日付ごとのステータスを SQLite に保存する。
+    レコード本体（氏名・人数など）は Fernet で暗号化し、検索に使う日付・便名・予約番号・ステータスだけを平文で持つ。
+    接続は操作ごとに開くので、検索ワーカーと UI スレッドの両方から呼んでよい。
+    読み込みだけでは DB ファイルもフォルダーも作らない（まだない場合は「記録なし」を返す）。
+    """
+
+    def __init__(self, db_path, cipher=None):
+        self.db_path = db_path
+        self.cipher = cipher or get_status_cipher()
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    def _connect(self, create=False):
+        """接続を開く。DB ファイルがまだなければ、create=True（書き込み）のときだけ作る。作らない場合は None"""
+        if not os.path.exists(self.db_path):
+            if not create:
+                return None
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        if not self._initialized:
+            with self._init_lock:
+                if not self._initialized:
+                    # status_data は OneDrive などで同期されるため、-wal/-shm の補助ファイルを残す WAL は使わない。
+                    # 以前 WAL で作った DB もここで通常のロールバックジャーナルへ戻る。
+                    conn.execute("PRAGMA journal_mode=DELETE")
+                    conn.executescript(_STATUS_SCHEMA)
+                    self._initialized = True
+        return conn
+
+    def _encrypt(self, record):
+        return self.cipher.fernet().encrypt(
+            json.dumps(record, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        )
+
+    def _decrypt(self, payload):
+        try:
+            return json.loads(self.cipher.fernet().decrypt(payload).decode("utf-8"))
+        except InvalidToken:
+            raise StatusDecryptError(
+                f"現在のキー（指紋 {self.cipher.fingerprint}, {self.cipher.key_path}）では復号できません"
+            ) from None
+
+    def _rows(self, records, date, flight, updated_at):
+        for record in records:
+            yield (date, flight, record_key(record), record.get("status", ""),
+                   self._encrypt(record), updated_at)
+
+    # --- 書き込み ---
+    def upsert_records(self, date, flight, records, pdf_path="", updated_at=None):
+        """レコードをまとめて追加・更新（1トランザクション）。戻り値は件数"""
+        updated_at = updated_at or datetime.now().isoformat()
+        rows = list(self._rows(records, date, flight, updated_at))
+        conn = self._connect(create=True)
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT INTO status_flights (date, flight, pdf_path, updated_at) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT (date, flight) DO UPDATE SET "
+                    "pdf_path = CASE WHEN excluded.pdf_path != '' THEN excluded.pdf_path ELSE pdf_path END, "
+                    "updated_at = excluded.updated_at",
+                    (date, flight, pdf_path, updated_at)
+                )
+                conn.executemany(
+                    "INSERT OR REPLACE INTO status_records "
+                    "(date, flight, resv, status, payload, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                    rows
+                )
+        finally:
+            conn.close()
+        return len(rows)
+
+    def replace_flight(self, date, flight, records, pdf_path="", updated_at=None):
+        """1便分を丸ごと置き換える（初回保存・JSON取り込み用）。未反映の変更履歴は反映済み扱いにする"""
+        updated_at = updated_at or datetime.now().isoformat()
+        rows = list(self._rows(records, date, flight, updated_at))
+        conn = self._connect(create=True)
+        try:
+            with conn:
+                conn.execute("DELETE FROM status_records WHERE date = ? AND flight = ?", (date, flight))
+                conn.execute(
+                    "UPDATE status_journal SET compacted = 1 WHERE date = ? AND flight = ? AND compacted = 0",
+                    (date, flight)
+                )
+                conn.execute(
+                    "INSERT OR REPLACE INTO status_flights (date, flight, pdf_path, updated_at) VALUES (?, ?, ?, ?)",
+                    (date, flight, pdf_path, updated_at)
+                )
+                conn.executemany(
+                    "INSERT OR REPLACE INTO status_records "
+                    "(date, flight, resv, status, payload, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                    rows
+                )
+        finally:
+            conn.close()
+        return len(rows)
+
+    def append_changes(self, date, flight, records, pdf_path="", changed_by=None):
+        """
+        変更のあったレコードだけを変更履歴に追記する（件数は変更分のみで、便の人数に依らない）。
+        未反映の履歴が JOURNAL_COMPACT_THRESHOLD を超えたらスナップショットへ畳み込む。
+        戻り値は追記した件数
+        """
+        changed_at = datetime.now().isoformat()
+        changed_by = current_user() if changed_by is None else changed_by
+        rows = [(date, flight, key, status, payload, changed_at, changed_by)
+                for date, flight, key, status, payload, _ in self._rows(records, date, flight, changed_at)]
+        conn = self._connect(create=True)
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT INTO status_flights (date, flight, pdf_path, updated_at) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT (date, flight) DO UPDATE SET "
+                    "pdf_path = CASE WHEN excluded.pdf_path != '' THEN excluded.pdf_path ELSE pdf_path END, "
+                    "updated_at = excluded.updated_at",
+                    (date, flight, pdf_path, changed_at)
+                )
+                conn.executemany(
+                    "INSERT INTO status_journal "
+                    "(date, flight, resv, status, payload, changed_at, changed_by) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    rows
+                )
+                pending = conn.execute(
+                    "SELECT COUNT(*) FROM status_journal WHERE date = ? AND flight = ? AND compacted = 0",
+                    (date, flight)
+                ).fetchone()[0]
+        finally:
+            conn.close()
+        if pending > JOURNAL_COMPACT_THRESHOLD:
+            self.compact(date, flight)
+        return len(rows)
+
+    def compact(self, date=None, flight=None):
+        """
+        未反映の変更履歴をスナップショットへ畳み込む（date/flight 省略時は全便）。
+        暗号化済みペイロードをそのまま移すので復号はしない。履歴の行は反映済みとして残す。
+        戻り値は畳み込んだ件数
+        """
+        where, params = ["compacted = 0"], []
+        if date is not None:
+            where.append("date = ?")
+            params.append(date)
+        if flight is not None:
+            where.append("flight = ?")
+            params.append(flight)
+        cond = " AND ".join(where)
+        conn = self._connect()
+        if conn is None:
+            return 0
+        try:
+            with conn:
+                cur = conn.execute(
+                    "INSERT OR REPLACE INTO status_records (date, flight, resv, status, payload, updated_at) "
+                    f"SELECT date, flight, resv, status, payload, changed_at FROM status_journal WHERE {cond} "
+                    "ORDER BY seq",
+                    params
+                )
+                count = cur.rowcount
+                conn.execute(f"UPDATE status_journal SET compacted = 1 WHERE {cond}", params)
+        finally:
+            conn.close()
+        return count
+
+    # --- 読み込み ---
+    def get_record(self, date, flight, resv):
+        """予約番号1件を引く（未反映の変更履歴があればそちらを優先）。なければ None"""
+        conn = self._connect()
+        if conn is None:
+            return None
+        try:
+            row = conn.execute(
+                "SELECT payload FROM status_journal "
+                "WHERE date = ? AND flight = ? AND resv = ? AND compacted = 0 ORDER BY seq DESC LIMIT 1",
+                (date, flight, resv)
+            ).fetchone() or conn.execute(
+                "SELECT payload FROM status_records WHERE date = ? AND flight = ? AND resv = ?",
+                (date, flight, resv)
+            ).fetchone()
+        finally:
+            conn.close()
+        return self._decrypt(row[0]) if row else None
+
+    def load_flight(self, date, flight_prefix, exact=False):
+        """
+        便名が flight_prefix で始まる便（exact=True なら同じ便名）のうち、最後に保存された1便分を読み込む。
+        スナップショットに未反映の変更履歴を順に重ねる（同じ予約番号は後の方が優先）。
+        戻り値: (便名, data) / 見つからない場合は None。data は <便名>_status.json と同じ形。
+        """
+        conn = self._connect()
+        if conn is None:
+            return None
+        if exact:
+            cond, params = "flight = ?", (date, flight_prefix)
+        else:
+            cond, params = "flight >= ? AND flight < ?", (date, flight_prefix, flight_prefix + "\uffff")
+        try:
+            rows = conn.execute(
+                "WITH f AS (SELECT date, flight, pdf_path, updated_at FROM status_flights "
+                f"           WHERE date = ? AND {cond} "
+                "           ORDER BY updated_at DESC LIMIT 1) "
+                "SELECT f.flight, f.pdf_path, f.updated_at, r.resv, r.payload, 0 AS seq "
+                "FROM f JOIN status_records r ON r.date = f.date AND r.flight = f.flight "
+                "UNION ALL "
+                "SELECT f.flight, f.pdf_path, f.updated_at, j.resv, j.payload, j.seq "
+                "FROM f JOIN status_journal j ON j.date = f.date AND j.flight = f.flight AND j.compacted = 0 "
+                "ORDER BY seq",
+                params
+            ).fetchall()
+        finally:
+            conn.close()
+        if not rows:
+            return None
+        flight, pdf_path, updated_at = rows[0][:3]
+        latest = {}
+        for r in rows:
+            latest[r[3]] = r[4]
+        records = [self._decrypt(payload) for payload in latest.values()]
+        # 合計人数は従来どおり最後
+        records.sort(key=lambda r: r.get("resv") == TOTAL_RESV)
+        return flight, {"便名": flight, "pdf_path": pdf_path, "timestamp": updated_at, "records": records}
+
+    def query(self, date=None, flight=None, resv=None, status=None):
+        """
+        便・日付をまたいだ検索（指定した条件だけで絞り込む）。
+        load_flight と同じく、スナップショットに未反映の変更履歴（予約番号ごとに最新の1件）を重ねて読む。
+        読み込みでは畳み込まない（DB を書き換えない）。
+        戻り値: [(date, flight, record), ...]
+        """
+        where, params = [], []
+        for col, val in (("date", date), ("flight", flight), ("resv", resv), ("status", status)):
+            if val is not None:
+                where.append(f"{col} = ?")
+                params.append(val)
+        sql = (
+            "WITH pending AS ("
+            "  SELECT date, flight, resv, status, payload FROM status_journal j "
+            "  WHERE compacted = 0 AND seq = (SELECT MAX(seq) FROM status_journal "
+            "      WHERE date = j.date AND flight = j.flight AND resv = j.resv AND compacted = 0)"
+            "), merged AS ("
+            "  SELECT date, flight, resv, status, payload FROM status_records r "
+            "  WHERE NOT EXISTS (SELECT 1 FROM pending p "
+            "      WHERE p.date = r.date AND p.flight = r.flight AND p.resv = r.resv) "
+            "  UNION ALL SELECT date, flight, resv, status, payload FROM pending"
+            ") SELECT date, flight, payload FROM merged"
+        )
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY date, flight, resv"
+        conn = self._connect()
+        if conn is None:
+            return []
+        try:
+            rows = conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+        return [(d, f, self._decrypt(p)) for d, f, p in rows]
+
+    def history(self, date, flight, resv=None):
+        """
+        変更履歴（古い順）。畳み込み済みの分も含む。
+        戻り値: [(changed_at, changed_by, record), ...]
+        """
+        sql = "SELECT changed_at, changed_by, payload FROM status_journal WHERE date = ? AND flight = ?"
+        params = [date, flight]
+        if resv is not None:
+            sql += " AND resv = ?"
+            params.append(resv)
+        conn = self._connect()
+        if conn is None:
+            return []
+        try:
+            rows = conn.execute(sql + " ORDER BY seq", params).fetchall()
+        finally:
+            conn.close()
+        return [(at, by, self._decrypt(p)) for at, by, p in rows]
+
+    def flights(self, date=None):
+        """保存済みの便 [(date, flight), ...]（date 指定時はその日付だけ）"""
+        conn = self._connect()
+        if conn is None:
+            return []
+        sql = "SELECT date, flight FROM status_flights"
+        params = []
+        if date is not None:
+            sql += " WHERE date = ?"
+            params.append(date)
+        try:
+            return conn.execute(sql + " ORDER BY date, flight", params).fetchall()
+        finally:
+            conn.close()
+
+    def flight_updated_at(self, date, flight):
+        """便の最終保存日時（なければ None）"""
+        conn = self._connect()
+        if conn is None:
+            return None
+        try:
+            row = conn.execute(
+                "SELECT updated_at FROM status_flights WHERE date = ? AND flight = ?", (date, flight)
+            ).fetchone()
+        finally:
+            conn.close()
+        return row[0] if row else None
+
+
+_dbs = {}
+_dbs_lock = threading.Lock()
+
+
+def get_status_db(status_root, key_path=KEY_FILE):
+    """status_data フォルダーごとに共有する StatusDB を返す（フォルダー・DB は最初の書き込み時に作る）"""
+    db_path = status_db_path(status_root)
+    with _dbs_lock:
+        db = _dbs.get(db_path)
+        if db is None:
+            db = _dbs[db_path] = StatusDB(db_path, get_status_cipher(key_path))
+        return db
+
+
+# =====================
+# 既存の <便名>_status.json を DB へ取り込む
+# =====================
+def import_status_file(db, json_path, date="", force=False):
+    """
+    ステータスJSON 1件を DB へ取り込む。DB 側の方が新しければ何もしない（force で上書き）。
+    戻り値: 取り込んだレコード数（スキップ時は 0）
+    """
+    data = load_status_document(json_path, db.cipher)
+    flight = data.get("便名") or os.path.basename(json_path)[:-len("_status.json")]
+    updated_at = data.get("timestamp") or datetime.fromtimestamp(os.path.getmtime(json_path)).isoformat()
+    current = db.flight_updated_at(date, flight)
+    if current is not None and current >= updated_at and not force:
+        return 0
+    return db.replace_flight(date, flight, data.get("records", []),
+                             pdf_path=data.get("pdf_path", ""), updated_at=updated_at)
+
+
+def import_status_folder(status_root, force=False, log=print):
+    """
+    status_data 以下（直下と YYYY-MM-DD フォルダー）の *_status.json をすべて取り込む。
+    戻り値: (取り込んだファイル数, レコード数, 失敗数)
+    """
+    db = get_status_db(status_root)
+    targets = [("", status_root)]
+    for name in sorted(os.listdir(status_root)):
+        if re.fullmatch(r"\d{4}-\d{2}-\d{2}", name) and os.path.isdir(os.path.join(status_root, name)):
+            targets.append((name, os.path.join(status_root, name)))
+
+    files = records = errors = 0
+    for date, folder in targets:
+        for name in sorted(os.listdir(folder)):
+            if not name.endswith("_status.json"):
+                continue
+            path = os.path.join(folder, name)
+            try:
+                n = import_status_file(db, path, date, force=force)
+            except Exception as e:
+                errors += 1
+                log(f"[WARN] 取り込み失敗: {path} ({e})")
+                continue
+            if n:
+                files += 1
+                records += n
+                log(f"[INFO] 取り込み: {date or '(日付なし)'} / {name}（{n} 件）")
+    return files, records, errors
+
+
+# =====================
+# DB → <便名>_status.json の書き出し（Excel 側の読み込み用）
+# =====================
+def status_json_path(status_root, date, flight):
+    """書き出し先（status_data/YYYY-MM-DD/<便名>_status.json、日付なしは status_data 直下）"""
+    return os.path.join(status_root, date, f"{flight}_status.json") if date \
+        else os.path.join(status_root, f"{flight}_status.json")
+
+
+def export_status_json(db, status_root, date, flight):
+    """
+    1便分を DB から読み、<便名>_status.json として書き出す（timestamp は DB の最終保存日時）。
+    戻り値: 書き出したパス / DB にない便は None
+    """
+    hit = db.load_flight(date, flight, exact=True)
+    if not hit:
+        return None
+    json_path = status_json_path(status_root, date, flight)
+    os.makedirs(os.path.dirname(json_path), exist_ok=True)
+    save_status_document(json_path, hit[1], db.cipher)
+    return json_path
+
+
+def export_status_folder(status_root, date=None, log=print):
+    """status.db の全便（date 指定時はその日付だけ）を書き出す。戻り値は書き出したファイル数"""
+    db = get_status_db(status_root)
+    count = 0
+    for d, flight in db.flights(date):
+        path = export_status_json(db, status_root, d, flight)
+        if path:
+            count += 1
+            log(f"[INFO] 書き出し: {path}")
+    return count
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="status_store", description="乗客ステータスDBの管理")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_import = sub.add_parser("import", help="既存の *_status.json を status.db へ取り込む")
+    p_import.add_argument("folder", help="status_data フォルダー（またはそれを含むPDF出力フォルダー）")
+    p_import.add_argument("--force", action="store_true", help="DB の方が新しくても上書きする")
+
+    p_compact = sub.add_parser("compact", help="未反映の変更履歴をスナップショットへ畳み込む")
+    p_compact.add_argument("folder", help="status_data フォルダー（またはそれを含むPDF出力フォルダー）")
+
+    p_export = sub.add_parser("export", help="status.db から <便名>_status.json を書き出す（Excel 用）")
+    p_export.add_argument("folder", help="status_data フォルダー（またはそれを含むPDF出力フォルダー）")
+    p_export.add_argument("--date", help="この日付（YYYY-MM-DD）の便だけ書き出す")
+
+    args = parser.parse_args(argv)
+    status_root = args.folder
+    if os.path.isdir(os.path.join(status_root, "status_data")):
+        status_root = os.path.join(status_root, "status_data")
+    if not os.path.isdir(status_root):
+        print(f"[ERROR] フォルダーが見つかりません: {status_root}")
+        return 2
+    get_status_cipher().load(print)
+
+    if args.command == "compact":
+        count = get_status_db(status_root).compact()
+        print(f"[完了] {count} 件の変更履歴を畳み込みました: {status_db_path(status_root)}")
+        return 0
+
+    if args.command == "export":
+        count = export_status_folder(status_root, args.date)
+        print(f"[完了] {count} 便を書き出しました: {status_root}")
+        return 0
+
+    files, records, errors = import_status_folder(status_root, force=args.force)
+    print(f"[完了] {files} ファイル / {records} 件を取り込みました（失敗 {errors}）: {status_db_path(status_root)}")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
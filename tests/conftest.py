@@ -0,0 +1,28 @@
+"""
+テスト共通設定。リポジトリ直下のモジュールを import できるようにする。
+"""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+def make_text_pdf(path, pages):
+    """
+    pages: ページごとのテキスト（改行で複数行）。
+    日本語を PyPDF2 でも読めるよう、ToUnicode 付きで CJK フォントを埋め込んだPDFを作る。
+    """
+    import fitz
+
+    font = fitz.Font("cjk")
+    doc = fitz.open()
+    for text in pages:
+        page = doc.new_page()
+        page.insert_font(fontname="F0", fontbuffer=font.buffer)
+        page.insert_text((50, 72), text, fontname="F0", fontsize=10)
+    doc.subset_fonts()
+    doc.save(path, garbage=3, deflate=True)
+    doc.close()
+    return path
@@ -0,0 +1,110 @@
+"""
+抽出キャッシュ（ExtractCache）: ページ本文を保存しないこと・変更なしの再実行で出力を再利用すること。
+"""
+import os
+import queue
+
+import pytest
+
+pytest.importorskip("fitz")
+
+import pdf_page_collector as collector
+from conftest import make_text_pdf
+
+BEN_LIST = ["241号車", "242号車"]
+FOLDER_NAME = "10.17出発名簿●"
+
+
+def _config(seat=True):
+    return {
+        ben: {"座席表": seat, "バス号車別明細表_乗務員用": True, "バス号車別明細表_保管用": True}
+        for ben in BEN_LIST
+    }
+
+
+def _drain(q):
+    items = []
+    while not q.empty():
+        items.append(q.get_nowait())
+    return items
+
+
+@pytest.fixture
+def env(tmp_path, monkeypatch):
+    monkeypatch.setattr(collector, "EXTRACT_SETTINGS", dict(collector.DEFAULT_EXTRACT_SETTINGS))
+    monkeypatch.setattr(collector, "play_finish_sound", lambda log_queue: None)
+    folder = tmp_path / FOLDER_NAME
+    folder.mkdir()
+    out = tmp_path / "out"
+    out.mkdir()
+    make_text_pdf(str(folder / "a.pdf"), [
+        "座席表\n241号車\nA1 ﾔﾏﾀﾞ ﾀﾛｳ",
+        "バス号車別明細表\n242号車\n19J-123456 ﾔﾏﾀﾞ 090-1234-5678",
+    ])
+    return folder, out
+
+
+def _run(folder, out, config=None):
+    log_queue, status_queue = queue.Queue(), queue.Queue()
+    result = collector.extract_pdf_by_criteria(
+        str(folder), BEN_LIST, config or _config(), str(out), log_queue, status_queue, FOLDER_NAME, workers=1
+    )
+    return result, _drain(log_queue), _drain(status_queue)
+
+
+def test_cache_does_not_store_page_text(env):
+    folder, out = env
+    _run(folder, out)
+    with open(out / collector.EXTRACT_CACHE_FILE, "rb") as f:
+        raw = f.read()
+    for secret in ("ﾔﾏﾀﾞ", "ヤマダ", "090-1234-5678", "19J-123456"):
+        assert secret.encode("utf-8") not in raw
+
+
+def test_legacy_cache_with_page_text_is_removed(env):
+    folder, out = env
+    legacy = out / collector.LEGACY_EXTRACT_CACHE_FILES[0]
+    legacy.write_bytes(b"old cache")
+    _run(folder, out)
+    assert not legacy.exists()
+
+
+def test_unchanged_rerun_reuses_outputs(env):
+    folder, out = env
+    first, _, first_status = _run(folder, out)
+    assert first["outputs"]
+    stamps = {p: os.stat(p).st_mtime_ns for p in first["outputs"]}
+
+    second, logs, second_status = _run(folder, out)
+    assert second == first
+    assert second_status == first_status
+    assert any(str(m).startswith("[SKIP] 入力PDF・設定とも前回と同じ") for m in logs)
+    # 出力PDFは書き直していない
+    assert {p: os.stat(p).st_mtime_ns for p in second["outputs"]} == stamps
+
+
+def test_rerun_rebuilds_when_settings_or_outputs_change(env):
+    folder, out = env
+    first, _, _ = _run(folder, out)
+
+    # 印刷設定の変更 → 再出力（ページ判定はキャッシュから）
+    changed, logs, _ = _run(folder, out, _config(seat=False))
+    assert not any(str(m).startswith("[SKIP] 入力PDF") for m in logs)
+    assert any("抽出キャッシュ: ヒット 1件" in str(m) for m in logs)
+    assert changed["pages"] < first["pages"]
+
+    # 出力PDFが消えた → 同じ設定でも作り直す
+    for path in changed["outputs"]:
+        os.remove(path)
+    again, logs, _ = _run(folder, out, _config(seat=False))
+    assert not any(str(m).startswith("[SKIP] 入力PDF") for m in logs)
+    assert all(os.path.exists(p) for p in again["outputs"])
+
+
+def test_added_pdf_invalidates_run(env):
+    folder, out = env
+    _run(folder, out)
+    make_text_pdf(str(folder / "b.pdf"), ["座席表\n242号車"])
+    result, logs, _ = _run(folder, out)
+    assert not any(str(m).startswith("[SKIP] 入力PDF") for m in logs)
+    assert result["pdf_files"] == 2
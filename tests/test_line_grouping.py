@@ -0,0 +1,76 @@
+"""
+行の再構築（group_words_into_lines）: 旧来の next() 走査によるグループ化と同じ行になること。
+"""
+import random
+
+import pytest
+
+pytest.importorskip("fitz")
+pytest.importorskip("cryptography")
+
+from pdf_list_find_write import group_words_into_lines
+from conftest import make_text_pdf
+
+
+def _old_grouping(words):
+    """二分探索化する前の実装（_search_worker / 書き込み処理にあったもの）"""
+    lines_by_y = {}
+    for w in words:
+        x0, y0, x1, y1, text = w[:5]
+        y = round(y0, 1)
+        found_y = next((yy for yy in lines_by_y if abs(yy - y) <= 1.5), None)
+        if found_y is not None:
+            lines_by_y[found_y].append((x0, text))
+        else:
+            lines_by_y[y] = [(x0, text)]
+    return [(y, sorted(lines_by_y[y], key=lambda x: x[0])) for y in sorted(lines_by_y.keys())]
+
+
+def _new_grouping(words):
+    return [(y, [(w[0], w[4]) for w in line]) for y, line in group_words_into_lines(words)]
+
+
+def _random_words(rnd, n):
+    """行間が許容幅（1.5）前後になるよう、近接した y を多めに混ぜる"""
+    base = [rnd.uniform(0, 800) for _ in range(max(1, n // 6))]
+    words = []
+    for i in range(n):
+        y0 = rnd.choice(base) + rnd.choice([0, 0, 0.4, -0.7, 1.5, -1.5, 1.55, 2.9, rnd.uniform(-3, 3)])
+        x0 = rnd.choice([rnd.uniform(0, 500), 50.0])
+        words.append((x0, y0, x0 + 10, y0 + 9, f"w{i}", 0, 0, i))
+    return words
+
+
+@pytest.mark.parametrize("seed", range(30))
+def test_matches_old_grouping_on_random_words(seed):
+    rnd = random.Random(seed)
+    words = _random_words(rnd, rnd.randint(0, 400))
+    assert _new_grouping(words) == _old_grouping(words)
+
+
+def test_matches_old_grouping_on_chained_lines():
+    # 1.0 間隔で並ぶ y: 旧実装は先に作られた行に寄せる（連鎖して1行にはならない）
+    words = [(float(10 - i), 100.0 + i, 0, 0, f"w{i}") for i in range(10)]
+    words += [(5.0, 100.9, 0, 0, "mid"), (5.0, 103.5, 0, 0, "edge")]
+    assert _new_grouping(words) == _old_grouping(words)
+
+
+def test_matches_old_grouping_on_pdf_pages(tmp_path):
+    import fitz
+
+    path = make_text_pdf(str(tmp_path / "meisai.pdf"), [
+        "バス号車別明細表\n262便\n19J-123456 ﾔﾏﾀﾞ 090-1234-5678 1\n29J-234567 ｽｽﾞｷ 090-2222-3333 2\n合計人数 3",
+        "座席表\n241号車\nA1 ﾔﾏﾀﾞ ﾀﾛｳ\nA2 ｽｽﾞｷ ﾊﾅｺ",
+    ])
+    # 同じ行でベースラインが少しずれた単語（別フォントの欄など）を追加
+    doc = fitz.open(path)
+    for page in doc:
+        for i, dy in enumerate((0.6, 1.4, 1.6, -0.8)):
+            page.insert_text((400 + 30 * i, 84 + dy), f"x{i}", fontsize=8)
+    try:
+        for page in doc:
+            words = page.get_text("words")
+            assert words
+            assert _new_grouping(words) == _old_grouping(words)
+    finally:
+        doc.close()
@@ -0,0 +1,156 @@
+"""
+_marked.pdf の作り直し: 元ページ内容ハッシュでの変更検知と、他便の印字を status.db から復元する計画（plan_restamp）。
+"""
+import pytest
+
+fitz = pytest.importorskip("fitz")
+pytest.importorskip("cryptography")
+
+from pdf_list_find_write import (
+    PASSENGER_LINE_PARSER, PageWords, PDFPassengerSearchApp, index_rows_by_flight, base_page_hashes,
+    read_base_page_hashes, write_base_page_hashes, stored_status_row, plan_restamp,
+)
+from conftest import make_text_pdf
+
+PAGES = [
+    "バス号車別明細表 262便\n19J-123456 ﾔﾏﾀﾞ 2103 090-1234-5678 ｼﾝｼﾞｭｸ→ｵｵｻｶ 262便",
+    "バス号車別明細表 263便\n29J-234567 ｽｽﾞｷ 1001 090-2222-3333 ｼﾝｼﾞｭｸ→ｷｮｳﾄ 263便",
+]
+
+
+def test_hashes_detect_regenerated_page_with_same_page_count(tmp_path):
+    base = make_text_pdf(str(tmp_path / "base.pdf"), PAGES)
+    regenerated = make_text_pdf(str(tmp_path / "regen.pdf"), [PAGES[0], PAGES[1].replace("ｽｽﾞｷ", "ｻﾄｳ")])
+    with fitz.open(base) as a, fitz.open(regenerated) as b:
+        old, new = base_page_hashes(a), base_page_hashes(b)
+    assert len(old) == len(new) == 2
+    assert old[0] == new[0] and old[1] != new[1]
+
+
+def test_hashes_survive_incremental_save(tmp_path):
+    marked = make_text_pdf(str(tmp_path / "base_marked.pdf"), PAGES)
+    doc = fitz.open(marked)
+    assert read_base_page_hashes(doc) is None   # 旧版で作った _marked.pdf
+    hashes = base_page_hashes(doc)
+    write_base_page_hashes(doc, hashes)
+    doc.saveIncr()
+    doc.close()
+    with fitz.open(marked) as doc:
+        assert read_base_page_hashes(doc) == hashes
+
+
+def _index(lines_by_page):
+    rows = []
+    for page_index, lines in enumerate(lines_by_page):
+        for line in lines:
+            rows.append((page_index, line, "", PASSENGER_LINE_PARSER.parse(line)))
+    return {"rows": rows, "by_flight": index_rows_by_flight(rows)}
+
+
+INDEX_LINES = [
+    ["19J-123456ﾔﾏﾀﾞ2103090-1234-5678ｼﾝｼﾞｭｸ→ｵｵｻｶ262便", "29J-234567ｽｽﾞｷ1001090-2222-3333ｼﾝｼﾞｭｸ→ｵｵｻｶ262便"],
+    ["39J-345678ｻﾄｳ2002090-4444-5555ｼﾝｼﾞｭｸ→ｵｵｻｶ262便", "49J-456789ﾀﾅｶ1001090-6666-7777ｼﾝｼﾞｭｸ→ｷｮｳﾄ263便"],
+]
+
+RECORDS = [
+    {"resv": "9J-123456", "name": "ﾔﾏﾀﾞ", "status": "NS", "male": 0, "female": 0, "child": 0, "total": 0,
+     "cxl_deduction": {"orig": {"男": 2, "女": 1, "子供": 0, "合計": 3},
+                       "after": {"男": 0, "女": 0, "子供": 0, "合計": 0}}},
+    {"resv": "9J-234567", "name": "ｽｽﾞｷ", "status": "", "male": 1, "female": 0, "child": 0, "total": 1},
+    {"resv": "9J-345678", "name": "ｻﾄｳ", "status": "CXL", "male": 1, "female": 0, "child": 0, "total": 1,
+     "cxl_deduction": {"orig": {"男": 2, "女": 0, "子供": 0, "合計": 2},
+                       "after": {"男": 1, "女": 0, "子供": 0, "合計": 1}}},
+    {"resv": "合計人数", "name": "", "status": "合計", "after": {"男": 2, "女": 1, "子供": 0, "合計": 3}},
+]
+
+
+def test_stored_status_row_matches_restored_treeview_values():
+    status, vals, ded = stored_status_row(RECORDS[2])
+    assert status == "CXL"
+    assert vals[2:8] == ["9J-345678", "ｻﾄｳ", "2→1", "0", "0", "2→1"]
+    assert ded["after"]["男"] == 1
+    # NS は減算情報を使わない（検索時の復元と同じ）
+    assert stored_status_row(RECORDS[0])[2] == {}
+
+
+def test_plan_restamp_covers_only_rebuilt_pages():
+    index = _index(INDEX_LINES)
+    plan = plan_restamp(index, {"262便": RECORDS}, pages=[1])
+    assert list(plan) == [1]
+    [(flight, rows, cxl_map, totals, last_resvs)] = plan[1]
+    assert flight == "262便"
+    assert [(r[2], r[1]) for r in rows] == [("9J-345678", "CXL")]
+    assert set(cxl_map) == {"9J-345678"}
+    # 262便の最終ページなので合計人数も復元する
+    assert totals == (2, 1, 0, 3)
+    assert last_resvs == ["9J-345678"]
+
+
+def test_plan_restamp_after_full_recopy():
+    index = _index(INDEX_LINES)
+    plan = plan_restamp(index, {"262便": RECORDS, "263便": []}, pages=[0, 1])
+    assert sorted(plan) == [0, 1]
+    [(_, rows0, _, totals0, last_resvs0)] = plan[0]
+    assert [r[2] for r in rows0] == ["9J-123456"]   # ステータスなしの行は印字しない
+    assert totals0 is None and last_resvs0 == []
+    assert [e[0] for e in plan[1]] == ["262便"]
+
+
+# 262便と263便の合計人数行が同じページにある
+TWO_TOTALS_PAGE = "\n".join([
+    "バス号車別明細表",
+    "19J-123456 ﾔﾏﾀﾞ 2103 090-1234-5678 ｼﾝｼﾞｭｸ→ｵｵｻｶ 262便",
+    "合計人数 2 1 0 3",
+    "29J-234567 ｽｽﾞｷ 1001 090-2222-3333 ｼﾝｼﾞｭｸ→ｷｮｳﾄ 263便",
+    "39J-345678 ｻﾄｳ 2002 090-4444-5555 ｼﾝｼﾞｭｸ→ｷｮｳﾄ 263便",
+    "合計人数 3 0 0 3",
+])
+
+
+class _Log:
+    def insert(self, index, text):
+        pass
+
+
+def _total_line_y(page_words, resvs):
+    return page_words.total_line(page_words.bottom_of(resvs))[0][1]
+
+
+def test_total_line_is_picked_below_each_flights_last_row(tmp_path):
+    path = make_text_pdf(str(tmp_path / "two_flights.pdf"), [TWO_TOTALS_PAGE])
+    with fitz.open(path) as doc:
+        page_words = PageWords(doc[0])
+    first = page_words.total_line()
+    y262 = _total_line_y(page_words, ["9J-123456"])
+    y263 = _total_line_y(page_words, ["9J-234567", "9J-345678"])
+    assert y262 == first[0][1] and y263 > y262
+    assert page_words.bottom_of(["9J-999999"]) is None
+    assert page_words.total_line(y263) is None
+
+
+def test_two_flights_ending_on_one_page_stamp_their_own_totals(tmp_path):
+    path = make_text_pdf(str(tmp_path / "two_flights.pdf"), [TWO_TOTALS_PAGE])
+    index = _index([[line.replace(" ", "") for line in TWO_TOTALS_PAGE.split("\n") if "便" in line]])
+    records = {
+        "262便": [{"resv": "合計人数", "name": "", "status": "合計", "after": {"男": 2, "女": 1, "子供": 0, "合計": 3}}],
+        "263便": [{"resv": "合計人数", "name": "", "status": "合計", "after": {"男": 7, "女": 0, "子供": 0, "合計": 7}}],
+    }
+    plan = plan_restamp(index, records, pages=[0])
+    assert [(e[0], e[3], e[4]) for e in plan[0]] == [
+        ("262便", (2, 1, 0, 3), ["9J-123456"]),
+        ("263便", (7, 0, 0, 7), ["9J-234567", "9J-345678"]),
+    ]
+
+    app = PDFPassengerSearchApp.__new__(PDFPassengerSearchApp)
+    app.log_text = _Log()
+    with fitz.open(path) as doc:
+        page = doc[0]
+        page_words = PageWords(page)
+        for _, _, _, totals, last_resvs in plan[0]:
+            app._stamp_total_line(page, 0, page_words, totals, "helv",
+                                  below_y=page_words.bottom_of(last_resvs))
+        y263 = _total_line_y(page_words, ["9J-345678"])
+        stamped = [w for w in page.get_text("words") if w[4] == "7"]
+    # 263便の変更後値（7）は263便の合計人数行にだけ印字され、262便の行（変更なし）には何も書かない
+    assert len(stamped) == 2
+    assert all(abs(w[3] - y263) < 14 for w in stamped)
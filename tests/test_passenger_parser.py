@@ -0,0 +1,39 @@
+"""
+明細行の解析（PassengerLineParser）: 旧来の parse_passenger_line と全項目が一致すること。
+"""
+import os
+import sys
+
+import pytest
+
+pytest.importorskip("fitz")
+pytest.importorskip("cryptography")
+
+from conftest import ROOT
+
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from pdf_list_find_write import PASSENGER_LINE_PARSER
+from bench_passenger_parser import legacy_parse_passenger_line, make_lines
+
+CORPUS = [
+    "19J-123456ﾔﾏﾀﾞ100115089178424262便26/10/17-10/18",
+    "29J-234567 ｽｽﾞｷ 2103 090-1234-5678 ｼﾝｼﾞｭｸ→ｵｵｻｶ 262便 26/10/17-10/18 ﾗｸﾃﾝ 11",
+    "3 9JA-3456789 ｻﾄｳ 0112 336ー5266ー7188 ｼﾝｼﾞｭｸ⇒ｷｮｳﾄ 263便 26/10/17-10/18 WILLER I2",
+    "9J-4567ﾀﾅｶ1001 0312345678 ﾄｳｷｮｳ→ｺｳﾍﾞ162便",
+    "9W-99999 ヤマモト 2000 ｼﾞｬﾑｼﾞｬﾑﾗｲﾅｰ 11",
+    "9J-12345 ﾔﾏﾀﾞ",
+    "予約番号 氏名 男女子計",
+    "",
+]
+
+
+@pytest.mark.parametrize("line", CORPUS)
+def test_matches_legacy_parser_on_sample_lines(line):
+    assert list(PASSENGER_LINE_PARSER.parse(line) or []) == legacy_parse_passenger_line(line)
+
+
+def test_matches_legacy_parser_on_generated_lines():
+    lines = make_lines(5000, seed=1)
+    assert [list(row or []) for row in PASSENGER_LINE_PARSER.parse_many(lines)] == \
+        [legacy_parse_passenger_line(line) for line in lines]
@@ -0,0 +1,65 @@
+"""
+便名検索の行索引（index_rows_by_flight / rows_for_flight）: 従来の部分一致で拾えた行を取りこぼさないこと。
+"""
+import pytest
+
+pytest.importorskip("fitz")
+pytest.importorskip("cryptography")
+
+from pdf_list_find_write import PASSENGER_LINE_PARSER, index_rows_by_flight, rows_for_flight
+
+LINES = [
+    # 電話番号と便名の数字が続いていて、「\d+便」では 100115089178424262便 になる行
+    "19J-123456ﾔﾏﾀﾞ100115089178424262便26/10/17-10/18",
+    "29J-234567ｽｽﾞｷ2103090-1234-5678ｼﾝｼﾞｭｸ→ｵｵｻｶ262便26/10/17-10/18ﾗｸﾃﾝ11",
+    "39J-345678ｻﾄｳ0112080-2222-3333ｼﾝｼﾞｭｸ→ｷｮｳﾄ263便26/10/17-10/18",
+    "49J-456789ﾀﾅｶ1001090-4444-5555ﾄｳｷｮｳ→ｺｳﾍﾞ162便26/10/17-10/18",
+]
+
+
+def _index():
+    rows = []
+    for page_index, line in enumerate(LINES):
+        parsed = PASSENGER_LINE_PARSER.parse(line)
+        assert parsed is not None
+        rows.append((page_index, line, "", parsed))
+    return {"rows": rows, "by_flight": index_rows_by_flight(rows)}
+
+
+def _old_filter(index, flight):
+    """索引化前の検索（行テキストの部分一致）"""
+    return [r for r in index["rows"] if flight in r[1]]
+
+
+def test_flight_lookup_uses_parsed_flight_field():
+    index = _index()
+    assert PASSENGER_LINE_PARSER.parse(LINES[0])[10] == "262便"
+    hits = rows_for_flight(index, "262便")
+    assert [r[0] for r in hits] == [0, 1]
+    assert hits == _old_filter(index, "262便")
+
+
+@pytest.mark.parametrize("flight", ["262便", "263便", "162便", "999便"])
+def test_same_rows_as_substring_filter(flight):
+    index = _index()
+    assert rows_for_flight(index, flight) == _old_filter(index, flight)
+
+
+def test_non_flight_keyword_falls_back_to_substring():
+    index = _index()
+    assert rows_for_flight(index, "ｼﾝｼﾞｭｸ") == _old_filter(index, "ｼﾝｼﾞｭｸ")
+
+
+def test_short_flight_does_not_match_longer_flight_numbers():
+    # 部分一致では 62便 が 262便・162便 の行まで拾っていた（別の号車）
+    index = _index()
+    assert rows_for_flight(index, "62便") == []
+
+
+def test_rows_without_parsed_flight_still_match_by_text():
+    index = _index()
+    no_flight = (9, "59J-567890ﾔﾏﾓﾄ1001(262便)", "", PASSENGER_LINE_PARSER.parse("59J-567890ﾔﾏﾓﾄ1001"))
+    index["rows"].append(no_flight)
+    index["by_flight"] = index_rows_by_flight(index["rows"])
+    assert no_flight[3][10] == ""
+    assert rows_for_flight(index, "262便") == _old_filter(index, "262便")
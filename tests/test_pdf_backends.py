@@ -0,0 +1,110 @@
+"""
+PyPDF2 / PyMuPDF(fitz) の両バックエンドが、便名・書類種別ごとに同じページを拾うことの確認。
+"""
+import os
+import queue
+
+import pytest
+
+fitz = pytest.importorskip("fitz")
+pytest.importorskip("PyPDF2")
+
+import pdf_page_collector as collector
+from conftest import make_text_pdf
+
+BEN_LIST = ["241号車", "242号車", "251号車", "262号車"]
+
+# 実際の名簿に近い並び（座席表・明細表・複数便・似た番号・空白入り・対象外ページ）
+MANIFEST_A = [
+    "座席表\n241号車 2026/10/17 出発\nA1 ﾔﾏﾀﾞ ﾀﾛｳ",
+    "バス号車別明細表\n241号車\n19J-123456 ﾔﾏﾀﾞ 090-1234-5678",
+    "バス号車別明細表\n242号車 251号車 合同\n19J-654321 ｽｽﾞｷ",
+    "座席表\n2420号車（対象外の番号）",
+    "お知らせ\n262号車は集合時間が変更になりました",
+]
+MANIFEST_B = [
+    "座席表\n2 4 2 号車\nB3 ｻﾄｳ ﾊﾅｺ",
+    "バス号車別明細表\n262号車\n合計人数 10 8 2 20",
+    "座席表\n251号車\nバス号車別明細表（別紙参照）",
+]
+
+
+def _config():
+    return {
+        ben: {"座席表": True, "バス号車別明細表_乗務員用": True, "バス号車別明細表_保管用": True}
+        for ben in BEN_LIST
+    }
+
+
+def _drain(q):
+    items = []
+    while True:
+        try:
+            items.append(q.get_nowait())
+        except queue.Empty:
+            return items
+
+
+@pytest.fixture
+def manifest_folder(tmp_path):
+    folder = tmp_path / "10.17出発名簿●"
+    folder.mkdir()
+    make_text_pdf(str(folder / "a.pdf"), MANIFEST_A)
+    make_text_pdf(str(folder / "b.pdf"), MANIFEST_B)
+    return folder
+
+
+def _run(backend, folder, out, monkeypatch):
+    monkeypatch.setattr(collector, "EXTRACT_SETTINGS", dict(collector.DEFAULT_EXTRACT_SETTINGS, cache=False))
+    monkeypatch.setattr(collector, "play_finish_sound", lambda log_queue: None)
+    os.makedirs(out, exist_ok=True)
+    log_queue, status_queue = queue.Queue(), queue.Queue()
+    result = collector.extract_pdf_by_criteria(
+        str(folder), BEN_LIST, _config(), str(out), log_queue, status_queue, "10.17出発名簿●",
+        workers=1, backend=backend
+    )
+    pages = sorted(m for m in _drain(log_queue) if str(m).startswith("[PAGE]"))
+    outputs = {}
+    for path in result["outputs"]:
+        doc = collector.get_pdf_backend("fitz").open(path)
+        outputs[os.path.basename(path)] = [doc[i].get_text() for i in range(len(doc))]
+        doc.close()
+    return pages, sorted(_drain(status_queue)), outputs
+
+
+def test_backends_pick_same_pages(manifest_folder, tmp_path, monkeypatch):
+    fitz_pages, fitz_status, fitz_out = _run("fitz", manifest_folder, tmp_path / "out_fitz", monkeypatch)
+    pypdf_pages, pypdf_status, pypdf_out = _run("pypdf2", manifest_folder, tmp_path / "out_pypdf2", monkeypatch)
+
+    assert fitz_pages == pypdf_pages
+    assert fitz_status == pypdf_status
+    # 出力PDFのページ内容・順序も同じ
+    assert fitz_out == pypdf_out
+
+    # 比較が空振りしていないこと（代表的な判定）
+    assert "[PAGE] a.pdf → 241号車 座席表" in fitz_pages
+    assert "[PAGE] b.pdf → 242号車 座席表" in fitz_pages
+    assert "[PAGE] a.pdf → 251号車 バス号車別明細表(保管用)" in fitz_pages
+    assert not any("2420" in p for p in fitz_pages)
+
+
+def test_page_classification_matches_per_page(manifest_folder):
+    for name in ("a.pdf", "b.pdf"):
+        path = str(manifest_folder / name)
+        with fitz.open(path) as doc:
+            n = len(doc)
+        by_backend = {
+            backend: [
+                (i, bens, is_seat, is_meisai)
+                for i, _, bens, is_seat, is_meisai in collector.classify_page_range(path, 0, n, BEN_LIST, backend)
+            ]
+            for backend in ("fitz", "pypdf2")
+        }
+        assert by_backend["fitz"] == by_backend["pypdf2"]
+
+
+def test_backend_defaults_are_consistent():
+    assert collector.DEFAULT_EXTRACT_SETTINGS["backend"] == collector.DEFAULT_PDF_BACKEND
+    assert collector.get_pdf_backend(None).name == collector.DEFAULT_PDF_BACKEND
+    assert collector.get_pdf_backend("unknown").name == collector.DEFAULT_PDF_BACKEND
+    assert collector.get_pdf_backend("PyPDF2").name == "pypdf2"
@@ -0,0 +1,57 @@
+"""
+常駐アプリの起動時に重いモジュールを読み込まないこと、FolderHandler が watchdog の Observer で動くことの確認。
+"""
+import os
+import sys
+import json
+import time
+import subprocess
+
+import pytest
+
+from conftest import ROOT
+
+GUI_FILE = os.path.join(ROOT, "pdf_page_collector_gui_full_2.9.py")
+
+
+def test_gui_module_import_stays_light():
+    pytest.importorskip("tkinter")
+    code = (
+        "import sys, json, importlib.util\n"
+        f"sys.path.insert(0, {ROOT!r})\n"
+        f"spec = importlib.util.spec_from_file_location('collector_gui', {GUI_FILE!r})\n"
+        "spec.loader.exec_module(importlib.util.module_from_spec(spec))\n"
+        "print(json.dumps(sorted({m.split('.')[0] for m in sys.modules})))\n"
+    )
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, cwd=ROOT, check=True)
+    loaded = set(json.loads(out.stdout.strip().splitlines()[-1]))
+    for heavy in ("watchdog", "fitz", "pymupdf", "PyPDF2", "cryptography", "pystray", "PIL", "win10toast"):
+        assert heavy not in loaded
+
+
+def test_folder_handler_receives_watchdog_events(tmp_path):
+    observers = pytest.importorskip("watchdog.observers")
+    import pdf_page_collector as collector
+
+    class Queue(list):
+        put = list.append
+
+    handler = collector.FolderHandler(Queue(), lambda *a: None, [], {}, Queue())
+    seen = []
+    handler._debounce = lambda folder_path, folder_name: seen.append(folder_name)
+
+    observer = observers.Observer()
+    observer.schedule(handler, str(tmp_path), recursive=False)
+    observer.start()
+    try:
+        time.sleep(0.2)
+        name = f"{time.strftime('%m.%d')}出発名簿●"
+        os.mkdir(tmp_path / name)
+        os.mkdir(tmp_path / "対象外フォルダ")
+        deadline = time.monotonic() + 5
+        while not seen and time.monotonic() < deadline:
+            time.sleep(0.05)
+    finally:
+        observer.stop()
+        observer.join(timeout=5)
+    assert seen and set(seen) == {name}
@@ -0,0 +1,67 @@
+"""
+暗号化キー（get_encryption_key / StatusCipher）: 旧版キーの引き継ぎを呼び出し側のログへ出すこと。
+"""
+import os
+
+import pytest
+
+pytest.importorskip("cryptography")
+
+import status_store
+
+
+@pytest.fixture
+def key_paths(tmp_path, monkeypatch):
+    app_dir = tmp_path / "app"
+    launch_dir = tmp_path / "launch"
+    app_dir.mkdir()
+    launch_dir.mkdir()
+    key_path = str(app_dir / "status_key.key")
+    monkeypatch.setattr(status_store, "KEY_FILE", key_path)
+    return key_path, str(launch_dir / "status_key.key")
+
+
+def test_legacy_key_is_migrated_and_logged(key_paths, capsys):
+    key_path, legacy = key_paths
+    with open(legacy, "wb") as f:
+        f.write(b"legacy-key")
+    logs = []
+    key = status_store.get_encryption_key(key_path, log=logs.append, legacy_key_path=legacy)
+    assert key == b"legacy-key"
+    with open(key_path, "rb") as f:
+        assert f.read() == b"legacy-key"
+    assert logs == [f"[INFO] 暗号化キーを移動しました: {legacy} → {key_path}"]
+    assert capsys.readouterr().out == ""
+
+
+def test_legacy_key_is_found_after_cwd_changes(key_paths, tmp_path, monkeypatch):
+    key_path, legacy = key_paths
+    with open(legacy, "wb") as f:
+        f.write(b"legacy-key")
+    # 起動後にカレントが変わっても、起動時フォルダーの旧版キーを見る
+    monkeypatch.chdir(tmp_path)
+    assert status_store.get_encryption_key(key_path, legacy_key_path=legacy) == b"legacy-key"
+
+
+def test_new_key_is_generated_without_log(key_paths):
+    key_path, legacy = key_paths
+    logs = []
+    key = status_store.get_encryption_key(key_path, log=logs.append, legacy_key_path=legacy)
+    assert key and os.path.exists(key_path) and not os.path.exists(legacy)
+    assert logs == []
+    assert status_store.get_encryption_key(key_path, log=logs.append, legacy_key_path=legacy) == key
+
+
+def test_cipher_load_passes_log(key_paths, monkeypatch):
+    from cryptography.fernet import Fernet
+
+    key_path, legacy = key_paths
+    with open(legacy, "wb") as f:
+        f.write(Fernet.generate_key())
+    monkeypatch.setattr(status_store, "LEGACY_KEY_FILE", legacy)
+    cipher = status_store.StatusCipher(key_path)
+    logs = []
+    cipher.load(logs.append)
+    cipher.load(logs.append)
+    assert len(logs) == 1 and logs[0].startswith("[INFO] 暗号化キーを移動しました")
+    assert cipher.decrypt_json(cipher.encrypt_json({"a": 1})) == {"a": 1}
@@ -0,0 +1,132 @@
+"""
+ステータスDB（StatusDB）: 読み込みでフォルダーを作らないこと・同期フォルダー向けにWALを使わないこと。
+"""
+import os
+import sqlite3
+
+import pytest
+
+pytest.importorskip("cryptography")
+
+import status_store
+
+RECORDS = [
+    {"resv": "9J-123456", "name": "ﾔﾏﾀﾞ", "status": "NS", "total": 0},
+    {"resv": "合計人数", "status": "", "total": 3},
+]
+
+
+@pytest.fixture
+def cipher(tmp_path):
+    return status_store.StatusCipher(str(tmp_path / "status_key.key"))
+
+
+def _journal_mode(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute("PRAGMA journal_mode").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_reads_do_not_create_folder_or_db(tmp_path, cipher):
+    status_root = tmp_path / "pdfs" / "status_data"
+    db = status_store.StatusDB(status_store.status_db_path(str(status_root)), cipher)
+    assert db.load_flight("2026-10-17", "262便") is None
+    assert db.get_record("2026-10-17", "262便", "9J-123456") is None
+    assert db.flight_updated_at("2026-10-17", "262便") is None
+    assert db.query() == []
+    assert db.history("2026-10-17", "262便") == []
+    assert db.compact() == 0
+    assert not (tmp_path / "pdfs").exists()
+
+
+def test_get_status_db_does_not_create_folder(tmp_path):
+    status_root = tmp_path / "status_data"
+    status_store.get_status_db(str(status_root))
+    assert not status_root.exists()
+
+
+def test_first_write_creates_db_without_wal(tmp_path, cipher):
+    status_root = tmp_path / "status_data"
+    db_path = status_store.status_db_path(str(status_root))
+    db = status_store.StatusDB(db_path, cipher)
+    db.replace_flight("2026-10-17", "262便", RECORDS)
+    db.append_changes("2026-10-17", "262便", [dict(RECORDS[0], status="CXL")], changed_by="tester")
+    assert _journal_mode(db_path) == "delete"
+    assert sorted(os.listdir(status_root)) == [status_store.STATUS_DB_NAME]
+    flight, data = db.load_flight("2026-10-17", "262便")
+    assert flight == "262便" and data["records"][0]["status"] == "CXL"
+
+
+def test_existing_wal_db_is_switched_to_delete(tmp_path, cipher):
+    db_path = str(tmp_path / status_store.STATUS_DB_NAME)
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(status_store._STATUS_SCHEMA)
+    conn.close()
+    assert _journal_mode(db_path) == "wal"
+
+    db = status_store.StatusDB(db_path, cipher)
+    assert db.flight_updated_at("2026-10-17", "262便") is None
+    assert _journal_mode(db_path) == "delete"
+    assert not os.path.exists(db_path + "-wal")
+
+
+def test_export_writes_status_json_from_db(tmp_path, cipher):
+    status_root = str(tmp_path / "status_data")
+    db = status_store.StatusDB(status_store.status_db_path(status_root), cipher)
+    db.replace_flight("2026-10-17", "262便", RECORDS, pdf_path="a_保管用.pdf", updated_at="2026-10-17T09:00:00")
+    db.replace_flight("2026-10-17", "262便2", RECORDS[:1])
+    db.append_changes("2026-10-17", "262便", [dict(RECORDS[0], status="CXL")], changed_by="tester")
+
+    # DB への保存だけでは JSON は書かれない（送信時は保存の後で export_status_json を呼ぶ）
+    assert not os.path.exists(status_store.status_json_path(status_root, "2026-10-17", "262便"))
+
+    path = status_store.export_status_json(db, status_root, "2026-10-17", "262便")
+    assert path == os.path.join(status_root, "2026-10-17", "262便_status.json")
+    data = status_store.load_status_document(path, cipher)
+    assert data["便名"] == "262便" and data["pdf_path"] == "a_保管用.pdf"
+    assert [r["status"] for r in data["records"]] == ["CXL", ""]
+    assert data["records"][-1]["resv"] == "合計人数"
+    # 書き出した JSON は DB より新しくないので、再取り込みでは上書きしない
+    assert status_store.import_status_file(db, path, "2026-10-17") == 0
+
+    assert status_store.export_status_json(db, status_root, "2026-10-17", "999便") is None
+
+
+def test_export_folder_writes_every_flight(tmp_path, cipher, monkeypatch):
+    status_root = str(tmp_path / "status_data")
+    db = status_store.StatusDB(status_store.status_db_path(status_root), cipher)
+    monkeypatch.setattr(status_store, "get_status_db", lambda root: db)
+    db.replace_flight("2026-10-17", "262便", RECORDS)
+    db.replace_flight("", "263便", RECORDS)
+    logs = []
+    assert status_store.export_status_folder(status_root, log=logs.append) == 2
+    assert os.path.exists(os.path.join(status_root, "2026-10-17", "262便_status.json"))
+    assert os.path.exists(os.path.join(status_root, "263便_status.json"))
+    assert len(logs) == 2
+
+
+def test_query_overlays_pending_journal_without_writing(tmp_path, cipher):
+    db_path = status_store.status_db_path(str(tmp_path / "status_data"))
+    db = status_store.StatusDB(db_path, cipher)
+    db.replace_flight("2026-10-17", "262便", RECORDS)
+    db.replace_flight("2026-10-17", "263便", RECORDS[:1])
+    db.append_changes("2026-10-17", "262便", [dict(RECORDS[0], status="CXL")], changed_by="tester")
+    db.append_changes("2026-10-17", "262便", [dict(RECORDS[0], status="CXL-CS")], changed_by="tester")
+    before = os.stat(db_path).st_mtime_ns
+
+    hits = db.query(date="2026-10-17", resv="9J-123456")
+    assert [(f, r["status"]) for _, f, r in hits] == [("262便", "CXL-CS"), ("263便", "NS")]
+    # 変更前のステータスでは当たらない（重ねた後の status で絞り込む）
+    assert [f for _, f, _ in db.query(status="NS")] == ["263便"]
+    assert [f for _, f, _ in db.query(status="CXL-CS")] == ["262便"]
+
+    # 読み込みでは畳み込まない
+    assert os.stat(db_path).st_mtime_ns == before
+    conn = sqlite3.connect(db_path)
+    try:
+        assert conn.execute("SELECT COUNT(*) FROM status_journal WHERE compacted = 0").fetchone()[0] == 2
+    finally:
+        conn.close()